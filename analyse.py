@@ -1,8 +1,10 @@
-from typing import List
+from typing import Dict, List, Tuple
+import statistics
 import warnings
 from matplotlib import pyplot as plt
 from prettytable import PrettyTable
 
+import index
 import type
 import utils
 
@@ -160,7 +162,7 @@ def print_characters(characters: List[type.Character], ac: bool, graphic: bool)
         print_graphic(characters_names, total_lines, total_words)
         
         
-def print_character_detail(characters: List[type.Character], scenes: List[type.Scene], nom_personnage: str, ac: bool) -> None:
+def print_character_detail(characters: List[type.Character], scenes: List[type.Scene], nom_personnage: str, ac: bool, masks: Dict[str, int]) -> None:
     """ Affiche les informations détaillées d'un personnage spécifique
 
     Args:
@@ -168,6 +170,7 @@ def print_character_detail(characters: List[type.Character], scenes: List[type.S
         scenes (List[type.Scene]): liste des scènes
         nom_personnage (str): nom du personnage
         ac (bool): on regarde un·e comédien·ne plutôt qu'un personnage si cet argument est True
+        masks (Dict[str, int]): index de présence des personnages (ou des comédien·nes) dans les scènes
     """
     
     to_show, to_tell = utils.handle_ac(ac)
@@ -179,7 +182,7 @@ def print_character_detail(characters: List[type.Character], scenes: List[type.S
         return
 
     # Recherche les scènes où le personnage est présent
-    scenes_personnage = [scene for scene in scenes if nom_personnage in scene[to_show]]
+    scenes_personnage = [scenes[position] for position in index.iter_positions(masks.get(nom_personnage, 0))]
 
     base_info_table = PrettyTable()
     if ac:
@@ -226,37 +229,215 @@ def print_character_detail(characters: List[type.Character], scenes: List[type.S
     print(other_characters_table)
 
 
-def print_characters_together(scenes: List[type.Scene], list_characters: List[str], ac: bool) -> None:
+def print_characters_together(scenes: List[type.Scene], list_characters: List[str], ac: bool, masks: Dict[str, int]) -> None:
     """ Affiche les scènes où les personnages entrés sont ensemble
 
     Args:
         scenes (List[type.Scene]): liste des scènes avec les données collectées
         list_characters (List[str]): liste des personnages à rechercher
+        masks (Dict[str, int]): index de présence des personnages (ou des comédien·nes) dans les scènes
     """
     
     to_show, to_tell = utils.handle_ac(ac)
 
     characters_set = set(list_characters)
-    nb_scenes_together = 0
+    together = index.get_mask(masks, characters_set, len(scenes))
+    nb_scenes_together = index.count(together)
 
     scenes_table = PrettyTable()
     scenes_table.field_names = ["Scène", f"Autres {to_tell}s présents"]
 
-    current_act = None
-    for scene in scenes:
-        act, numero_scene = scene["Scene"].split(':')
-        if act != current_act:
-            current_act = act
-            scenes_table.add_row([f"=== Acte {act} ===", "=========="])
+    # Les titres de tous les actes sont affichés, même ceux où les personnages ne sont jamais ensemble
+    act_starts = [position for position, scene in enumerate(scenes) if position == 0 or scene["Scene"].split(':')[0] != scenes[position - 1]["Scene"].split(':')[0]]
+    next_act = 0
 
-        characters_scene = set(scene[to_show])
-
-        if characters_set.issubset(characters_scene):
-            nb_scenes_together += 1
-            other_characters = characters_scene - characters_set
+    for position in [*index.iter_positions(together), len(scenes)]:
+        while next_act < len(act_starts) and act_starts[next_act] <= position:
+            scenes_table.add_row([f"=== Acte {scenes[act_starts[next_act]]['Scene'].split(':')[0]} ===", "=========="])
+            next_act += 1
+        
+        if position < len(scenes):
+            scene = scenes[position]
+            other_characters = set(scene[to_show]) - characters_set
             other_characters_formated = ', '.join(sorted(other_characters))
-            scenes_table.add_row([numero_scene, other_characters_formated])
+            scenes_table.add_row([scene["Scene"].split(':')[1], other_characters_formated])
 
     print(scenes_table)
 
-    print(f"\nCes {to_tell}s partagent {nb_scenes_together} scènes")
\ No newline at end of file
+    print(f"\nCes {to_tell}s partagent {nb_scenes_together} scènes")
+
+
+def print_copresence(copresence: Dict[str, Dict[str, Tuple[int, int]]], names: List[str], ac: bool, top: int = None) -> None:
+    """ Affiche la matrice des scènes partagées par chaque paire de personnages, ou les paires qui partagent le plus de scènes
+
+    Args:
+        copresence (Dict[str, Dict[str, Tuple[int, int]]]): scènes et mots partagés par chaque paire de noms
+        names (List[str]): noms des personnages (ou des comédien·nes), dans l'ordre d'affichage
+        ac (bool): on affiche les comédien·nes si cet argument est True
+        top (int): nombre de paires à afficher (la matrice complète si cet argument n'est pas donné)
+    """
+    
+    _, to_tell = utils.handle_ac(ac)
+    
+    if top is None:
+        # Les colonnes sont numérotées comme les lignes pour garder un tableau lisible avec beaucoup de noms
+        table = PrettyTable()
+        table.field_names = ["N°", f"{to_tell.capitalize()}s", *(str(i) for i in range(len(names)))]
+        for i, name in enumerate(names):
+            row = copresence.get(name, {})
+            table.add_row([i, name, *("-" if other == name else row.get(other, (0, 0))[0] for other in names)])
+        print(table)
+        return
+    
+    pairs = [(name, other, nb_scenes, nb_words) for name, row in copresence.items() for other, (nb_scenes, nb_words) in row.items() if name < other]
+    pairs.sort(key=lambda pair: (-pair[2], -pair[3], pair[0], pair[1]))
+    
+    table = PrettyTable()
+    table.field_names = [f"{to_tell.capitalize()} 1", f"{to_tell.capitalize()} 2", "Scènes partagées", "Mots partagés"]
+    for pair in pairs[:top]:
+        table.add_row(list(pair))
+    print(table)
+
+
+def print_link_conflicts(actor_name: str, conflicts: List[Tuple[str, str, int]]) -> None:
+    """ Affiche les personnages qu'un·e comédien·ne ne peut pas jouer ensemble
+
+    Args:
+        actor_name (str): nom du comédien
+        conflicts (List[Tuple[str, str, int]]): paires de personnages présents ensemble, avec le nombre de scènes partagées
+    """
+    
+    table = PrettyTable()
+    table.field_names = ["Personnage joué", "Nouveau personnage", "Scènes partagées"]
+    for conflict in conflicts:
+        table.add_row(list(conflict))
+    
+    print(f"{actor_name} ne peut pas jouer ces personnages, qui sont sur scène en même temps :")
+    print(table)
+
+
+def print_casting_conflicts(conflicts: List[Tuple[str, str, List[str]]]) -> None:
+    """ Affiche les scènes où un·e comédien·ne doit jouer plusieurs personnages à la fois
+
+    Args:
+        conflicts (List[Tuple[str, str, List[str]]]): scène, comédien·ne et personnages joués en même temps
+    """
+    
+    if not conflicts:
+        print("Aucun conflit : aucun·e comédien·ne ne joue deux personnages présents dans la même scène")
+        return
+    
+    table = PrettyTable()
+    table.field_names = ["Scène", "Comédien·ne", "Personnages joués en même temps"]
+    for scene, actor, played in conflicts:
+        table.add_row([scene, actor, ", ".join(played)])
+    
+    print(table)
+    print(f"\n{len(conflicts)} conflit·s")
+
+
+def print_casting_solution(groups: List[List[str]], lower_bound: int, optimal: bool) -> None:
+    """ Affiche une distribution proposée : les personnages joués par chaque comédien·ne
+
+    Args:
+        groups (List[List[str]]): personnages joués par chaque comédien·ne
+        lower_bound (int): nombre minimum prouvé de comédien·nes
+        optimal (bool): True si la distribution est prouvée optimale
+    """
+    
+    table = PrettyTable()
+    table.field_names = ["Comédien·ne", "Personnages joués"]
+    for i, group in enumerate(groups):
+        table.add_row([i + 1, ", ".join(group)])
+    print(table)
+    
+    if optimal:
+        print(f"\n{len(groups)} comédien·ne·s, c'est le minimum possible")
+    else:
+        print(f"\n{len(groups)} comédien·ne·s (il en faut au moins {lower_bound} ; la recherche exacte a été interrompue par la limite de temps)")
+
+
+def print_quick_changes(changes: List[Tuple[str, str, List[str], str, List[str]]]) -> None:
+    """ Affiche, pour chaque comédien·ne, les changements de personnage entre deux scènes consécutives
+
+    Args:
+        changes (List[Tuple[str, str, List[str], str, List[str]]]): comédien·ne, scène et personnages avant, scène et personnages après
+    """
+    
+    if not changes:
+        print("Aucun changement rapide : aucun·e comédien·ne ne change de personnage d'une scène à la suivante")
+        return
+    
+    table = PrettyTable()
+    table.field_names = ["Comédien·ne", "Scène", "Personnage·s joué·s", "Scène suivante", "Personnage·s joué·s ensuite"]
+    for actor, scene, played, next_scene, next_played in sorted(changes, key=lambda change: change[0]):
+        table.add_row([actor, scene, ", ".join(played), next_scene, ", ".join(next_played)])
+    
+    print(table)
+    print(f"\n{len(changes)} changement·s rapide·s")
+
+
+def print_sessions(scenes: List[type.Scene], plans: List[Tuple[str, List[int], int]], remaining: List[int]) -> None:
+    """ Affiche les scènes à répéter à chaque séance
+
+    Args:
+        scenes (List[type.Scene]): liste des scènes
+        plans (List[Tuple[str, List[int], int]]): nom, positions des scènes et nombre de mots de chaque séance
+        remaining (List[int]): positions des scènes qui n'ont trouvé aucune séance
+    """
+    
+    table = PrettyTable()
+    table.field_names = ["Séance", "Scènes", "Mots"]
+    for session_name, positions, nb_words in plans:
+        table.add_row([session_name, ", ".join(scenes[position]["Scene"] for position in positions), nb_words])
+    print(table)
+    
+    if remaining:
+        print(f"\nScène·s sans séance : {', '.join(scenes[position]['Scene'] for position in remaining)}")
+    else:
+        print("\nToutes les scènes ont une séance")
+
+
+def print_rehearsable_scenes(scenes: List[type.Scene], available_actors: List[str]) -> None:
+    """ Affiche les scènes qui peuvent être répétées avec les comédien·nes présent·es
+
+    Args:
+        scenes (List[type.Scene]): scènes à afficher, déjà triées
+        available_actors (List[str]): comédien·nes présent·es
+    """
+    
+    table = PrettyTable()
+    table.field_names = ["Scène", "Mots", "Comédien·nes"]
+    for scene in scenes:
+        table.add_row([scene["Scene"], scene["Words"], ", ".join(sorted(set(scene["Actors"])))])
+    print(table)
+    
+    print(f"\n{len(scenes)} scène·s peuvent être répétées avec {', '.join(available_actors)}")
+
+
+def print_corpus(stats: Dict[str, Dict], total: Dict) -> None:
+    """ Affiche les statistiques de chaque pièce du corpus, puis celles de l'ensemble, dans un seul tableau
+
+    Args:
+        stats (Dict[str, Dict]): statistiques de chaque pièce (voir corpus.get_piece_stats)
+        total (Dict): statistiques de l'ensemble des pièces
+    """
+    
+    table = PrettyTable()
+    table.field_names = ["Pièce", "Scènes", "Personnages", "Mots/scène (moy.)", "Mots/scène (méd.)", "Mots/scène (min-max)", "Personnages/scène (nombre:scènes)", "Didascalies"]
+    table.align["Personnages/scène (nombre:scènes)"] = "l"
+    
+    for name, piece_stats in list(stats.items()) + [("Total", total)]:
+        words = piece_stats["Words"]
+        nb_texts = piece_stats["Lines"] + piece_stats["Didascalies"]
+        table.add_row([
+            name,
+            len(words),
+            piece_stats["Characters"],
+            f"{statistics.mean(words):.0f}" if words else "-",
+            f"{statistics.median(words):.0f}" if words else "-",
+            f"{min(words)}-{max(words)}" if words else "-",
+            " ".join(f"{nb_present}:{nb_scenes}" for nb_present, nb_scenes in piece_stats["Histogram"].items()),
+            f"{100 * piece_stats['Didascalies'] / nb_texts:.1f} %" if nb_texts else "-"
+        ])
+    print(table)
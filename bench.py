@@ -0,0 +1,336 @@
+from typing import Callable, List
+import asyncio
+import csv
+import gzip
+import json
+import lzma
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import data
+import database
+import index
+import load
+import model
+import read
+import type
+import utils
+
+
+def create_synthetic_piece(directory: str, nb_scenes: int, nb_characters: int, nb_actors: int, seed: int = 0) -> str:
+    """ Crée une pièce synthétique (fichiers csv) pour les mesures de performance
+
+    Args:
+        directory (str): dossier dans lequel créer la pièce
+        nb_scenes (int): nombre de scènes
+        nb_characters (int): nombre de personnages
+        nb_actors (int): nombre de comédien·nes
+        seed (int): graine du générateur aléatoire
+
+    Returns:
+        str: chemin de la pièce, utilisable comme nom de pièce par les autres modules
+    """
+
+    generator = random.Random(seed)
+    piece = os.path.join(directory, f"bench-{nb_scenes}-{nb_characters}-{nb_actors}")
+    utils.create_directory(piece)
+
+    characters = [f"Perso{i}" for i in range(nb_characters)]
+
+    with open(utils.get_scenes_file(piece), "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(list(type.HEADER_SCENES.values()))
+        for i in range(nb_scenes):
+            present = generator.sample(characters, min(len(characters), generator.randint(1, 6)))
+            lines = generator.randint(5, 60)
+            writer.writerow([f"{i // 10 + 1}:{i % 10 + 1}", lines, generator.randint(0, 10), lines * 12, ":".join(present)])
+
+    with open(utils.get_characters_file(piece), "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(list(type.HEADER_CHARACTERS.values()))
+        for character in characters:
+            lines = generator.randint(1, 200)
+            writer.writerow([character, lines, lines * 12])
+
+    with open(utils.get_actors_file(piece), "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(list(type.HEADER_ACTORS.values()))
+        for i in range(nb_actors):
+            played = characters[i::nb_actors]
+            if played:
+                writer.writerow([f"Comedien{i}", ":".join(played)])
+
+    return piece
+
+
+def measure(function: Callable[[], object], repeat: int = 3) -> float:
+    """ Mesure le meilleur temps d'exécution d'une fonction
+
+    Args:
+        function (Callable[[], object]): fonction à mesurer
+        repeat (int): nombre de mesures
+
+    Returns:
+        float: meilleur temps mesuré, en secondes
+    """
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_load(sizes: List[int]) -> None:
+    """ Mesure le chargement des scènes (ld) en faisant varier le nombre de scènes puis de comédien·nes
+
+    Args:
+        sizes (List[int]): nombres de scènes à tester
+    """
+
+    with tempfile.TemporaryDirectory() as directory:
+        print("Scènes x 100 personnages x 50 comédien·nes")
+        for nb_scenes in sizes:
+            piece = create_synthetic_piece(directory, nb_scenes, 100, 50)
+            elapsed = measure(lambda: load.get_scenes(piece))
+            print(f"  {nb_scenes:>7} scènes : {elapsed * 1000:9.2f} ms ({elapsed / nb_scenes * 1e6:.2f} µs/scène)")
+
+        nb_scenes = sizes[-1]
+        print(f"\n{nb_scenes} scènes, personnages et comédien·nes variables")
+        for nb_people in (25, 100, 400):
+            piece = create_synthetic_piece(directory, nb_scenes, nb_people, nb_people)
+            elapsed = measure(lambda: load.get_scenes(piece))
+            print(f"  {nb_people:>4} personnages / {nb_people:>4} comédien·nes : {elapsed * 1000:9.2f} ms")
+
+
+def bench_snapshot(sizes: List[int]) -> None:
+    """ Compare un chargement complet (ld) depuis les csv et depuis le cliché binaire
+
+    Args:
+        sizes (List[int]): nombres de scènes à tester
+    """
+
+    with tempfile.TemporaryDirectory() as directory:
+        for nb_scenes in sizes:
+            piece = create_synthetic_piece(directory, nb_scenes, 200, 100)
+            # Date les csv dans le passé pour éviter la vérification par empreinte des écritures récentes
+            past = time.time_ns() - 10 * load.RACY_DELAY_NS
+            for file_name in load.get_csv_files(piece):
+                os.utime(file_name, ns=(past, past))
+
+            def cold():
+                os.remove(utils.get_snapshot_file(piece))
+                load.load_piece(piece)
+
+            load.load_piece(piece)
+            cold_time = measure(cold)
+            warm_time = measure(lambda: load.load_piece(piece))
+            print(f"  {nb_scenes:>7} scènes : csv {cold_time * 1000:9.2f} ms, cliché {warm_time * 1000:9.2f} ms")
+
+
+def bench_parse(copies: int) -> None:
+    """ Compare la lecture séquentielle et la lecture découpée d'un très gros texte
+
+    Args:
+        copies (int): nombre de fois que les textes de texts/ sont mis bout à bout
+    """
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, "big.txt")
+        with open(file_name, "w", encoding="utf-8") as big_file:
+            for _ in range(copies):
+                for piece in read.get_all_pieces():
+                    with utils.open_text(utils.get_text_file(piece)) as file:
+                        big_file.write(file.read())
+                    big_file.write("\n")
+
+        size = os.path.getsize(file_name) / (1024 * 1024)
+        sequential = measure(lambda: read.read_file(file_name, workers=1), repeat=1)
+        print(f"  {size:.1f} Mo, séquentiel : {sequential:.3f} s")
+        for workers in sorted({2, 4, os.cpu_count() or 1} - {1}):
+            parallel = measure(lambda: read.read_file(file_name, workers), repeat=1)
+            print(f"  {size:.1f} Mo, {workers} processus : {parallel:.3f} s")
+
+
+def bench_compression(copies: int) -> None:
+    """ Compare la lecture d'un texte brut et du même texte compressé (gzip, xz)
+
+    Args:
+        copies (int): nombre de fois que les textes de texts/ sont mis bout à bout
+    """
+
+    with tempfile.TemporaryDirectory() as directory:
+        text = []
+        for _ in range(copies):
+            for piece in read.get_all_pieces():
+                with utils.open_text(utils.get_text_file(piece)) as file:
+                    text.append(file.read())
+                text.append("\n")
+        text = "".join(text).encode("utf-8")
+
+        files = {
+            "txt": (os.path.join(directory, "big.txt"), open),
+            "gzip": (os.path.join(directory, "big.txt.gz"), gzip.open),
+            "xz": (os.path.join(directory, "big.txt.xz"), lzma.open)
+        }
+        for file_name, opener in files.values():
+            with opener(file_name, "wb") as file:
+                file.write(text)
+
+        for label, (file_name, _) in files.items():
+            size = os.path.getsize(file_name) / (1024 * 1024)
+            elapsed = measure(lambda: read.read_file(file_name, workers=1), repeat=1)
+            print(f"  {label:>4} : {size:7.2f} Mo sur le disque, lecture {elapsed:.3f} s")
+
+
+def bench_index(sizes: List[int]) -> None:
+    """ Compare la recherche des scènes (tg, dt) par parcours des scènes et par l'index de présence
+
+    Args:
+        sizes (List[int]): nombres de scènes à tester
+    """
+
+    with tempfile.TemporaryDirectory() as directory:
+        for nb_scenes in sizes:
+            piece = create_synthetic_piece(directory, nb_scenes, 100, 50)
+            scenes = load.get_scenes(piece)
+            together = ["Perso0", "Perso1"]
+
+            build_time = measure(lambda: index.build_index(scenes))
+            masks = index.build_index(scenes)["Characters"]
+
+            scan_tg = measure(lambda: [scene for scene in scenes if set(together).issubset(set(scene["Characters"]))])
+            index_tg = measure(lambda: [scenes[position] for position in index.iter_positions(index.get_mask(masks, together, len(scenes)))])
+            scan_dt = measure(lambda: [scene for scene in scenes if "Perso0" in scene["Characters"]])
+            index_dt = measure(lambda: [scenes[position] for position in index.iter_positions(masks.get("Perso0", 0))])
+
+            print(f"  {nb_scenes:>7} scènes : index construit en {build_time * 1000:8.2f} ms")
+            print(f"           tg : parcours {scan_tg * 1000:8.3f} ms, index {index_tg * 1000:8.3f} ms")
+            print(f"           dt : parcours {scan_dt * 1000:8.3f} ms, index {index_dt * 1000:8.3f} ms")
+
+
+def bench_database(sizes: List[int]) -> None:
+    """ Compare l'enregistrement d'une petite modification (sp) dans les fichiers csv et dans la base de données
+
+    Args:
+        sizes (List[int]): nombres de scènes à tester
+    """
+
+    with tempfile.TemporaryDirectory() as directory:
+        for nb_scenes in sizes:
+            piece = create_synthetic_piece(directory, nb_scenes, 200, 100)
+
+            def edit(loaded: type.Piece) -> None:
+                model.update_row(loaded, "Characters", 0, Lines=loaded["Characters"][0]["Lines"] + 1)
+                loaded["Dirty"].add("ch")
+                model.flush(loaded)
+
+            csv_loaded = model.open_piece(piece)
+            csv_time = measure(lambda: edit(csv_loaded))
+
+            database.import_csv(piece)
+            database_loaded = model.open_piece(piece)
+            database_time = measure(lambda: edit(database_loaded))
+            database.drop(piece)
+
+            print(f"  {nb_scenes:>7} scènes : csv {csv_time * 1000:9.2f} ms, base de données {database_time * 1000:9.2f} ms")
+
+
+async def run_clients(socket_file: str, piece: str, nb_clients: int, nb_queries: int) -> float:
+    """ Envoie des requêtes au serveur depuis plusieurs clients connectés en même temps
+
+    Args:
+        socket_file (str): chemin de la socket du serveur
+        piece (str): nom de la pièce
+        nb_clients (int): nombre de clients
+        nb_queries (int): nombre de requêtes de chaque client
+
+    Returns:
+        float: durée totale en secondes
+    """
+
+    commands = [["dt", "Perso0"], ["tg", "Perso0", "Perso1"], ["nb"], ["ch"], ["dt", "ac", "Comedien0"]]
+
+    async def client(number: int) -> None:
+        reader, writer = await asyncio.open_unix_connection(socket_file)
+        for i in range(nb_queries):
+            request = {"piece": piece, "command": commands[(number + i) % len(commands)]}
+            writer.write((json.dumps(request) + "\n").encode("utf-8"))
+            await writer.drain()
+            if "error" in json.loads(await reader.readline()):
+                raise RuntimeError("Le serveur a renvoyé une erreur")
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(number) for number in range(nb_clients)))
+    return time.perf_counter() - start
+
+
+def bench_server(clients: List[int], nb_queries: int = 500) -> None:
+    """ Mesure le nombre de requêtes par seconde du serveur, comparé à un appel de stats-piece.py par requête
+
+    Args:
+        clients (List[int]): nombres de clients connectés en même temps à tester
+        nb_queries (int): nombre de requêtes de chaque client
+    """
+
+    sources = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as directory:
+        piece = create_synthetic_piece(directory, 2000, 100, 50)
+        with open(os.path.join(directory, data.DATA_FILE), "w", encoding="utf-8") as file:
+            json.dump({"Version": data.REGISTRY_VERSION, "Pieces": {piece: {}}}, file)
+
+        socket_file = os.path.join(directory, utils.get_socket_file())
+        server = subprocess.Popen([sys.executable, os.path.join(sources, "server.py"), socket_file], cwd=directory, stdout=subprocess.DEVNULL)
+        try:
+            while not os.path.exists(socket_file):
+                time.sleep(0.01)
+            asyncio.run(run_clients(socket_file, piece, 1, 1)) # Chargement de la pièce
+
+            for nb_clients in clients:
+                elapsed = asyncio.run(run_clients(socket_file, piece, nb_clients, nb_queries))
+                print(f"  serveur, {nb_clients:>3} client·s : {nb_clients * nb_queries / elapsed:9.0f} requêtes/s")
+        finally:
+            server.terminate()
+            server.wait()
+
+        command = [sys.executable, os.path.join(sources, "stats-piece.py"), f"@{piece}", "dt", "Perso0"]
+        elapsed = measure(lambda: subprocess.run(command, cwd=directory, stdout=subprocess.DEVNULL, check=True))
+        print(f"  stats-piece.py, un appel par requête : {1 / elapsed:9.1f} requêtes/s")
+
+
+def usage() -> None:
+    """ Affiche les mesures disponibles
+    """
+    print("\n  python bench.py load [<scenes1> <scenes2> <...>] - Chargement des scènes (ld)")
+    print("  python bench.py snapshot [<scenes1> <scenes2> <...>] - Chargement depuis les csv ou depuis le cliché binaire")
+    print("  python bench.py parse [<copies>] - Lecture séquentielle ou découpée d'un très gros texte")
+    print("  python bench.py index [<scenes1> <scenes2> <...>] - Recherche des scènes (tg, dt) avec ou sans l'index de présence")
+    print("  python bench.py compression [<copies>] - Lecture d'un texte brut ou compressé (.gz, .xz)")
+    print("  python bench.py database [<scenes1> <scenes2> <...>] - Enregistrement d'une modification dans les csv ou dans la base de données")
+    print("  python bench.py server [<clients1> <clients2> <...>] - Requêtes par seconde du serveur (python server.py)")
+
+
+if __name__ == "__main__":
+    match sys.argv[1:]:
+        case ["load", *args]:
+            bench_load([int(arg) for arg in args] or [1000, 2000, 4000, 8000])
+        case ["snapshot", *args]:
+            bench_snapshot([int(arg) for arg in args] or [1000, 4000, 16000])
+        case ["parse", *args]:
+            bench_parse(int(args[0]) if args else 100)
+        case ["index", *args]:
+            bench_index([int(arg) for arg in args] or [1000, 4000, 16000])
+        case ["compression", *args]:
+            bench_compression(int(args[0]) if args else 20)
+        case ["database", *args]:
+            bench_database([int(arg) for arg in args] or [1000, 4000, 16000])
+        case ["server", *args]:
+            bench_server([int(arg) for arg in args] or [1, 8, 64])
+        case _:
+            usage()
@@ -0,0 +1,280 @@
+from typing import Dict, List, Set, Tuple
+import time
+
+import model
+import type
+
+SOLVER_TIME_LIMIT = 5 # Secondes accordées par défaut à la recherche exacte de dc
+
+
+def get_link_conflicts(loaded: type.Piece, actor_name: str, character_names: List[str]) -> List[Tuple[str, str, int]]:
+    """ Cherche les personnages qu'un·e comédien·ne ne pourrait pas jouer ensemble s'il·elle était lié·e à de nouveaux personnages
+
+    Chaque nouveau personnage est comparé aux personnages déjà joués et aux autres nouveaux personnages
+    avec l'index des scènes partagées, sans parcourir les scènes.
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        actor_name (str): nom du comédien
+        character_names (List[str]): personnages à relier
+
+    Returns:
+        List[Tuple[str, str, int]]: paires de personnages présents ensemble sur scène, avec le nombre de scènes partagées
+    """
+
+    copresence = model.get_copresence(loaded, "Characters")
+
+    position = model.find(loaded["Actors"], actor_name)
+    played = list(loaded["Actors"][position]["Characters"]) if position >= 0 else []
+
+    conflicts = []
+    for character in character_names:
+        if character in played:
+            continue
+        shared = copresence.get(character, {})
+        for other in played:
+            if other in shared:
+                conflicts.append((other, character, shared[other][0]))
+        played.append(character)
+
+    return conflicts
+
+
+def get_casting_conflicts(loaded: type.Piece) -> List[Tuple[str, str, List[str]]]:
+    """ Cherche, en un seul parcours des scènes, les scènes où un·e comédien·ne devrait jouer plusieurs personnages à la fois
+
+    Args:
+        loaded (type.Piece): pièce chargée
+
+    Returns:
+        List[Tuple[str, str, List[str]]]: scène, comédien·ne et personnages joués en même temps, dans l'ordre des scènes
+    """
+
+    conflicts = []
+
+    for scene, roles in zip(loaded["Scenes"], get_roles_by_scene(loaded)):
+        for actor, played in roles.items():
+            if len(played) > 1:
+                conflicts.append((scene["Scene"], actor, played))
+
+    return conflicts
+
+
+def get_conflict_graph(loaded: type.Piece) -> Tuple[List[str], List[Set[int]]]:
+    """ Construit le graphe des personnages qui sont sur scène ensemble
+
+    Args:
+        loaded (type.Piece): pièce chargée
+
+    Returns:
+        Tuple[List[str], List[Set[int]]]: noms des personnages, et voisins de chaque personnage (positions dans la liste des noms)
+    """
+
+    names = list(dict.fromkeys(character["Name"] for character in loaded["Characters"]))
+    position_of = {name: position for position, name in enumerate(names)}
+    copresence = model.get_copresence(loaded, "Characters")
+
+    neighbors = [set() for _ in names]
+    for name, position in position_of.items():
+        for other in copresence.get(name, {}):
+            if other in position_of:
+                neighbors[position].add(position_of[other])
+
+    return names, neighbors
+
+
+def get_clique(neighbors: List[Set[int]]) -> List[int]:
+    """ Cherche une grande clique par une méthode gloutonne : elle donne un minimum au nombre de comédien·nes
+
+    Args:
+        neighbors (List[Set[int]]): voisins de chaque personnage
+
+    Returns:
+        List[int]: personnages qui sont tous sur scène deux à deux
+    """
+
+    best: List[int] = []
+    for start in range(len(neighbors)):
+        clique = [start]
+        candidates = set(neighbors[start])
+        while candidates:
+            vertex = max(candidates, key=lambda candidate: (len(neighbors[candidate] & candidates), -candidate))
+            clique.append(vertex)
+            candidates &= neighbors[vertex]
+        if len(clique) > len(best):
+            best = clique
+    return best
+
+
+def dsatur(neighbors: List[Set[int]]) -> List[int]:
+    """ Colore le graphe avec l'heuristique DSatur : on colore d'abord le personnage dont les voisins ont le plus de couleurs différentes
+
+    Args:
+        neighbors (List[Set[int]]): voisins de chaque personnage
+
+    Returns:
+        List[int]: couleur (numéro de comédien·ne) de chaque personnage
+    """
+
+    colors = [-1] * len(neighbors)
+    neighbor_colors: List[Set[int]] = [set() for _ in neighbors]
+
+    for _ in range(len(neighbors)):
+        vertex = max(
+            (vertex for vertex in range(len(neighbors)) if colors[vertex] < 0),
+            key=lambda vertex: (len(neighbor_colors[vertex]), len(neighbors[vertex]), -vertex)
+        )
+        color = 0
+        while color in neighbor_colors[vertex]:
+            color += 1
+        colors[vertex] = color
+        for neighbor in neighbors[vertex]:
+            neighbor_colors[neighbor].add(color)
+
+    return colors
+
+
+def exact_coloring(neighbors: List[Set[int]], best: List[int], lower_bound: int, deadline: float) -> Tuple[List[int], bool]:
+    """ Cherche une coloration avec moins de couleurs par séparation et évaluation (DSatur exact), jusqu'à une date limite
+
+    Args:
+        neighbors (List[Set[int]]): voisins de chaque personnage
+        best (List[int]): meilleure coloration connue
+        lower_bound (int): nombre de couleurs en dessous duquel il est inutile de chercher
+        deadline (float): date limite (time.perf_counter)
+
+    Returns:
+        Tuple[List[int], bool]: meilleure coloration trouvée, et True si elle est prouvée optimale
+    """
+
+    nb_vertices = len(neighbors)
+    best = list(best)
+    best_count = max(best, default=-1) + 1
+    colors = [-1] * nb_vertices
+    # Nombre de voisins de chaque couleur, pour chaque personnage
+    neighbor_colors: List[Dict[int, int]] = [{} for _ in neighbors]
+    timed_out = False
+
+    def assign(vertex: int, color: int, step: int) -> None:
+        colors[vertex] = color
+        for neighbor in neighbors[vertex]:
+            neighbor_colors[neighbor][color] = neighbor_colors[neighbor].get(color, 0) + step
+            if not neighbor_colors[neighbor][color]:
+                del neighbor_colors[neighbor][color]
+
+    def choose_vertex() -> int:
+        return max(
+            (vertex for vertex in range(nb_vertices) if colors[vertex] < 0),
+            key=lambda vertex: (len(neighbor_colors[vertex]), len(neighbors[vertex]))
+        )
+
+    # Parcours en profondeur avec une pile explicite (une récursion par personnage dépasserait la limite de Python) :
+    # chaque étage contient le personnage à colorer, le nombre de couleurs utilisées avant lui et la prochaine couleur à essayer
+    stack: List[List[int]] = []
+    if nb_vertices and best_count > lower_bound:
+        if time.perf_counter() > deadline:
+            timed_out = True
+        else:
+            stack.append([choose_vertex(), 0, 0])
+
+    while stack:
+        frame = stack[-1]
+        vertex, nb_used, color = frame
+        if colors[vertex] >= 0: # Retour d'un essai : la couleur précédente est retirée
+            assign(vertex, colors[vertex], -1)
+            colors[vertex] = -1
+        if timed_out or best_count <= lower_bound:
+            break
+
+        # Une nouvelle couleur n'est essayée que si elle reste sous la meilleure solution connue
+        nb_colors = min(nb_used + 1, best_count - 1)
+        while color < nb_colors and color in neighbor_colors[vertex]:
+            color += 1
+        if color >= nb_colors:
+            stack.pop()
+            continue
+
+        frame[2] = color + 1
+        assign(vertex, color, 1)
+        if len(stack) == nb_vertices:
+            best, best_count = list(colors), max(nb_used, color + 1)
+        elif time.perf_counter() > deadline:
+            timed_out = True
+        else:
+            stack.append([choose_vertex(), max(nb_used, color + 1), 0])
+
+    return best, not timed_out or best_count <= lower_bound
+
+
+def solve_casting(loaded: type.Piece, time_limit: float = SOLVER_TIME_LIMIT) -> Tuple[List[List[str]], int, bool]:
+    """ Cherche le nombre minimum de comédien·nes et une distribution où personne ne joue deux personnages présents dans la même scène
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        time_limit (float): temps maximum (en secondes) de la recherche exacte
+
+    Returns:
+        Tuple[List[List[str]], int, bool]: personnages joués par chaque comédien·ne, nombre minimum prouvé de comédien·nes,
+        et True si la distribution est prouvée optimale
+    """
+
+    names, neighbors = get_conflict_graph(loaded)
+    if not names:
+        return [], 0, True
+
+    lower_bound = len(get_clique(neighbors))
+    colors, optimal = exact_coloring(neighbors, dsatur(neighbors), lower_bound, time.perf_counter() + time_limit)
+
+    groups: List[List[str]] = [[] for _ in range(max(colors) + 1)]
+    for name, color in zip(names, colors):
+        groups[color].append(name)
+
+    return groups, len(groups) if optimal else lower_bound, optimal
+
+
+def get_roles_by_scene(loaded: type.Piece) -> List[Dict[str, List[str]]]:
+    """ Donne, pour chaque scène, les personnages joués par chaque comédien·ne présent·e
+
+    Args:
+        loaded (type.Piece): pièce chargée
+
+    Returns:
+        List[Dict[str, List[str]]]: personnages joués par comédien·ne, dans l'ordre des scènes
+    """
+
+    links = loaded["Links"]
+    roles_by_scene = []
+    for scene in loaded["Scenes"]:
+        roles: Dict[str, List[str]] = {}
+        for character in scene["Characters"]:
+            for actor in links.get(character, []):
+                played = roles.setdefault(actor, [])
+                if character not in played:
+                    played.append(character)
+        roles_by_scene.append(roles)
+    return roles_by_scene
+
+
+def get_quick_changes(loaded: type.Piece) -> List[Tuple[str, str, List[str], str, List[str]]]:
+    """ Cherche, en un seul parcours des scènes, les comédien·nes qui changent de personnage d'une scène à la suivante
+
+    Args:
+        loaded (type.Piece): pièce chargée
+
+    Returns:
+        List[Tuple[str, str, List[str], str, List[str]]]: comédien·ne, scène et personnages avant le changement,
+        scène et personnages après le changement, dans l'ordre des scènes
+    """
+
+    changes = []
+    previous: Dict[str, List[str]] = {}
+    previous_scene = None
+
+    for scene, roles in zip(loaded["Scenes"], get_roles_by_scene(loaded)):
+        for actor, played in roles.items():
+            played_before = previous.get(actor)
+            if played_before and any(character not in played_before for character in played):
+                changes.append((actor, previous_scene, played_before, scene["Scene"], played))
+        previous, previous_scene = roles, scene["Scene"]
+
+    return changes
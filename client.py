@@ -0,0 +1,50 @@
+from typing import BinaryIO, Dict, List, Union
+import json
+import socket
+import sys
+
+import utils
+
+
+def connect(socket_file: str = None) -> BinaryIO:
+    """ Se connecte au serveur de requêtes (python server.py)
+
+    Args:
+        socket_file (str): chemin de la socket (par défaut, celle du serveur lancé sans argument)
+
+    Returns:
+        BinaryIO: connexion, à garder pour envoyer plusieurs requêtes
+    """
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(socket_file or utils.get_socket_file())
+    return connection.makefile("rwb")
+
+
+def query(connection: BinaryIO, piece: str, command: Union[str, List[str]]) -> Dict:
+    """ Envoie une commande au serveur et attend sa réponse
+
+    Args:
+        connection (BinaryIO): connexion au serveur
+        piece (str): nom de la pièce
+        command (Union[str, List[str]]): commande, en une chaîne ou découpée en mots (pour les noms avec des espaces)
+
+    Returns:
+        Dict: résultat ("result") ou message d'erreur ("error")
+    """
+
+    connection.write((json.dumps({"piece": piece, "command": command}, ensure_ascii=False) + "\n").encode("utf-8"))
+    connection.flush()
+    return json.loads(connection.readline())
+
+
+if __name__ == "__main__":
+    # python client.py <piece> <commande> <arguments>
+    if len(sys.argv) < 3:
+        print("Utilisation : python client.py <piece> <commande> <arguments>")
+        sys.exit(1)
+
+    with connect() as connection:
+        response = query(connection, sys.argv[1], sys.argv[2:])
+    print(json.dumps(response, ensure_ascii=False, indent=2))
+    sys.exit(1 if "error" in response else 0)
@@ -0,0 +1,114 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+import json
+
+import data
+import model
+import store
+
+CACHE_FILE = "corpus.json" # Statistiques déjà calculées, avec les dates de modification des fichiers de chaque pièce
+CACHE_VERSION = 1
+
+
+def get_piece_stats(piece: str) -> Dict:
+    """ Calcule les statistiques d'une pièce utilisées pour comparer les pièces du corpus
+
+    Args:
+        piece (str): nom de la pièce
+
+    Returns:
+        Dict: nombre de personnages, mots de chaque scène, nombre de scènes pour chaque nombre de personnages présents,
+        nombres de répliques et de didascalies
+    """
+
+    loaded = model.open_piece(piece)
+    histogram: Dict[int, int] = {}
+    for scene in loaded["Scenes"]:
+        nb_present = len({name for name in scene["Characters"] if name})
+        histogram[nb_present] = histogram.get(nb_present, 0) + 1
+
+    return {
+        "Characters": len({character["Name"] for character in loaded["Characters"]}),
+        "Words": [int(scene["Words"]) for scene in loaded["Scenes"]],
+        "Histogram": {str(nb_present): nb_scenes for nb_present, nb_scenes in sorted(histogram.items())},
+        "Lines": sum(int(scene["Lines"]) for scene in loaded["Scenes"]),
+        "Didascalies": sum(int(scene["Didascalies"]) for scene in loaded["Scenes"])
+    }
+
+
+def read_cache() -> Dict[str, Dict]:
+    try:
+        with open(CACHE_FILE, "r", encoding="utf-8") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return cache["Pieces"] if cache.get("Version") == CACHE_VERSION else {}
+
+
+def get_corpus_stats(pieces: List[str], workers: int = None) -> Tuple[Dict[str, Dict], List[str], List[str]]:
+    """ Calcule les statistiques de plusieurs pièces en parallèle, en ne rechargeant que les pièces modifiées depuis le dernier calcul
+
+    Les statistiques d'une pièce sont reprises du cache si les dates de modification de ses fichiers de données n'ont pas changé.
+
+    Args:
+        pieces (List[str]): noms des pièces
+        workers (int): nombre de processus (par défaut, le nombre de processeurs)
+
+    Returns:
+        Tuple[Dict[str, Dict], List[str], List[str]]: statistiques de chaque pièce, pièces rechargées et pièces illisibles
+    """
+
+    cache = read_cache()
+    stats: Dict[str, Dict] = {}
+    mtimes = {piece: data.get_mtimes(piece) for piece in pieces}
+
+    to_load = []
+    for piece in pieces:
+        cached = cache.get(piece)
+        if cached and cached["Mtimes"] == mtimes[piece]:
+            stats[piece] = cached["Stats"]
+        elif mtimes[piece]:
+            to_load.append(piece)
+
+    failed = [piece for piece in pieces if not mtimes[piece]]
+    if to_load:
+        # Chaque processus lit sa propre pièce : seul le cache est partagé, et il est mis à jour à la fin
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {piece: executor.submit(get_piece_stats, piece) for piece in to_load}
+            for piece, future in futures.items():
+                try:
+                    stats[piece] = future.result()
+                except (OSError, ValueError, KeyError):
+                    failed.append(piece)
+                    continue
+                cache[piece] = {"Mtimes": mtimes[piece], "Stats": stats[piece]}
+
+        content = json.dumps({"Version": CACHE_VERSION, "Pieces": cache}, ensure_ascii=False)
+        store.write_file(CACHE_FILE, content.encode("utf-8"), durable=False)
+
+    loaded = [piece for piece in to_load if piece not in failed]
+    return {piece: stats[piece] for piece in pieces if piece in stats}, loaded, failed
+
+
+def merge_stats(stats: List[Dict]) -> Dict:
+    """ Rassemble les statistiques de plusieurs pièces comme s'il s'agissait d'une seule
+
+    Args:
+        stats (List[Dict]): statistiques de chaque pièce
+
+    Returns:
+        Dict: statistiques de l'ensemble (le nombre de personnages est la somme de ceux des pièces)
+    """
+
+    histogram: Dict[str, int] = {}
+    for piece_stats in stats:
+        for nb_present, nb_scenes in piece_stats["Histogram"].items():
+            histogram[nb_present] = histogram.get(nb_present, 0) + nb_scenes
+
+    return {
+        "Characters": sum(piece_stats["Characters"] for piece_stats in stats),
+        "Words": [nb_words for piece_stats in stats for nb_words in piece_stats["Words"]],
+        "Histogram": dict(sorted(histogram.items(), key=lambda item: int(item[0]))),
+        "Lines": sum(piece_stats["Lines"] for piece_stats in stats),
+        "Didascalies": sum(piece_stats["Didascalies"] for piece_stats in stats)
+    }
@@ -1,31 +1,149 @@
+from typing import Dict
+import json
 import os
 import shutil
+import time
 
-DATA_FILE = "data.txt"
+from prettytable import PrettyTable
 
-def add_piece(new_piece: str) -> None:
+import store
+import utils
+
+DATA_FILE = "data.json"
+LEGACY_DATA_FILE = "data.txt" # Ancienne liste des pièces lues (un nom par ligne), reprise si DATA_FILE n'existe pas
+REGISTRY_VERSION = 1
+
+_registry: Dict[str, Dict] = None # Pièces lues et leurs informations, gardées en mémoire pendant la session
+_registry_mtime: int = None # Date de modification de DATA_FILE lors de sa dernière lecture
+
+
+def get_registry() -> Dict[str, Dict]:
+    """ Donne les pièces lues et leurs informations, relues seulement si le fichier a changé depuis la dernière lecture
+
+    Returns:
+        Dict[str, Dict]: informations de chaque pièce (empreinte du texte, nombres de scènes et de personnages,
+        date de la dernière lecture, dates de modification des fichiers de données), par nom
+    """
+
+    global _registry, _registry_mtime
+
+    try:
+        mtime = os.stat(DATA_FILE).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    if _registry is not None and mtime == _registry_mtime:
+        return _registry
+
+    registry = {}
+    if mtime is not None:
+        try:
+            with open(DATA_FILE, "r", encoding="utf-8") as file:
+                content = json.load(file)
+            if content.get("Version") == REGISTRY_VERSION:
+                registry = content["Pieces"]
+        except (OSError, ValueError, KeyError):
+            registry = {}
+    else:
+        try:
+            with open(LEGACY_DATA_FILE, "r", encoding="utf-8") as file:
+                registry = {line.strip(): {} for line in file if line.strip()}
+        except FileNotFoundError:
+            pass
+
+    _registry, _registry_mtime = registry, mtime
+    return _registry
+
+
+def save_registry() -> None:
+    """ Réécrit le fichier des pièces lues à partir de la liste gardée en mémoire
+    """
+
+    global _registry_mtime
+
+    content = json.dumps({"Version": REGISTRY_VERSION, "Pieces": _registry}, ensure_ascii=False, indent=1)
+    store.write_file(DATA_FILE, content.encode("utf-8"))
+    _registry_mtime = os.stat(DATA_FILE).st_mtime_ns
+
+
+def get_mtimes(piece: str) -> Dict[str, int]:
+    """ Donne les dates de modification des fichiers de données d'une pièce
+
+    Args:
+        piece (str): nom de la pièce
+
+    Returns:
+        Dict[str, int]: date de modification (en nanosecondes) de chaque fichier existant
+    """
+
+    mtimes = {}
+    for file_name in (utils.get_scenes_file(piece), utils.get_characters_file(piece), utils.get_actors_file(piece), utils.get_database_file(piece)):
+        try:
+            mtimes[os.path.basename(file_name)] = os.stat(file_name).st_mtime_ns
+        except FileNotFoundError:
+            pass
+    return mtimes
+
+
+def add_piece(new_piece: str, metadata: Dict = None) -> None:
     """ Ajoute une pièce au fichier des pièces lues
 
     Args:
         new_piece (str): nom de la pièce
+        metadata (Dict): informations sur la pièce
     """
     
-    if not piece_exists(new_piece):    
-        with open(DATA_FILE, mode='a', newline="", encoding='utf-8') as file:
-            file.write(new_piece + "\n")
+    add_pieces({new_piece: metadata or {}})
+
+
+def add_pieces(new_pieces: Dict[str, Dict]) -> None:
+    """ Ajoute plusieurs pièces au fichier des pièces lues, en une seule écriture
+
+    Args:
+        new_pieces (Dict[str, Dict]): informations sur chaque pièce, par nom
+    """
+    
+    registry = get_registry()
+    for piece, metadata in new_pieces.items():
+        registry.setdefault(piece, {}).update(metadata)
+    save_registry()
+
+
+def update_piece(piece: str, **metadata) -> None:
+    """ Met à jour les informations d'une pièce lue, après l'écriture de ses données
+
+    Args:
+        piece (str): nom de la pièce
+        metadata: informations modifiées
+    """
+
+    registry = get_registry()
+    if piece in registry:
+        registry[piece].update(metadata)
+        save_registry()
 
 
 def print_pieces() -> None:
-    """ Affiche la liste des pièces déjà lues par le système
+    """ Affiche la liste des pièces déjà lues par le système, avec leurs informations, sans ouvrir leurs dossiers
     """
-    try:
-        with open(DATA_FILE, "r", encoding="utf-8") as file:
-            print("\nListe des pièces disponibles :")
-            for line in file:
-                print(f"- {line}", end="")
-        print()
-    except:
+
+    registry = get_registry()
+    if not registry:
         print("\nAucune pièce n'a encore été lue par le système")
+        return
+
+    table = PrettyTable()
+    table.field_names = ["Pièce", "Scènes", "Personnages", "Dernière lecture", "Empreinte du texte"]
+    for piece, metadata in sorted(registry.items()):
+        parsed_at = metadata.get("ParsedAt")
+        table.add_row([
+            piece,
+            metadata.get("Scenes", "-"),
+            metadata.get("Characters", "-"),
+            time.strftime("%Y-%m-%d %H:%M", time.localtime(parsed_at)) if parsed_at else "-",
+            metadata.get("TextHash", "-")[:12]
+        ])
+    print("\nListe des pièces disponibles :")
+    print(table)
         
 
 def piece_exists(piece: str) -> bool:
@@ -38,15 +156,7 @@ def piece_exists(piece: str) -> bool:
         bool: retourne True si la pièce a été trouvée
     """
     
-    try:
-        with open(DATA_FILE, "r", encoding="utf-8") as file:
-            for line in file:
-                if piece == line.strip():
-                    return True
-    except:
-        print("\nAucune pièce n'a encore été lue par le système")
-    
-    return False
+    return piece in get_registry()
                 
                 
 def remove_piece(piece: str) -> None:
@@ -55,20 +165,10 @@ def remove_piece(piece: str) -> None:
     Args:
         piece (str): nom de la pièce
     """
-    try:
-        # Lit le contenu du fichier
-        with open(DATA_FILE, mode='r', encoding='utf-8') as fichier:
-            lignes = fichier.readlines()
-
-        # Filtre les lignes pour exclure celle qui correspond à la pièce à retirer
-        lignes_filtrees = [ligne for ligne in lignes if ligne.strip() != piece]
-
-        # Écrit les lignes restantes dans le fichier
-        with open(DATA_FILE, mode='w', newline="", encoding='utf-8') as fichier:
-            fichier.writelines(lignes_filtrees)
 
-    except Exception as e:
-        print(f"Erreur lors de la suppression de {piece} dans le fichier '{DATA_FILE}': {e}")
+    registry = get_registry()
+    if registry.pop(piece, None) is not None:
+        save_registry()
 
 
 def print_csv(piece: str, file_type: str) -> None:
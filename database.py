@@ -0,0 +1,291 @@
+from typing import Dict, List, Tuple
+import contextlib
+import csv
+import json
+import os
+import sqlite3
+
+import load
+import store
+import type
+import utils
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenes (
+    id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    lines TEXT NOT NULL,
+    didascalies TEXT NOT NULL,
+    words TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS presence (
+    scene_id INTEGER NOT NULL REFERENCES scenes(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    character TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS characters (
+    id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    lines INTEGER NOT NULL,
+    words INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS actors (
+    id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS casting (
+    actor_id INTEGER NOT NULL REFERENCES actors(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    character TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scenes_position ON scenes(position);
+CREATE INDEX IF NOT EXISTS scenes_name ON scenes(name);
+CREATE INDEX IF NOT EXISTS presence_scene ON presence(scene_id, position);
+CREATE INDEX IF NOT EXISTS presence_character ON presence(character);
+CREATE INDEX IF NOT EXISTS characters_position ON characters(position);
+CREATE INDEX IF NOT EXISTS characters_name ON characters(name);
+CREATE INDEX IF NOT EXISTS actors_position ON actors(position);
+CREATE INDEX IF NOT EXISTS actors_name ON actors(name);
+CREATE INDEX IF NOT EXISTS casting_actor ON casting(actor_id, position);
+CREATE INDEX IF NOT EXISTS casting_character ON casting(character);
+"""
+
+TABLE_NAMES = {"Scenes": "scenes", "Characters": "characters", "Actors": "actors"}
+
+
+def exists(piece: str) -> bool:
+    return os.path.exists(utils.get_database_file(piece))
+
+
+@contextlib.contextmanager
+def connect(piece: str):
+    """ Ouvre la base de données d'une pièce dans une transaction, validée à la sortie du bloc ou annulée en cas d'erreur
+
+    Args:
+        piece (str): nom de la pièce
+
+    Yields:
+        sqlite3.Connection: connexion à la base
+    """
+
+    connection = sqlite3.connect(utils.get_database_file(piece))
+    try:
+        connection.execute("PRAGMA foreign_keys = ON")
+        with connection:
+            connection.executescript(SCHEMA)
+            yield connection
+    finally:
+        connection.close()
+
+
+def insert_rows(connection: sqlite3.Connection, table: str, position: int, rows: List[List]) -> None:
+    """ Insère des lignes à partir d'une position, sans décaler les lignes suivantes
+
+    Args:
+        connection (sqlite3.Connection): connexion à la base
+        table (str): "Scenes", "Characters" ou "Actors"
+        position (int): position de la première ligne
+        rows (List[List]): lignes, dans le format de store.get_row
+    """
+
+    for offset, row in enumerate(rows):
+        if table == "Scenes":
+            name, lines, didascalies, words, characters = row
+            cursor = connection.execute(
+                "INSERT INTO scenes (position, name, lines, didascalies, words) VALUES (?, ?, ?, ?, ?)",
+                (position + offset, name, lines, didascalies, words)
+            )
+            connection.executemany(
+                "INSERT INTO presence (scene_id, position, character) VALUES (?, ?, ?)",
+                [(cursor.lastrowid, rank, character) for rank, character in enumerate(characters)]
+            )
+        elif table == "Characters":
+            name, lines, words = row
+            connection.execute(
+                "INSERT INTO characters (position, name, lines, words) VALUES (?, ?, ?, ?)",
+                (position + offset, name, lines, words)
+            )
+        else:
+            name, characters = row
+            cursor = connection.execute("INSERT INTO actors (position, name) VALUES (?, ?)", (position + offset, name))
+            connection.executemany(
+                "INSERT INTO casting (actor_id, position, character) VALUES (?, ?, ?)",
+                [(cursor.lastrowid, rank, character) for rank, character in enumerate(characters)]
+            )
+
+
+def apply_delta(piece: str, delta: type.Delta) -> None:
+    """ Reporte des modifications dans la base, en une transaction : seules les lignes touchées sont supprimées et insérées
+
+    Les lignes sont trouvées par l'index sur leur position ; les positions des lignes suivantes ne sont décalées
+    que si le nombre de lignes change (ajout de scène, suppression de personnage...).
+
+    Args:
+        piece (str): nom de la pièce
+        delta (type.Delta): remplacements successifs, notés par model.log_change
+    """
+
+    with connect(piece) as connection:
+        # Les remplacements sont appliqués dans l'ordre où ils ont été faits : chaque position vaut pour les lignes de ce moment
+        for table, position, old_rows, new_rows in delta:
+            table_name = TABLE_NAMES[table]
+            end = position + len(old_rows)
+            connection.execute(f"DELETE FROM {table_name} WHERE position >= ? AND position < ?", (position, end))
+            shift = len(new_rows) - len(old_rows)
+            if shift:
+                connection.execute(f"UPDATE {table_name} SET position = position + ? WHERE position >= ?", (shift, end))
+            insert_rows(connection, table, position, [json.loads(row) for row in new_rows])
+
+
+def get_rows(connection: sqlite3.Connection) -> Tuple[List[List], List[List], List[List]]:
+    """ Lit toutes les lignes de la base, dans l'ordre des fichiers csv
+
+    Args:
+        connection (sqlite3.Connection): connexion à la base
+
+    Returns:
+        Tuple[List[List], List[List], List[List]]: lignes des scènes (personnages en liste), des personnages
+        et des comédien·nes (personnages en liste)
+    """
+
+    presence: Dict[int, List[str]] = {}
+    for scene_id, character in connection.execute("SELECT scene_id, character FROM presence ORDER BY scene_id, position"):
+        presence.setdefault(scene_id, []).append(character)
+    scenes = [
+        [name, lines, didascalies, words, presence.get(scene_id, [])]
+        for scene_id, name, lines, didascalies, words
+        in connection.execute("SELECT id, name, lines, didascalies, words FROM scenes ORDER BY position")
+    ]
+
+    characters = [list(row) for row in connection.execute("SELECT name, lines, words FROM characters ORDER BY position")]
+
+    casting: Dict[int, List[str]] = {}
+    for actor_id, character in connection.execute("SELECT actor_id, character FROM casting ORDER BY actor_id, position"):
+        casting.setdefault(actor_id, []).append(character)
+    actors = [
+        [name, casting.get(actor_id, [])]
+        for actor_id, name in connection.execute("SELECT id, name FROM actors ORDER BY position")
+    ]
+
+    return scenes, characters, actors
+
+
+def load_piece(piece: str) -> Tuple[List[type.Character], List[type.Scene], List[type.Actor]]:
+    """ Charge les données d'une pièce depuis sa base de données, dans le même format que load.load_piece
+
+    Args:
+        piece (str): nom de la pièce
+
+    Returns:
+        Tuple[List[type.Character], List[type.Scene], List[type.Actor]]: informations sur la pièce
+    """
+
+    with connect(piece) as connection:
+        scene_rows, character_rows, actor_rows = get_rows(connection)
+
+    characters = [{"Name": name, "Lines": lines, "Words": words} for name, lines, words in character_rows]
+
+    characters_by_name: Dict[str, type.Character] = {}
+    for character in characters:
+        characters_by_name.setdefault(character["Name"], character)
+
+    actors = []
+    actors_of_characters: Dict[str, List[str]] = {}
+    for name, characters_played in actor_rows:
+        played = [characters_by_name[character] for character in characters_played if character in characters_by_name]
+        actors.append({
+            "Name": name,
+            "Lines": sum(character["Lines"] for character in played),
+            "Words": sum(character["Words"] for character in played),
+            "Characters": characters_played
+        })
+        for character in characters_played:
+            linked_actors = actors_of_characters.setdefault(character, [])
+            if name not in linked_actors[-1:]:
+                linked_actors.append(name)
+    if not actors:
+        actors.append({
+            "Name": "Aucun acteur enregistré",
+            "Lines": 0,
+            "Words": 0
+        })
+
+    scenes = [
+        {
+            "Scene": name,
+            "Lines": lines,
+            "Didascalies": didascalies,
+            "Words": words,
+            "Characters": characters_present,
+            "Actors": load.get_actors_linked_to_characters(actors_of_characters, characters_present)
+        }
+        for name, lines, didascalies, words, characters_present in scene_rows
+    ]
+
+    return characters, scenes, actors
+
+
+def read_csv(file_name: str) -> List[List[str]]:
+    """ Lit les lignes d'un fichier csv de la pièce, sans l'entête
+
+    Args:
+        file_name (str): nom du fichier
+
+    Returns:
+        List[List[str]]: lignes du fichier, valeurs en chaînes
+    """
+
+    with open(file_name, "r", encoding="utf-8", newline="") as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        return list(reader)
+
+
+def import_csv(piece: str) -> None:
+    """ Remplace le contenu de la base de données d'une pièce par celui de ses fichiers csv
+
+    Args:
+        piece (str): nom de la pièce
+    """
+
+    scenes = [[name, lines, didascalies, words, characters.split(":")] for name, lines, didascalies, words, characters in read_csv(utils.get_scenes_file(piece))]
+    characters = [[name, int(lines), int(words)] for name, lines, words in read_csv(utils.get_characters_file(piece))]
+    actors = [[name, characters_played.split(":")] for name, characters_played in read_csv(utils.get_actors_file(piece))]
+
+    with connect(piece) as connection:
+        for table_name in ("presence", "scenes", "characters", "casting", "actors"):
+            connection.execute(f"DELETE FROM {table_name}")
+        insert_rows(connection, "Scenes", 0, scenes)
+        insert_rows(connection, "Characters", 0, characters)
+        insert_rows(connection, "Actors", 0, actors)
+
+
+def export_csv(piece: str) -> None:
+    """ Réécrit les fichiers csv d'une pièce à partir de sa base de données
+
+    Args:
+        piece (str): nom de la pièce
+    """
+
+    with connect(piece) as connection:
+        scenes, characters, actors = get_rows(connection)
+
+    store.write_files(piece, {
+        utils.get_scenes_file(piece): store.rows_to_bytes(list(type.HEADER_SCENES.values()), [row[:4] + [":".join(row[4])] for row in scenes]),
+        utils.get_characters_file(piece): store.rows_to_bytes(list(type.HEADER_CHARACTERS.values()), characters),
+        utils.get_actors_file(piece): store.rows_to_bytes(list(type.HEADER_ACTORS.values()), [[name, ":".join(played)] for name, played in actors])
+    })
+
+
+def drop(piece: str) -> None:
+    """ Revient aux fichiers csv : ils sont réécrits depuis la base de données, qui est ensuite supprimée
+
+    Args:
+        piece (str): nom de la pièce
+    """
+
+    export_csv(piece)
+    os.remove(utils.get_database_file(piece))
@@ -0,0 +1,241 @@
+from typing import Dict, List, Tuple
+import json
+import os
+
+import load
+import model
+import store
+import type
+import utils
+
+HISTORY_LIMIT = 100 # Nombre maximum de modifications qui peuvent être annulées
+COMPACT_LINES = 300 # Nombre de lignes du journal des modifications au-delà duquel il est compacté
+
+
+def apply_change(loaded: type.Piece, table: str, position: int, old_rows: List[str], new_rows: List[str]) -> None:
+    """ Remplace des lignes de la pièce chargée par d'autres, et répercute le remplacement sur ce qui s'en déduit
+
+    Seules les lignes remplacées sont touchées, avec les entrées de l'index de présence, les liens et les totaux
+    des comédien·nes qui en dépendent.
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        table (str): "Scenes", "Characters" ou "Actors"
+        position (int): position des lignes remplacées
+        old_rows (List[str]): lignes actuelles, mises en forme par store.get_row
+        new_rows (List[str]): lignes qui les remplacent
+    """
+
+    rows = [store.parse_row(table, row) for row in new_rows]
+    nb_common = min(len(old_rows), len(rows))
+    names = {name for row in old_rows + new_rows for name in get_names(table, store.parse_row(table, row))}
+
+    for offset in range(len(old_rows) - 1, nb_common - 1, -1):
+        if table == "Scenes":
+            model.delete_scene(loaded, position + offset)
+        else:
+            model.delete_row(loaded, table, position + offset)
+
+    for offset, row in enumerate(rows):
+        if table == "Scenes":
+            row["Actors"] = load.get_actors_linked_to_characters(loaded["Links"], row["Characters"])
+            if offset < nb_common:
+                model.set_scene_names(loaded, position + offset, "Characters", row.pop("Characters"))
+                model.set_scene_names(loaded, position + offset, "Actors", row.pop("Actors"))
+                model.update_row(loaded, table, position + offset, **row)
+            else:
+                model.insert_scene(loaded, position + offset, row)
+        elif offset < nb_common:
+            model.update_row(loaded, table, position + offset, **row)
+        else:
+            model.insert_row(loaded, table, position + offset, {"Lines": 0, "Words": 0, **row})
+
+    if table == "Characters":
+        model.characters_changed(loaded, names)
+    elif table == "Actors":
+        model.links_changed(loaded, names)
+        model.refresh_actor_totals(loaded, [row["Name"] for row in rows])
+
+    model.mark_dirty(loaded, model.DIRTY_TABLES[table])
+
+
+def get_names(table: str, row: Dict) -> List[str]:
+    """ Donne les personnages concernés par une ligne : le personnage lui-même, ou ceux d'un·e comédien·ne
+
+    Args:
+        table (str): "Scenes", "Characters" ou "Actors"
+        row (Dict): ligne relue par store.parse_row
+
+    Returns:
+        List[str]: noms des personnages (aucun pour une scène : l'index est tenu à jour par model)
+    """
+
+    if table == "Characters":
+        return [row["Name"]]
+    if table == "Actors":
+        return row["Characters"]
+    return []
+
+
+def take_changes(loaded: type.Piece) -> type.Delta:
+    """ Reprend les lignes remplacées depuis le dernier appel, et met à jour l'empreinte de la pièce en ne regardant qu'elles
+
+    Args:
+        loaded (type.Piece): pièce chargée
+
+    Returns:
+        type.Delta: remplacements successifs
+    """
+
+    history = loaded["History"]
+    changes, loaded["Changes"] = loaded["Changes"], []
+    for change in changes:
+        history["State"] = store.update_fingerprint(history["State"], change)
+    return [(table, position, old_rows, new_rows) for table, position, old_rows, new_rows, _, _ in changes]
+
+
+def append_log(loaded: type.Piece, entry: Dict) -> None:
+    """ Ajoute une ligne au journal des modifications de la pièce, et le compacte s'il devient trop long
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        entry (Dict): ligne à ajouter
+    """
+
+    history = loaded["History"]
+    if history["Lines"] >= COMPACT_LINES:
+        compact(loaded)
+
+    entry["State"] = history["State"]
+    with open(utils.get_history_file(loaded["Name"]), "a", encoding="utf-8") as file:
+        file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    history["Lines"] += 1
+
+
+def compact(loaded: type.Piece) -> None:
+    """ Réécrit le journal des modifications avec seulement ce qui peut encore être annulé ou rétabli
+
+    Args:
+        loaded (type.Piece): pièce chargée
+    """
+
+    history = loaded["History"]
+    del history["Undo"][:-HISTORY_LIMIT]
+    del history["Redo"][:-HISTORY_LIMIT]
+
+    # Les modifications rétablissables sont rejouées puis annulées, ce qui redonne les deux piles
+    entries = [{"Do": label, "Delta": delta} for label, delta in history["Undo"] + history["Redo"][::-1]]
+    entries += [{"Undo": True} for _ in history["Redo"]]
+    for entry in entries:
+        entry["State"] = None
+    if entries:
+        entries[-1]["State"] = history["State"]
+
+    content = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+    store.write_file(utils.get_history_file(loaded["Name"]), content.encode("utf-8"), durable=False)
+    history["Lines"] = len(entries)
+
+
+def attach(loaded: type.Piece) -> None:
+    """ Prépare l'annulation des modifications d'une pièce chargée, en reprenant son journal s'il correspond encore aux csv
+
+    Args:
+        loaded (type.Piece): pièce chargée
+    """
+
+    history = {"State": store.get_fingerprint(loaded), "Undo": [], "Redo": [], "Lines": 0}
+    loaded["History"] = history
+    loaded["Changes"].clear()
+
+    undo: List[Tuple[str, type.Delta]] = []
+    redo: List[Tuple[str, type.Delta]] = []
+    state = None
+    nb_lines = 0
+    try:
+        with open(utils.get_history_file(loaded["Name"]), "r", encoding="utf-8") as file:
+            for line in file:
+                entry = json.loads(line)
+                if "Do" in entry:
+                    undo.append((entry["Do"], [tuple(change) for change in entry["Delta"]]))
+                    redo.clear()
+                elif "Undo" in entry and undo:
+                    redo.append(undo.pop())
+                elif "Redo" in entry and redo:
+                    undo.append(redo.pop())
+                state = entry["State"]
+                nb_lines += 1
+    except (OSError, ValueError, KeyError):
+        state = None # Journal absent ou abîmé
+
+    # Un journal qui ne correspond pas aux csv (modifiés par rd ou à la main) ne peut pas être rejoué
+    if state == history["State"]:
+        history["Undo"], history["Redo"], history["Lines"] = undo, redo, nb_lines
+    elif os.path.exists(utils.get_history_file(loaded["Name"])):
+        compact(loaded)
+
+
+def record(loaded: type.Piece, label: str) -> None:
+    """ Enregistre la dernière modification de la pièce chargée pour pouvoir l'annuler
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        label (str): description de la modification (commande)
+    """
+
+    history = loaded["History"]
+    delta = take_changes(loaded)
+    if not delta:
+        return
+
+    history["Undo"].append((label, delta))
+    history["Redo"].clear()
+    append_log(loaded, {"Do": label, "Delta": delta})
+
+    if len(history["Undo"]) > 2 * HISTORY_LIMIT:
+        compact(loaded)
+
+
+def undo(loaded: type.Piece) -> str:
+    """ Annule la dernière modification
+
+    Args:
+        loaded (type.Piece): pièce chargée
+
+    Returns:
+        str: description de la modification annulée, ou None s'il n'y a rien à annuler
+    """
+
+    history = loaded["History"]
+    if not history["Undo"]:
+        return None
+
+    label, delta = history["Undo"].pop()
+    for table, position, old_rows, new_rows in reversed(delta):
+        apply_change(loaded, table, position, new_rows, old_rows)
+    take_changes(loaded)
+    history["Redo"].append((label, delta))
+    append_log(loaded, {"Undo": True})
+    return label
+
+
+def redo(loaded: type.Piece) -> str:
+    """ Rétablit la dernière modification annulée
+
+    Args:
+        loaded (type.Piece): pièce chargée
+
+    Returns:
+        str: description de la modification rétablie, ou None s'il n'y a rien à rétablir
+    """
+
+    history = loaded["History"]
+    if not history["Redo"]:
+        return None
+
+    label, delta = history["Redo"].pop()
+    for table, position, old_rows, new_rows in delta:
+        apply_change(loaded, table, position, old_rows, new_rows)
+    take_changes(loaded)
+    history["Undo"].append((label, delta))
+    append_log(loaded, {"Redo": True})
+    return label
@@ -0,0 +1,144 @@
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import type
+
+KINDS = ("Characters", "Actors") # Clés des scènes indexées (personnages et comédien·nes)
+
+
+def build_index(scenes: List[type.Scene]) -> Dict[str, Dict[str, int]]:
+    """ Construit l'index de présence : pour chaque personnage et chaque comédien·ne, un masque de bits sur les positions des scènes
+
+    Args:
+        scenes (List[type.Scene]): liste des scènes
+
+    Returns:
+        Dict[str, Dict[str, int]]: masques des personnages ("Characters") et des comédien·nes ("Actors"), par nom
+    """
+
+    index: Dict[str, Dict[str, int]] = {kind: {} for kind in KINDS}
+    for kind in KINDS:
+        masks = index[kind]
+        for position, scene in enumerate(scenes):
+            bit = 1 << position
+            for name in scene[kind]:
+                if name:
+                    masks[name] = masks.get(name, 0) | bit
+    return index
+
+
+def get_mask(masks: Dict[str, int], names: Iterable[str], nb_scenes: int) -> int:
+    """ Donne le masque des scènes où tous les noms donnés sont présents
+
+    Args:
+        masks (Dict[str, int]): masques des personnages ou des comédien·nes
+        names (Iterable[str]): noms recherchés
+        nb_scenes (int): nombre de scènes de la pièce
+
+    Returns:
+        int: masque des scènes communes (toutes les scènes si aucun nom n'est donné)
+    """
+
+    mask = (1 << nb_scenes) - 1
+    for name in names:
+        mask &= masks.get(name, 0)
+    return mask
+
+
+def iter_positions(mask: int) -> Iterator[int]:
+    """ Parcourt les positions des bits à 1 d'un masque, dans l'ordre croissant
+
+    Args:
+        mask (int): masque de scènes
+
+    Yields:
+        int: position d'une scène
+    """
+
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+def count(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+def update_scene(index: Dict[str, Dict[str, int]], kind: str, position: int, old_names: Iterable[str], new_names: Iterable[str]) -> None:
+    """ Répercute sur l'index le changement des personnages ou des comédien·nes d'une scène
+
+    Args:
+        index (Dict[str, Dict[str, int]]): index de présence
+        kind (str): "Characters" ou "Actors"
+        position (int): position de la scène
+        old_names (Iterable[str]): noms présents avant la modification
+        new_names (Iterable[str]): noms présents après la modification
+    """
+
+    masks = index[kind]
+    bit = 1 << position
+    old_names, new_names = set(old_names), set(new_names)
+
+    for name in old_names - new_names:
+        if name in masks:
+            masks[name] &= ~bit
+            if not masks[name]:
+                del masks[name]
+
+    for name in new_names - old_names:
+        if name:
+            masks[name] = masks.get(name, 0) | bit
+
+
+def insert_scene(index: Dict[str, Dict[str, int]], position: int) -> None:
+    """ Décale les masques pour faire de la place à une scène insérée à une position
+
+    Args:
+        index (Dict[str, Dict[str, int]]): index de présence
+        position (int): position de la nouvelle scène
+    """
+
+    below = (1 << position) - 1
+    for masks in index.values():
+        for name, mask in masks.items():
+            masks[name] = (mask & below) | (mask >> position << (position + 1))
+
+
+def delete_scene(index: Dict[str, Dict[str, int]], position: int) -> None:
+    """ Décale les masques pour retirer la place d'une scène supprimée (ses noms doivent déjà être retirés avec update_scene)
+
+    Args:
+        index (Dict[str, Dict[str, int]]): index de présence
+        position (int): position de la scène supprimée
+    """
+
+    below = (1 << position) - 1
+    for masks in index.values():
+        for name, mask in masks.items():
+            masks[name] = (mask & below) | (mask >> (position + 1) << position)
+
+
+def build_copresence(scenes: List[type.Scene], kind: str) -> Dict[str, Dict[str, Tuple[int, int]]]:
+    """ Compte, en un seul parcours des scènes, les scènes et les mots partagés par chaque paire de personnages (ou de comédien·nes)
+
+    Args:
+        scenes (List[type.Scene]): liste des scènes
+        kind (str): "Characters" ou "Actors"
+
+    Returns:
+        Dict[str, Dict[str, Tuple[int, int]]]: pour chaque nom, nombre de scènes et nombre de mots partagés avec chaque autre nom
+        (seules les paires qui partagent au moins une scène sont présentes)
+    """
+
+    shared: Dict[str, Dict[str, List[int]]] = {}
+    for scene in scenes:
+        names = sorted({name for name in scene[kind] if name})
+        nb_words = int(scene["Words"])
+        for i, name in enumerate(names):
+            row = shared.setdefault(name, {})
+            for other in names[:i] + names[i + 1:]:
+                counts = row.setdefault(other, [0, 0])
+                counts[0] += 1
+                counts[1] += nb_words
+
+    return {name: {other: (counts[0], counts[1]) for other, counts in row.items()} for name, row in shared.items()}
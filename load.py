@@ -1,9 +1,20 @@
-from typing import List
+from typing import Dict, List, Tuple
+import array
 import csv
+import hashlib
+import os
+import pickle
+import struct
+import sys
+import time
 
+import store
 import utils
 import type
 
+SNAPSHOT_VERSION = 1
+RACY_DELAY_NS = 2_000_000_000 # Une écriture aussi proche du cliché peut ne pas avoir changé la date de modification
+
 
 def get_characters(piece: str) -> List[type.Character]:
     """ Récupère les données des personnages depuis le fichier CSV
@@ -40,13 +51,14 @@ def get_scenes(piece: str) -> List[type.Scene]:
     """
     
     scenes_file = utils.get_scenes_file(piece)
+    actors_of_characters = get_actors_of_characters(piece)
     
     scenes = []
     with open(scenes_file, mode='r', encoding='utf-8') as file:
         reader = csv.DictReader(file)
         for row in reader:
             list_characters = row[type.HEADER_SCENES["Characters"]].split(":")
-            list_actors = get_actors_linked_to_characters(piece, list_characters)
+            list_actors = get_actors_linked_to_characters(actors_of_characters, list_characters)
             
             scenes.append({
                 'Scene': row[type.HEADER_SCENES["SceneName"]],
@@ -60,27 +72,95 @@ def get_scenes(piece: str) -> List[type.Scene]:
     return scenes
 
 
-def get_actors_linked_to_characters(piece: str, list_characters: List[str]) -> List[str]:
-    """ Donne la liste de comédien·nes lié·es à une liste de personnages
+def get_actors_of_characters(piece: str) -> Dict[str, List[str]]:
+    """ Construit l'index inversé personnage -> comédien·nes à partir du fichier des comédien·nes
 
     Args:
         piece (str): nom de la pièce
-        list_characters (List[str]): liste des personnages
 
     Returns:
-        List[str]: liste des comédien·nes
+        Dict[str, List[str]]: comédien·nes jouant chaque personnage, dans l'ordre du fichier
     """
     
     actors_file = utils.get_actors_file(piece)
     
-    list_actors = []
+    actors_of_characters: Dict[str, List[str]] = {}
     with open(actors_file, "r", encoding="utf-8") as file:
         reader = csv.DictReader(file)
-        rows = list(reader)
-        for character in list_characters:
-            for row in rows:
-                if character in row[type.HEADER_ACTORS["CharactersPlayed"]].split(":"):
-                    list_actors.append(row[type.HEADER_ACTORS["ActorName"]])
+        for row in reader:
+            actor_name = row[type.HEADER_ACTORS["ActorName"]]
+            for character in row[type.HEADER_ACTORS["CharactersPlayed"]].split(":"):
+                linked_actors = actors_of_characters.setdefault(character, [])
+                if actor_name not in linked_actors[-1:]:
+                    linked_actors.append(actor_name)
+    return actors_of_characters
+
+
+def get_sessions(file_name: str) -> List[type.Session]:
+    """ Récupère les séances de répétition et les comédien·nes disponibles depuis un fichier CSV
+
+    Une ValueError est levée si le nombre maximum de mots d'une séance n'est pas un entier positif.
+
+    Args:
+        file_name (str): nom du fichier (colonnes SessionName, Actors séparés par ":", MaxWords vide s'il n'y a pas de limite)
+
+    Returns:
+        List[type.Session]: liste des séances, dans l'ordre du fichier
+    """
+    
+    sessions = []
+    with open(file_name, "r", encoding="utf-8") as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            name = row[type.HEADER_SESSIONS["SessionName"]]
+            max_words = (row.get(type.HEADER_SESSIONS["MaxWords"]) or "").strip()
+            if max_words and not max_words.isdecimal():
+                raise ValueError(f"Le nombre maximum de mots de la séance '{name}' doit être un entier positif ('{max_words}')")
+            sessions.append({
+                "Name": name,
+                "Actors": [actor for actor in row[type.HEADER_SESSIONS["Actors"]].split(":") if actor],
+                "MaxWords": int(max_words) if max_words else None
+            })
+    return sessions
+
+
+def get_mapping(file_name: str) -> List[Tuple[str, str, List[str]]]:
+    """ Récupère une liste de modifications à appliquer en une fois depuis un fichier CSV
+
+    Args:
+        file_name (str): nom du fichier (colonnes Operation (rn, mg ou dl), Name et Targets séparés par ":")
+
+    Returns:
+        List[Tuple[str, str, List[str]]]: opération, nom concerné et noms cibles, dans l'ordre du fichier
+    """
+    
+    operations = []
+    with open(file_name, "r", encoding="utf-8") as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            targets = row.get(type.HEADER_MAPPING["Targets"]) or ""
+            operations.append((
+                row[type.HEADER_MAPPING["Operation"]].strip(),
+                row[type.HEADER_MAPPING["Name"]],
+                [target for target in targets.split(":") if target]
+            ))
+    return operations
+
+
+def get_actors_linked_to_characters(actors_of_characters: Dict[str, List[str]], list_characters: List[str]) -> List[str]:
+    """ Donne la liste de comédien·nes lié·es à une liste de personnages
+
+    Args:
+        actors_of_characters (Dict[str, List[str]]): index personnage -> comédien·nes
+        list_characters (List[str]): liste des personnages
+
+    Returns:
+        List[str]: liste des comédien·nes
+    """
+    
+    list_actors = []
+    for character in list_characters:
+        list_actors.extend(actors_of_characters.get(character, []))
     return list_actors
             
 
@@ -97,6 +177,10 @@ def get_actors(piece: str, characters: List[type.Character]) -> List[type.Actor]
     
     actors_file = utils.get_actors_file(piece)
     
+    characters_by_name: Dict[str, type.Character] = {}
+    for character in characters:
+        characters_by_name.setdefault(character["Name"], character)
+    
     actors = []
     with open(actors_file, "r", encoding="utf-8") as file:
         reader = csv.DictReader(file)
@@ -106,9 +190,10 @@ def get_actors(piece: str, characters: List[type.Character]) -> List[type.Actor]
             
             characters_played = row[type.HEADER_ACTORS["CharactersPlayed"]].split(":")
             for character_played in characters_played:
-                character = next((c for c in characters if c["Name"] == character_played), None)            
-                total_lines += character["Lines"]
-                total_words += character["Words"]
+                character = characters_by_name.get(character_played)
+                if character:
+                    total_lines += character["Lines"]
+                    total_words += character["Words"]
 
             actors.append({
                 "Name": row[type.HEADER_ACTORS["ActorName"]],
@@ -122,4 +207,245 @@ def get_actors(piece: str, characters: List[type.Character]) -> List[type.Actor]
             "Lines": 0,
             "Words": 0
         })
-    return actors
\ No newline at end of file
+    return actors
+
+
+def get_csv_files(piece: str) -> List[str]:
+    return [utils.get_scenes_file(piece), utils.get_characters_file(piece), utils.get_actors_file(piece)]
+
+
+def get_csv_signature(piece: str) -> List[Tuple[int, int]]:
+    """ Donne la date de modification et la taille de chaque fichier csv d'une pièce
+
+    Args:
+        piece (str): nom de la pièce
+
+    Returns:
+        List[Tuple[int, int]]: date de modification (en ns) et taille de chaque fichier
+    """
+    
+    signature = []
+    for file_name in get_csv_files(piece):
+        stat = os.stat(file_name)
+        signature.append((stat.st_mtime_ns, stat.st_size))
+    return signature
+
+
+def get_csv_hash(piece: str) -> str:
+    """ Calcule une empreinte du contenu des fichiers csv d'une pièce
+
+    Args:
+        piece (str): nom de la pièce
+
+    Returns:
+        str: empreinte du contenu des trois fichiers
+    """
+    
+    digest = hashlib.blake2b(digest_size=16)
+    for file_name in get_csv_files(piece):
+        with open(file_name, "rb") as file:
+            content = file.read()
+        digest.update(len(content).to_bytes(8, "little"))
+        digest.update(content)
+    return digest.hexdigest()
+
+
+def read_snapshot(piece: str) -> Dict:
+    """ Lit le cliché binaire d'une pièce s'il existe et correspond à la version courante
+
+    Args:
+        piece (str): nom de la pièce
+
+    Returns:
+        Dict: contenu du cliché, ou None s'il est absent ou illisible
+    """
+    
+    try:
+        with open(utils.get_snapshot_file(piece), "rb") as file:
+            snapshot = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+    
+    if not isinstance(snapshot, dict) or snapshot.get("Version") != SNAPSHOT_VERSION:
+        return None
+    return snapshot
+
+
+def write_snapshot(piece: str, characters: List[type.Character], scenes: List[type.Scene], actors: List[type.Actor], signature: List[Tuple[int, int]], csv_hash: str) -> None:
+    """ Écrit le cliché binaire d'une pièce à côté de ses fichiers csv
+
+    Args:
+        piece (str): nom de la pièce
+        characters (List[type.Character]): liste des personnages
+        scenes (List[type.Scene]): liste des scènes
+        actors (List[type.Actor]): liste des comédien·nes
+        signature (List[Tuple[int, int]]): dates de modification et tailles des csv lus
+        csv_hash (str): empreinte des csv lus
+    """
+    
+    snapshot_file = utils.get_snapshot_file(piece)
+    snapshot = {
+        "Version": SNAPSHOT_VERSION,
+        "Written": time.time_ns(),
+        "Signature": signature,
+        "Hash": csv_hash,
+        "Characters": characters,
+        "Scenes": scenes,
+        "Actors": actors
+    }
+    
+    try:
+        store.write_file(snapshot_file, pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL), durable=False)
+    except OSError:
+        pass # Le cliché n'est qu'un cache : la pièce reste lisible depuis les csv
+
+
+def snapshot_is_valid(piece: str, snapshot: Dict) -> bool:
+    """ Vérifie que le cliché correspond encore aux fichiers csv
+
+    Args:
+        piece (str): nom de la pièce
+        snapshot (Dict): contenu du cliché
+
+    Returns:
+        bool: retourne True si le cliché peut être utilisé à la place des csv
+    """
+    
+    signature = get_csv_signature(piece)
+    if [tuple(file_signature) for file_signature in snapshot["Signature"]] == signature:
+        racy = any(mtime >= snapshot["Written"] - RACY_DELAY_NS for mtime, _ in signature)
+        if not racy:
+            return True
+    
+    if get_csv_hash(piece) == snapshot["Hash"]:
+        # Le contenu n'a pas changé : on met à jour les dates enregistrées pour les prochains chargements
+        write_snapshot(piece, snapshot["Characters"], snapshot["Scenes"], snapshot["Actors"], signature, snapshot["Hash"])
+        return True
+    
+    return False
+
+
+def load_piece(piece: str) -> Tuple[List[type.Character], List[type.Scene], List[type.Actor]]:
+    """ Charge les données d'une pièce depuis son cliché binaire, ou depuis les csv si celui-ci est périmé
+
+    Args:
+        piece (str): nom de la pièce
+
+    Returns:
+        Tuple[List[type.Character], List[type.Scene], List[type.Actor]]: informations sur la pièce
+    """
+    
+    snapshot = read_snapshot(piece)
+    if snapshot and snapshot_is_valid(piece, snapshot):
+        return snapshot["Characters"], snapshot["Scenes"], snapshot["Actors"]
+    
+    # L'empreinte est prise avant la lecture : une écriture concurrente rendra le cliché périmé
+    signature = get_csv_signature(piece)
+    csv_hash = get_csv_hash(piece)
+    
+    characters = get_characters(piece)
+    scenes = get_scenes(piece)
+    actors = get_actors(piece, characters)
+    
+    write_snapshot(piece, characters, scenes, actors, signature, csv_hash)
+    
+    return characters, scenes, actors
+
+
+def get_matrix(piece: str) -> type.Matrix:
+    """ Récupère la matrice scènes x personnages des répliques et des mots, calculée lors de la lecture du texte
+
+    Args:
+        piece (str): nom de la pièce
+
+    Returns:
+        type.Matrix: noms des scènes ("Scenes") et des personnages ("Characters"), et tableaux "Lines" et "Words"
+        rangés scène par scène, ou None si la matrice n'existe pas
+    """
+    
+    try:
+        with open(utils.get_matrix_file(piece), "rb") as file:
+            if file.read(len(type.MATRIX_MAGIC)) != type.MATRIX_MAGIC:
+                return None
+            version, nb_scenes, nb_characters = struct.unpack("<III", file.read(12))
+            if version != type.MATRIX_VERSION:
+                return None
+            
+            names = []
+            for _ in range(nb_scenes + nb_characters):
+                (length,) = struct.unpack("<I", file.read(4))
+                names.append(file.read(length).decode("utf-8"))
+            
+            lines = array.array(type.MATRIX_TYPECODE)
+            words = array.array(type.MATRIX_TYPECODE)
+            lines.fromfile(file, nb_scenes * nb_characters)
+            words.fromfile(file, nb_scenes * nb_characters)
+    except (OSError, EOFError, struct.error):
+        return None
+    
+    if sys.byteorder != "little":
+        lines.byteswap()
+        words.byteswap()
+    
+    return {
+        "Scenes": names[:nb_scenes],
+        "Characters": names[nb_scenes:],
+        "Lines": lines,
+        "Words": words
+    }
+
+
+def get_act_range(matrix: type.Matrix, act: str) -> Tuple[int, int]:
+    """ Donne les lignes de la matrice correspondant aux scènes d'un acte
+
+    Args:
+        matrix (type.Matrix): matrice de la pièce
+        act (str): numéro de l'acte (None pour toute la pièce)
+
+    Returns:
+        Tuple[int, int]: première ligne et ligne suivant la dernière (vide si l'acte n'existe pas)
+    """
+    
+    if act is None:
+        return 0, len(matrix["Scenes"])
+    
+    rows = [row for row, scene in enumerate(matrix["Scenes"]) if scene.split(":")[0] == act]
+    if not rows:
+        return 0, 0
+    return rows[0], rows[-1] + 1
+
+
+def get_character_column(matrix: type.Matrix, field: str, character: str, act: str = None) -> array.array:
+    """ Donne les répliques ou les mots d'un personnage scène par scène, par une simple tranche du tableau
+
+    Args:
+        matrix (type.Matrix): matrice de la pièce
+        field (str): "Lines" ou "Words"
+        character (str): nom du personnage
+        act (str): restreint aux scènes d'un acte si cet argument est donné
+
+    Returns:
+        array.array: valeurs du personnage pour chaque scène concernée
+    """
+    
+    nb_characters = len(matrix["Characters"])
+    column = matrix["Characters"].index(character)
+    first_row, last_row = get_act_range(matrix, act)
+    return matrix[field][first_row * nb_characters + column:last_row * nb_characters:nb_characters]
+
+
+def get_scene_row(matrix: type.Matrix, field: str, scene: str) -> array.array:
+    """ Donne les répliques ou les mots de chaque personnage dans une scène
+
+    Args:
+        matrix (type.Matrix): matrice de la pièce
+        field (str): "Lines" ou "Words"
+        scene (str): nom de la scène
+
+    Returns:
+        array.array: valeurs de la scène, dans l'ordre des personnages de la matrice
+    """
+    
+    nb_characters = len(matrix["Characters"])
+    row = matrix["Scenes"].index(scene)
+    return matrix[field][row * nb_characters:(row + 1) * nb_characters]
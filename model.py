@@ -0,0 +1,533 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Tuple
+import os
+import threading
+
+import data
+import database
+import index
+import load
+import store
+import type
+import utils
+
+IDLE_FLUSH_DELAY = 5 # Secondes d'inactivité avant l'écriture des modifications en attente
+
+LOCK = threading.RLock() # Protège les pièces chargées entre la boucle principale et l'écriture différée
+_timers: Dict[str, threading.Timer] = {}
+
+DIRTY_TABLES = {"Scenes": "sc", "Characters": "ch", "Actors": "ac"} # Fichier noté à réécrire pour chaque table
+MODIFYING_COMMANDS = {"nw", "rn", "ad", "mg", "sp", "dl", "bk", "lk", "ul", "dc"} # Commandes qui peuvent être annulées avec u
+
+MEMORY_BUDGET = 512 * 1024 * 1024 # Taille estimée (en octets) au-delà de laquelle les pièces les moins récemment utilisées sont retirées de la mémoire
+MEMORY_FACTOR = 36 # Rapport mesuré entre la mémoire occupée par une pièce chargée (avec son historique) et la taille de ses csv
+_cache: "OrderedDict[str, type.Piece]" = OrderedDict() # Pièces chargées, de la moins récemment utilisée à la plus récente
+
+
+def open_piece(piece: str) -> type.Piece:
+    """ Charge une pièce en mémoire pour pouvoir l'analyser et la modifier
+
+    Args:
+        piece (str): nom de la pièce
+
+    Returns:
+        type.Piece: pièce chargée, avec ses personnages, scènes, comédien·nes, l'index personnage -> comédien·nes
+        et l'index de présence dans les scènes
+    """
+
+    store.recover(piece)
+    # Les dates sont prises avant la lecture : une écriture concurrente rendra la pièce périmée
+    mtimes = data.get_mtimes(piece)
+    if database.exists(piece):
+        backend = "sqlite"
+        characters, scenes, actors = database.load_piece(piece)
+    else:
+        backend = "csv"
+        characters, scenes, actors = load.load_piece(piece)
+    actors = [actor for actor in actors if "Characters" in actor] # Sans la ligne « Aucun acteur enregistré »
+
+    loaded = {
+        "Name": piece,
+        "Backend": backend,
+        "Characters": characters,
+        "Scenes": scenes,
+        "Actors": actors,
+        "Links": build_links(actors),
+        "Index": index.build_index(scenes),
+        "Copresence": {},
+        "Dirty": set(),
+        "Changes": [], # Lignes remplacées depuis le dernier enregistrement dans l'historique
+        "Unsynced": [], # Lignes remplacées depuis la dernière écriture dans la base de données
+        "Mtimes": mtimes
+    }
+    return loaded
+
+
+def estimate_size(piece: str) -> int:
+    """ Estime la mémoire occupée par une pièce chargée à partir de la taille de ses fichiers csv, sans parcourir ses données
+
+    Args:
+        piece (str): nom de la pièce
+
+    Returns:
+        int: taille estimée en octets
+    """
+
+    size = 0
+    for file_name in (utils.get_scenes_file(piece), utils.get_characters_file(piece), utils.get_actors_file(piece)):
+        try:
+            size += os.path.getsize(file_name)
+        except OSError:
+            pass
+    return size * MEMORY_FACTOR
+
+
+def get_cached(piece: str) -> type.Piece:
+    """ Donne une pièce gardée en mémoire, si ses fichiers n'ont pas changé depuis son chargement
+
+    Args:
+        piece (str): nom de la pièce
+
+    Returns:
+        type.Piece: pièce chargée, ou None si elle doit être (re)chargée
+    """
+
+    with LOCK:
+        loaded = _cache.get(piece)
+        if loaded is None:
+            return None
+
+        # Les modifications en attente l'emportent sur les fichiers, comme pour une pièce qui n'a pas quitté la mémoire
+        if not loaded["Dirty"] and loaded["Mtimes"] != data.get_mtimes(piece):
+            del _cache[piece]
+            return None
+
+        _cache.move_to_end(piece)
+        return loaded
+
+
+def cache_piece(loaded: type.Piece) -> None:
+    """ Garde une pièce chargée en mémoire, et retire les pièces les moins récemment utilisées si le budget est dépassé
+
+    Args:
+        loaded (type.Piece): pièce chargée
+    """
+
+    with LOCK:
+        loaded["Size"] = estimate_size(loaded["Name"])
+        _cache[loaded["Name"]] = loaded
+        _cache.move_to_end(loaded["Name"])
+        shrink_cache()
+
+
+def shrink_cache() -> None:
+    """ Retire de la mémoire les pièces les moins récemment utilisées (après avoir écrit leurs modifications) tant que le budget est dépassé
+    """
+
+    with LOCK:
+        while len(_cache) > 1 and sum(loaded["Size"] for loaded in _cache.values()) > MEMORY_BUDGET:
+            _, evicted = _cache.popitem(last=False)
+            flush(evicted)
+
+
+def set_memory_budget(budget: int) -> None:
+    """ Change la taille estimée au-delà de laquelle des pièces sont retirées de la mémoire, et l'applique tout de suite
+
+    Args:
+        budget (int): nouveau budget (en octets)
+    """
+
+    global MEMORY_BUDGET
+    MEMORY_BUDGET = budget
+    shrink_cache()
+
+
+def get_cached_pieces() -> List[type.Piece]:
+    """ Donne les pièces gardées en mémoire
+
+    Returns:
+        List[type.Piece]: pièces chargées, de la moins récemment utilisée à la plus récente
+    """
+
+    with LOCK:
+        return list(_cache.values())
+
+
+def forget(piece: str) -> None:
+    """ Retire une pièce de la mémoire en abandonnant ses modifications en attente (pièce supprimée)
+
+    Args:
+        piece (str): nom de la pièce
+    """
+
+    with LOCK:
+        loaded = _cache.pop(piece, None)
+        if loaded:
+            discard(loaded)
+
+
+def flush_all() -> None:
+    """ Écrit les modifications en attente de toutes les pièces gardées en mémoire
+    """
+
+    with LOCK:
+        for loaded in list(_cache.values()):
+            flush(loaded)
+
+
+def build_links(actors: List[type.Actor]) -> Dict[str, List[str]]:
+    """ Construit l'index personnage -> comédien·nes à partir des comédien·nes chargé·es
+
+    Args:
+        actors (List[type.Actor]): liste des comédien·nes
+
+    Returns:
+        Dict[str, List[str]]: comédien·nes jouant chaque personnage, dans l'ordre du fichier
+    """
+
+    links: Dict[str, List[str]] = {}
+    for actor in actors:
+        for character in actor["Characters"]:
+            linked_actors = links.setdefault(character, [])
+            if actor["Name"] not in linked_actors[-1:]:
+                linked_actors.append(actor["Name"])
+    return links
+
+
+def find(rows: List[Dict], name: str, key: str = "Name") -> int:
+    """ Donne la position d'une ligne à partir de son nom
+
+    Args:
+        rows (List[Dict]): personnages, scènes ou comédien·nes
+        name (str): nom recherché
+        key (str): clé contenant le nom ("Scene" pour les scènes)
+
+    Returns:
+        int: position de la ligne, ou -1 si elle n'existe pas
+    """
+
+    for position, row in enumerate(rows):
+        if row[key] == name:
+            return position
+    return -1
+
+
+def set_scene_names(loaded: type.Piece, position: int, kind: str, names: List[str]) -> None:
+    """ Remplace les personnages ou les comédien·nes d'une scène en tenant l'index de présence à jour
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        position (int): position de la scène
+        kind (str): "Characters" ou "Actors"
+        names (List[str]): nouveaux noms
+    """
+
+    scene = loaded["Scenes"][position]
+    if kind == "Characters": # Les comédien·nes d'une scène se déduisent des liens : ils ne sont pas dans la ligne
+        old_row = store.get_row("Scenes", scene)
+    index.update_scene(loaded["Index"], kind, position, scene[kind], names)
+    scene[kind] = names
+    loaded["Copresence"].pop(kind, None)
+    if kind == "Characters":
+        log_change(loaded, "Scenes", position, [old_row], [store.get_row("Scenes", scene)])
+
+
+def insert_scene(loaded: type.Piece, position: int, scene: type.Scene) -> None:
+    """ Insère une scène à une position en tenant l'index de présence à jour
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        position (int): position de la nouvelle scène
+        scene (type.Scene): nouvelle scène
+    """
+
+    loaded["Scenes"].insert(position, scene)
+    index.insert_scene(loaded["Index"], position)
+    for kind in index.KINDS:
+        index.update_scene(loaded["Index"], kind, position, [], scene[kind])
+    loaded["Copresence"].clear()
+    log_change(loaded, "Scenes", position, [], [store.get_row("Scenes", scene)])
+
+
+def delete_scene(loaded: type.Piece, position: int) -> type.Scene:
+    """ Supprime la scène d'une position en tenant l'index de présence à jour
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        position (int): position de la scène
+
+    Returns:
+        type.Scene: scène supprimée
+    """
+
+    scene = loaded["Scenes"][position]
+    for kind in index.KINDS:
+        index.update_scene(loaded["Index"], kind, position, scene[kind], [])
+    index.delete_scene(loaded["Index"], position)
+    loaded["Scenes"].pop(position)
+    loaded["Copresence"].clear()
+    log_change(loaded, "Scenes", position, [store.get_row("Scenes", scene)], [])
+    return scene
+
+
+def update_row(loaded: type.Piece, table: str, position: int, **values) -> None:
+    """ Modifie une ligne en notant son ancien et son nouveau contenu (les personnages d'une scène sont modifiés avec set_scene_names)
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        table (str): "Scenes", "Characters" ou "Actors"
+        position (int): position de la ligne
+        values: nouvelles valeurs, par clé
+    """
+
+    row = loaded[table][position]
+    old_row = store.get_row(table, row)
+    row.update(values)
+    new_row = store.get_row(table, row)
+    if new_row != old_row:
+        log_change(loaded, table, position, [old_row], [new_row])
+
+
+def insert_row(loaded: type.Piece, table: str, position: int, row: Dict) -> None:
+    """ Insère un personnage ou un·e comédien·ne (les scènes sont insérées avec insert_scene)
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        table (str): "Characters" ou "Actors"
+        position (int): position de la nouvelle ligne
+        row (Dict): nouvelle ligne
+    """
+
+    loaded[table].insert(position, row)
+    log_change(loaded, table, position, [], [store.get_row(table, row)])
+
+
+def delete_row(loaded: type.Piece, table: str, position: int) -> Dict:
+    """ Supprime un personnage ou un·e comédien·ne (les scènes sont supprimées avec delete_scene)
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        table (str): "Characters" ou "Actors"
+        position (int): position de la ligne
+
+    Returns:
+        Dict: ligne supprimée
+    """
+
+    row = loaded[table].pop(position)
+    log_change(loaded, table, position, [store.get_row(table, row)], [])
+    return row
+
+
+def delete_rows(loaded: type.Piece, table: str, condition: Callable[[Dict], bool]) -> List[Dict]:
+    """ Supprime les personnages ou les comédien·nes qui vérifient une condition
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        table (str): "Characters" ou "Actors"
+        condition (Callable[[Dict], bool]): condition sur une ligne
+
+    Returns:
+        List[Dict]: lignes supprimées, dans l'ordre
+    """
+
+    # Les lignes sont supprimées en partant de la fin pour que les positions des précédentes restent justes
+    rows = loaded[table]
+    return [delete_row(loaded, table, position) for position in range(len(rows) - 1, -1, -1) if condition(rows[position])][::-1]
+
+
+def log_change(loaded: type.Piece, table: str, position: int, old_rows: List[str], new_rows: List[str]) -> None:
+    """ Note un remplacement de lignes déjà fait, pour l'historique des modifications et pour la base de données
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        table (str): "Scenes", "Characters" ou "Actors"
+        position (int): position des lignes remplacées
+        old_rows (List[str]): anciennes lignes, mises en forme par store.get_row
+        new_rows (List[str]): nouvelles lignes, mises en forme par store.get_row
+    """
+
+    rows = loaded[table]
+    end = position + len(new_rows)
+    before = store.get_row(table, rows[position - 1]) if position > 0 else ""
+    after = store.get_row(table, rows[end]) if end < len(rows) else ""
+    loaded["Changes"].append((table, position, old_rows, new_rows, before, after))
+    if loaded["Backend"] == "sqlite":
+        loaded["Unsynced"].append((table, position, old_rows, new_rows))
+
+
+def get_copresence(loaded: type.Piece, kind: str) -> Dict[str, Dict[str, Tuple[int, int]]]:
+    """ Donne les scènes et les mots partagés par chaque paire de personnages (ou de comédien·nes), calculés au premier besoin
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        kind (str): "Characters" ou "Actors"
+
+    Returns:
+        Dict[str, Dict[str, Tuple[int, int]]]: nombre de scènes et de mots partagés, par paire de noms
+    """
+
+    if kind not in loaded["Copresence"]:
+        loaded["Copresence"][kind] = index.build_copresence(loaded["Scenes"], kind)
+    return loaded["Copresence"][kind]
+
+
+def refresh_scene_actors(loaded: type.Piece, character_names: Iterable[str]) -> None:
+    """ Recalcule les comédien·nes des scènes où apparaissent certains personnages
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        character_names (Iterable[str]): personnages dont les liens ont changé
+    """
+
+    character_names = set(character_names)
+    if not character_names:
+        return
+
+    links = loaded["Links"]
+    for position, scene in enumerate(loaded["Scenes"]):
+        if not character_names.isdisjoint(scene["Characters"]):
+            set_scene_names(loaded, position, "Actors", load.get_actors_linked_to_characters(links, scene["Characters"]))
+
+
+def refresh_actor_totals(loaded: type.Piece, actor_names: Iterable[str]) -> None:
+    """ Recalcule les répliques et les mots de certain·es comédien·nes à partir de leurs personnages
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        actor_names (Iterable[str]): comédien·nes à recalculer
+    """
+
+    actor_names = set(actor_names)
+    if not actor_names:
+        return
+
+    characters_by_name: Dict[str, type.Character] = {}
+    for character in loaded["Characters"]:
+        characters_by_name.setdefault(character["Name"], character)
+
+    for actor in loaded["Actors"]:
+        if actor["Name"] in actor_names:
+            actor["Lines"] = 0
+            actor["Words"] = 0
+            for character_played in actor["Characters"]:
+                character = characters_by_name.get(character_played)
+                if character:
+                    actor["Lines"] += character["Lines"]
+                    actor["Words"] += character["Words"]
+
+
+def characters_changed(loaded: type.Piece, character_names: Iterable[str]) -> None:
+    """ Répercute la modification des répliques ou des mots de personnages sur leurs comédien·nes
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        character_names (Iterable[str]): personnages modifiés
+    """
+
+    actor_names = set()
+    for character in character_names:
+        actor_names.update(loaded["Links"].get(character, []))
+    refresh_actor_totals(loaded, actor_names)
+
+
+def links_changed(loaded: type.Piece, character_names: Iterable[str]) -> None:
+    """ Reconstruit l'index personnage -> comédien·nes et répercute les nouveaux liens sur les scènes
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        character_names (Iterable[str]): personnages dont les comédien·nes ont changé
+    """
+
+    loaded["Links"] = build_links(loaded["Actors"])
+    refresh_scene_actors(loaded, character_names)
+
+
+def mark_dirty(loaded: type.Piece, *kinds: str) -> None:
+    """ Note les fichiers à réécrire et programme leur écriture différée
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        kinds (str): fichiers modifiés ("sc", "ch" ou "ac")
+    """
+
+    with LOCK:
+        loaded["Dirty"].update(kinds)
+        schedule_flush(loaded)
+
+
+def schedule_flush(loaded: type.Piece) -> None:
+    """ Programme l'écriture des modifications après un temps d'inactivité
+
+    Args:
+        loaded (type.Piece): pièce chargée
+    """
+
+    with LOCK:
+        cancel_flush(loaded)
+        timer = threading.Timer(IDLE_FLUSH_DELAY, flush, [loaded])
+        timer.daemon = True
+        _timers[loaded["Name"]] = timer
+        timer.start()
+
+
+def cancel_flush(loaded: type.Piece) -> None:
+    """ Annule l'écriture différée programmée pour une pièce
+
+    Args:
+        loaded (type.Piece): pièce chargée
+    """
+
+    with LOCK:
+        timer = _timers.pop(loaded["Name"], None)
+        if timer:
+            timer.cancel()
+
+
+def flush(loaded: type.Piece) -> None:
+    """ Écrit dans les fichiers csv les modifications en attente, puis met à jour le cliché binaire
+
+    Si la pièce est enregistrée dans une base de données, seules les lignes modifiées y sont réécrites.
+
+    Args:
+        loaded (type.Piece): pièce chargée
+    """
+
+    with LOCK:
+        cancel_flush(loaded)
+        dirty = loaded["Dirty"]
+        if not dirty:
+            return
+
+        piece = loaded["Name"]
+        if loaded["Backend"] == "sqlite":
+            database.apply_delta(piece, loaded["Unsynced"])
+            loaded["Unsynced"].clear()
+        else:
+            # Tous les fichiers modifiés sont remplacés ensemble, avec un seul journal
+            contents = {}
+            if "sc" in dirty:
+                contents[utils.get_scenes_file(piece)] = store.scenes_to_bytes(loaded["Scenes"])
+            if "ch" in dirty:
+                contents[utils.get_characters_file(piece)] = store.characters_to_bytes(loaded["Characters"])
+            if "ac" in dirty:
+                contents[utils.get_actors_file(piece)] = store.actors_to_bytes(loaded["Actors"])
+            store.write_files(piece, contents)
+            load.write_snapshot(piece, loaded["Characters"], loaded["Scenes"], loaded["Actors"], load.get_csv_signature(piece), load.get_csv_hash(piece))
+        dirty.clear()
+
+        loaded["Mtimes"] = data.get_mtimes(piece)
+        data.update_piece(piece, Scenes=len(loaded["Scenes"]), Characters=len(loaded["Characters"]), Mtimes=loaded["Mtimes"])
+
+
+def discard(loaded: type.Piece) -> None:
+    """ Abandonne les modifications en attente d'une pièce
+
+    Args:
+        loaded (type.Piece): pièce chargée
+    """
+
+    with LOCK:
+        cancel_flush(loaded)
+        loaded["Dirty"].clear()
+        loaded["Unsynced"].clear()
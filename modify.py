@@ -1,224 +1,291 @@
-from typing import List
-import csv
+from typing import Dict, List, Tuple
 
-import utils
+import index
+import load
+import model
+import type
 
-def replace_string(file_name: str, old_string: str, new_string: str) -> None:
-    """ Remplace une chaîne de caractères par une autre dans un fichier
+
+def add_scene(loaded: type.Piece, new_scene: str, nb_lines: int, nb_didascalies: int, nb_words: int, next_scene: str) -> None:
+    """ Ajoute une scène avant une autre scène, ou à la fin de la pièce
 
     Args:
-        file_name (str): nom du fichier
-        old_string (str): ancienne chaîne de caractères
-        new_string (str): nouvelle chaîne de caractères
+        loaded (type.Piece): pièce chargée
+        new_scene (str): nom de la nouvelle scène
+        nb_lines (int): nombre de répliques
+        nb_didascalies (int): nombre de didascalies
+        nb_words (int): nombre de mots
+        next_scene (str): scène devant laquelle ajouter la nouvelle scène ("last" pour l'ajouter à la fin)
     """
-    
-    with open(file_name, "r", encoding="utf-8") as file:
-        lines = file.readlines()
-
-    with open(file_name, "w", encoding="utf-8") as file:
-        for line in lines:
-            new_line = line.replace(old_string, new_string)
-            file.write(new_line)
 
+    scenes = loaded["Scenes"]
+    list_characters = [""]
+    scene = {
+        "Scene": new_scene,
+        "Lines": str(nb_lines),
+        "Didascalies": str(nb_didascalies),
+        "Words": str(nb_words),
+        "Characters": list_characters,
+        "Actors": load.get_actors_linked_to_characters(loaded["Links"], list_characters)
+    }
 
-def add_scene(piece: str, new_scene: str, nb_lines: int, nb_didascalies: int, nb_words: int, next_scene: str) -> None:
-    
-    
-    scenes_file = utils.get_scenes_file(piece)
-    new_row = [new_scene, nb_lines, nb_didascalies, nb_words, ""]
-    
-    with open(scenes_file, "r", encoding="utf-8") as file:
-        reader = csv.reader(file)
-        rows = list(reader)
-    
     if next_scene == "last":
-        rows.append(new_row)
+        position = len(scenes)
+    else:
+        position = model.find(scenes, next_scene, "Scene")
+        if position < 0:
+            return
     
-    with open(scenes_file, "w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        for row in rows:
-            if row[0] == next_scene:
-                writer.writerow(new_row)
-            writer.writerow(row)
+    model.insert_scene(loaded, position, scene)
+
+    model.mark_dirty(loaded, "sc")
 
 
-def rename_character(piece: str, old_name: str, new_name: str, ac: bool) -> None:
-    """ Renomme un personnage dans les fichiers csv
+def rename_character(loaded: type.Piece, old_name: str, new_name: str, ac: bool) -> None:
+    """ Renomme un personnage dans la pièce chargée
+
+    Seules les lignes où le nom apparaît sont modifiées : les scènes sont trouvées par l'index de présence,
+    les comédien·nes par l'index personnage -> comédien·nes. Le renommage d'un personnage est répercuté
+    sur les personnages joués par les comédien·nes.
 
     Args:
-        piece (str): nom de la pièce
+        loaded (type.Piece): pièce chargée
         old_name (str): ancien nom du personnage
         new_name (str): nouveau nom du personnage
         ac (bool): on renomme un·e comédien·ne si ce paramètre est True
     """
-    
-    scenes_file = utils.get_scenes_file(piece)
+
+    kind = "Actors" if ac else "Characters"
+    positions = list(index.iter_positions(loaded["Index"][kind].get(old_name, 0)))
+
     if ac:
-        people_file = utils.get_actors_file(piece)
-    else:
-        people_file = utils.get_characters_file(piece)
-    
-    replace_string(scenes_file, old_name, new_name)
-    replace_string(people_file, old_name, new_name)
+        for position, actor in enumerate(loaded["Actors"]):
+            if actor["Name"] == old_name:
+                model.update_row(loaded, "Actors", position, Name=new_name)
+        loaded["Links"] = model.build_links(loaded["Actors"])
+
+        for position in positions:
+            scene = loaded["Scenes"][position]
+            model.set_scene_names(loaded, position, "Actors", [new_name if actor == old_name else actor for actor in scene["Actors"]])
+
+        model.mark_dirty(loaded, "ac")
+        return
+
+    linked_actors = set(loaded["Links"].get(old_name, []))
+    for position, actor in enumerate(loaded["Actors"]):
+        if actor["Name"] in linked_actors and old_name in actor["Characters"]:
+            characters_played = list(dict.fromkeys(new_name if character == old_name else character for character in actor["Characters"]))
+            model.update_row(loaded, "Actors", position, Characters=characters_played)
+    if linked_actors:
+        loaded["Links"] = model.build_links(loaded["Actors"])
 
+    for position in positions:
+        scene = loaded["Scenes"][position]
+        model.set_scene_names(loaded, position, "Characters", [new_name if character == old_name else character for character in scene["Characters"]])
+        model.set_scene_names(loaded, position, "Actors", load.get_actors_linked_to_characters(loaded["Links"], scene["Characters"]))
 
-def add_character(piece: str, new_character: str, list_scenes: List[str]) -> None:
-    """ Ajoute un personnage à une liste de scènes, et au fichier des personnages s'il n'existe pas déjà
+    for position, character in enumerate(loaded["Characters"]):
+        if character["Name"] == old_name:
+            model.update_row(loaded, "Characters", position, Name=new_name)
+
+    model.characters_changed(loaded, [old_name, new_name])
+    model.mark_dirty(loaded, "sc", "ch")
+    if linked_actors:
+        model.mark_dirty(loaded, "ac")
+
+
+def add_character(loaded: type.Piece, new_character: str, list_scenes: List[str]) -> None:
+    """ Ajoute un personnage à une liste de scènes, et à la liste des personnages s'il n'existe pas déjà
 
     Args:
-        piece (str): nom de la pièce
+        loaded (type.Piece): pièce chargée
         new_character (str): nom du personnage à ajouter
         list_scenes (List[str]): liste des scènes dans lesquelles ajouter le personnage
     """
-    
-    scenes_file = utils.get_scenes_file(piece)
-    characters_file = utils.get_characters_file(piece)
-    
-    with open(scenes_file, "r", encoding="utf-8") as file:
-        reader = csv.reader(file)
-        rows = list(reader)
-    
-    with open(scenes_file, "w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        
-        for row in rows:
-            if row[0] in list_scenes:
-                if new_character not in row[4].split(":"):
-                    row[4] = row[4] + ":" + new_character
-            writer.writerow(row)
-    
-    with open(characters_file, "r", encoding="utf-8") as file:
-        reader = csv.reader(file)
-        rows = list(reader)
 
-    for row in rows:
-        if new_character == row[0]:
-            return
-    
-    with open(characters_file, "w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        
-        for row in rows:
-            writer.writerow(row)
-        
-        writer.writerow([new_character, 0, 0])
+    for position, scene in enumerate(loaded["Scenes"]):
+        if scene["Scene"] in list_scenes:
+            if new_character not in scene["Characters"]:
+                model.set_scene_names(loaded, position, "Characters", scene["Characters"] + [new_character])
+
+    model.refresh_scene_actors(loaded, [new_character])
+    model.mark_dirty(loaded, "sc")
 
+    if model.find(loaded["Characters"], new_character) >= 0:
+        return
 
-def merge_characters(piece: str, source_character: str, destination_characters: str) -> None:
-    """ Fusionne deux personnages dans les fichiers csv
+    model.insert_row(loaded, "Characters", len(loaded["Characters"]), {"Name": new_character, "Lines": 0, "Words": 0})
+    model.mark_dirty(loaded, "ch")
+
+
+def merge_characters(loaded: type.Piece, source_character: str, destination_characters: List[str]) -> None:
+    """ Fusionne un personnage dans un ou plusieurs autres personnages
 
     Args:
-        piece (str): nom de la pièce
+        loaded (type.Piece): pièce chargée
         source_character (str): nom du personnage qui va disparaître en fusionnant
-        destination_character (str): nom du personnage qui reçoit les informations de l'autre personnage
+        destination_characters (List[str]): noms des personnages qui reçoivent les informations de l'autre personnage
     """
-    
-    scenes_file = utils.get_scenes_file(piece)
-    characters_file = utils.get_characters_file(piece)
-    
-    with open(scenes_file, "r", encoding="utf-8") as file:
-        reader = csv.reader(file)
-        rows = list(reader)
-    
-    with open(scenes_file, "w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        
-        for row in rows:
-            list_characters = row[4].split(":")
-            if source_character in list_characters:
-                list_characters.remove(source_character)
-                for destination_character in destination_characters:
-                    if destination_character not in list_characters:
-                        list_characters.append(destination_character)
-            
-            row[4] = ":".join(list_characters)
-            writer.writerow(row)
-
-    with open(characters_file, "r", encoding="utf-8") as file:
-        reader = csv.reader(file)
-        rows = list(reader)
-    
-    for row in rows:
-        if row[0] == source_character:
-            lines_of_source_character = int(row[1])
-            words_of_source_character = int(row[2])
-            break
-    
-    with open(characters_file, "w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        
-        for row in rows:
-            if row[0] in destination_characters:
-                row[1] = int(row[1]) + lines_of_source_character
-                row[2] = int(row[2]) + words_of_source_character
-            if row[0] != source_character:
-                writer.writerow(row)
-
-
-def add_lines_and_words(piece: str, character_name: str, nb_lines_to_add: int, nb_words_to_add: int) -> None:
+
+    for position, scene in enumerate(loaded["Scenes"]):
+        list_characters = scene["Characters"]
+        if source_character in list_characters:
+            list_characters = [character for character in list_characters if character != source_character]
+            for destination_character in destination_characters:
+                if destination_character not in list_characters:
+                    list_characters.append(destination_character)
+            model.set_scene_names(loaded, position, "Characters", list_characters)
+            model.set_scene_names(loaded, position, "Actors", load.get_actors_linked_to_characters(loaded["Links"], list_characters))
+
+    characters = loaded["Characters"]
+    position = model.find(characters, source_character)
+    if position >= 0:
+        source = model.delete_row(loaded, "Characters", position)
+        for position, character in enumerate(characters):
+            if character["Name"] in destination_characters:
+                model.update_row(loaded, "Characters", position, Lines=character["Lines"] + source["Lines"], Words=character["Words"] + source["Words"])
+
+    model.characters_changed(loaded, [source_character, *destination_characters])
+    model.mark_dirty(loaded, "sc", "ch")
+
+
+def add_lines_and_words(loaded: type.Piece, character_name: str, nb_lines_to_add: int, nb_words_to_add: int) -> None:
     """ Ajoute un certain nombre de répliques et de mots à un personnage
 
     Args:
-        piece (str): nom de la pièce
+        loaded (type.Piece): pièce chargée
         character_name (str): nom du personnage
         nb_lines_to_add (int): nombre de répliques à ajouter
         nb_words_to_add (int): nombre de mots à ajouter
     """
-    
-    characters_file = utils.get_characters_file(piece)
 
-    with open(characters_file, "r", encoding="utf-8") as file:
-        reader = csv.reader(file)
-        rows = list(reader)
-    
-    with open(characters_file, "w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        
-        for row in rows:
-            if row[0] == character_name:
-                row[1] = int(row[1]) + nb_lines_to_add
-                row[2] = int(row[2]) + nb_words_to_add
-            writer.writerow(row)
+    for position, character in enumerate(loaded["Characters"]):
+        if character["Name"] == character_name:
+            model.update_row(loaded, "Characters", position, Lines=character["Lines"] + nb_lines_to_add, Words=character["Words"] + nb_words_to_add)
 
+    model.characters_changed(loaded, [character_name])
+    model.mark_dirty(loaded, "ch")
 
-def delete_character(piece: str, characters_to_delete: str, ac: bool) -> None:
-    """ Supprime un personnage
+
+def delete_character(loaded: type.Piece, characters_to_delete: List[str], ac: bool) -> None:
+    """ Supprime des personnages
 
     Args:
-        piece (str): nom de la pièce concernée
-        character_name (str): nom du personnage à supprimer
-        ac (bool): on supprime un·e comédien·ne si ce paramètre est True
+        loaded (type.Piece): pièce chargée
+        characters_to_delete (List[str]): noms des personnages à supprimer
+        ac (bool): on supprime des comédien·nes si ce paramètre est True
     """
-    
-    scenes_file = utils.get_scenes_file(piece)
+
     if ac:
-        people_file = utils.get_actors_file(piece)
-    else:
-        people_file = utils.get_characters_file(piece)
-    
-    with open(scenes_file, "r", encoding="utf-8") as file:
-        reader = csv.reader(file)
-        rows = list(reader)
-    
-    with open(scenes_file, "w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        
-        for row in rows:
-            list_characters = row[4].split(":")
-            for present_character in list_characters:
-                if present_character in characters_to_delete:
-                    list_characters.remove(present_character)
-            
-            row[4] = ":".join(list_characters)
-            writer.writerow(row)
-    
-    with open(people_file, "r", encoding="utf-8") as file:
-        reader = csv.reader(file)
-        rows = list(reader)
-
-    with open(people_file, "w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        
-        for row in rows:
-            if row[0] not in characters_to_delete:
-                writer.writerow(row)
\ No newline at end of file
+        unlinked_characters = set()
+        for actor in loaded["Actors"]:
+            if actor["Name"] in characters_to_delete:
+                unlinked_characters.update(actor["Characters"])
+        model.delete_rows(loaded, "Actors", lambda actor: actor["Name"] in characters_to_delete)
+
+        model.links_changed(loaded, unlinked_characters)
+        model.mark_dirty(loaded, "ac")
+        return
+
+    for position, scene in enumerate(loaded["Scenes"]):
+        list_characters = scene["Characters"]
+        if any(character in characters_to_delete for character in list_characters):
+            model.set_scene_names(loaded, position, "Characters", [character for character in list_characters if character not in characters_to_delete])
+            model.set_scene_names(loaded, position, "Actors", load.get_actors_linked_to_characters(loaded["Links"], scene["Characters"]))
+
+    model.delete_rows(loaded, "Characters", lambda character: character["Name"] in characters_to_delete)
+
+    model.characters_changed(loaded, characters_to_delete)
+    model.mark_dirty(loaded, "sc", "ch")
+
+
+def resolve_mapping(operations: List[Tuple[str, str, List[str]]]) -> Tuple[Dict[str, str], List[Tuple[str, List[str]]], List[str], List[str]]:
+    """ Prépare une liste de renommages, fusions et suppressions : résout les chaînes de renommages et cherche les conflits
+
+    Args:
+        operations (List[Tuple[str, str, List[str]]]): opération ("rn", "mg" ou "dl"), nom concerné et noms cibles
+
+    Returns:
+        Tuple[Dict[str, str], List[Tuple[str, List[str]]], List[str], List[str]]: nom final de chaque personnage renommé,
+        fusions (avec les noms finaux des destinations), suppressions, et description des conflits trouvés
+    """
+
+    renames: Dict[str, str] = {}
+    merges: List[Tuple[str, List[str]]] = []
+    deletes: List[str] = []
+    conflicts: List[str] = []
+
+    for operation, name, targets in operations:
+        if operation == "rn" and len(targets) == 1:
+            if renames.get(name, targets[0]) != targets[0]:
+                conflicts.append(f"'{name}' est renommé en '{renames[name]}' et en '{targets[0]}'")
+            renames[name] = targets[0]
+        elif operation == "mg" and targets:
+            merges.append((name, targets))
+        elif operation == "dl":
+            deletes.append(name)
+        else:
+            conflicts.append(f"Opération mal formée : {operation} {name} {':'.join(targets)}")
+
+    # Une chaîne A -> B -> C renomme directement A en C
+    final_names: Dict[str, str] = {}
+    for name in renames:
+        seen = [name]
+        final_name = renames[name]
+        while final_name in renames and final_name not in seen:
+            seen.append(final_name)
+            final_name = renames[final_name]
+        if final_name in seen:
+            conflicts.append(f"Renommages en boucle : {' -> '.join(seen + [final_name])}")
+        elif final_name != name:
+            final_names[name] = final_name
+
+    merge_sources = [source for source, _ in merges]
+    resolved_merges = []
+    for source, destinations in merges:
+        destinations = list(dict.fromkeys(final_names.get(destination, destination) for destination in destinations))
+        if source in renames:
+            conflicts.append(f"'{source}' est à la fois renommé et fusionné")
+        if merge_sources.count(source) > 1:
+            conflicts.append(f"'{source}' est fusionné plusieurs fois")
+        if source in destinations:
+            conflicts.append(f"'{source}' est fusionné dans lui-même")
+        for destination in destinations:
+            if destination in deletes:
+                conflicts.append(f"'{source}' est fusionné dans '{destination}', qui est supprimé")
+        resolved_merges.append((source, destinations))
+
+    for name in deletes:
+        if name in renames or name in merge_sources:
+            conflicts.append(f"'{name}' est supprimé mais aussi renommé ou fusionné")
+        if name in final_names.values():
+            conflicts.append(f"'{name}' est supprimé alors que d'autres personnages sont renommés en '{name}'")
+
+    return final_names, resolved_merges, list(dict.fromkeys(deletes)), list(dict.fromkeys(conflicts))
+
+
+def apply_mapping(loaded: type.Piece, operations: List[Tuple[str, str, List[str]]]) -> List[str]:
+    """ Applique en une fois une liste de renommages, fusions et suppressions, avec les mêmes règles que rn, mg et dl
+
+    Rien n'est modifié si des conflits sont trouvés.
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        operations (List[Tuple[str, str, List[str]]]): opération ("rn", "mg" ou "dl"), nom concerné et noms cibles
+
+    Returns:
+        List[str]: description des conflits trouvés (vide si les modifications ont été appliquées)
+    """
+
+    renames, merges, deletes, conflicts = resolve_mapping(operations)
+    if conflicts:
+        return conflicts
+
+    for old_name, new_name in renames.items():
+        rename_character(loaded, old_name, new_name, False)
+    for source, destinations in merges:
+        merge_characters(loaded, source, destinations)
+    if deletes:
+        delete_character(loaded, deletes, False)
+
+    return []
@@ -0,0 +1,104 @@
+from typing import List, Tuple
+
+import index
+import type
+
+
+def get_rehearsable_mask(loaded: type.Piece, available_actors: List[str]) -> int:
+    """ Donne le masque des scènes dont tou·tes les comédien·nes sont disponibles
+
+    Une scène est exclue dès qu'un·e comédien·ne absent·e y joue : le masque est le complément de l'union
+    des masques des absent·es dans l'index de présence. Les personnages sans comédien·ne ne bloquent pas une scène.
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        available_actors (List[str]): comédien·nes disponibles
+
+    Returns:
+        int: masque des scènes qui peuvent être répétées
+    """
+
+    available_actors = set(available_actors)
+    blocked = 0
+    for actor, mask in loaded["Index"]["Actors"].items():
+        if actor not in available_actors:
+            blocked |= mask
+    return ((1 << len(loaded["Scenes"])) - 1) & ~blocked
+
+
+def get_rehearsable_scenes(loaded: type.Piece, available_actors: List[str]) -> List[type.Scene]:
+    """ Donne les scènes qui peuvent être répétées avec les comédien·nes présent·es, de la plus longue à la plus courte
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        available_actors (List[str]): comédien·nes présent·es
+
+    Returns:
+        List[type.Scene]: scènes triées par nombre de mots décroissant
+    """
+
+    scenes = loaded["Scenes"]
+    rehearsable = [scenes[position] for position in index.iter_positions(get_rehearsable_mask(loaded, available_actors))]
+    return sorted(rehearsable, key=lambda scene: int(scene["Words"]), reverse=True)
+
+
+def pick_scenes(words: List[int], max_words: int) -> List[int]:
+    """ Choisit les scènes qui font répéter le plus de mots possible sans dépasser une limite
+
+    Les sommes atteignables sont gardées dans un entier (bit n à 1 si n mots sont atteignables), décalé pour chaque scène :
+    la recherche est exacte et bornée par le nombre de scènes multiplié par la limite.
+
+    Args:
+        words (List[int]): nombre de mots de chaque scène candidate
+        max_words (int): nombre maximum de mots de la séance
+
+    Returns:
+        List[int]: positions des scènes choisies dans la liste des candidates
+    """
+
+    limit = (1 << (max_words + 1)) - 1
+    reachable = [1]
+    for nb_words in words:
+        reachable.append((reachable[-1] | (reachable[-1] << nb_words)) & limit)
+
+    total = reachable[-1].bit_length() - 1
+    chosen = []
+    for position in range(len(words) - 1, -1, -1):
+        if not (reachable[position] >> total) & 1:
+            chosen.append(position)
+            total -= words[position]
+    return chosen[::-1]
+
+
+def plan_sessions(loaded: type.Piece, sessions: List[type.Session]) -> Tuple[List[Tuple[str, List[int], int]], List[int]]:
+    """ Répartit les scènes entre les séances, dans l'ordre des séances, en faisant répéter le plus de mots possible à chacune
+
+    Chaque scène n'est répétée qu'une fois, dans une séance où tou·tes ses comédien·nes sont disponibles.
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        sessions (List[type.Session]): séances, avec les comédien·nes disponibles et le nombre maximum de mots
+
+    Returns:
+        Tuple[List[Tuple[str, List[int], int]], List[int]]: nom, positions des scènes et nombre de mots de chaque séance,
+        puis positions des scènes qui n'ont trouvé aucune séance
+    """
+
+    scenes = loaded["Scenes"]
+    remaining = (1 << len(scenes)) - 1
+    plans = []
+
+    for session in sessions:
+        candidates = list(index.iter_positions(get_rehearsable_mask(loaded, session["Actors"]) & remaining))
+        words = [int(scenes[position]["Words"]) for position in candidates]
+
+        if session["MaxWords"] is None:
+            chosen = candidates
+        else:
+            chosen = [candidates[position] for position in pick_scenes(words, session["MaxWords"])]
+
+        for position in chosen:
+            remaining &= ~(1 << position)
+        plans.append((session["Name"], chosen, sum(int(scenes[position]["Words"]) for position in chosen)))
+
+    return plans, list(index.iter_positions(remaining))
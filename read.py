@@ -1,13 +1,27 @@
 import os
+import io
 import csv
-from typing import Dict, List, Tuple
+import glob
+import hashlib
+import itertools
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Generator, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 
 import data
+import database
+import store
 import type
 import utils
 
 CharacterName = str
 SceneName = Tuple[str, str]
+Block = Tuple[Optional[str], int, int, int, Dict[CharacterName, Tuple[int, int]]]
+
+PARALLEL_MIN_SIZE = 4 * 1024 * 1024 # Taille (en octets) à partir de laquelle un texte est découpé entre plusieurs processus
+CHUNKS_PER_WORKER = 4
+MANIFEST_VERSION = 1
 
 def change_scene(old_act: str, old_scene: str, line: str) -> Tuple[bool, SceneName, str]:
     """ Change le numéro de l'acte ou de la scène si la ligne est le titre d'acte ou de scène
@@ -102,13 +116,15 @@ def update_character_info(dico_characters: Dict[CharacterName, Tuple[int, int]],
     return dico_characters
 
 
-def write_info(piece: str, dico_scenes: Dict[str, List[CharacterName]], dico_characters: Dict[str, Tuple[int, int]]) -> bool:
+def write_info(piece: str, dico_scenes: Dict[str, List[CharacterName]], dico_characters: Dict[str, Tuple[int, int]], register: bool = True, other_files: Dict[str, bytes] = None) -> bool:
     """ Écris les statistiques collectées dans des fichiers csv
 
     Args:
         piece (str): nom de la pièce
         dico_scenes (Dict[str, List[CharacterName]]): dictionnaire contenant des infos sur les scènes
         dico_characters (Dict[str, Tuple[int, int]]): dictionnaire contenant des infos sur les personnages
+        register (bool): ajoute la pièce au fichier des pièces lues si cet argument est True
+        other_files (Dict[str, bytes]): autres fichiers à écrire en même temps que les csv
         
     Returns:
         bool: retourn True si les informations ont bien été écrites
@@ -118,47 +134,377 @@ def write_info(piece: str, dico_scenes: Dict[str, List[CharacterName]], dico_cha
     if not directory_created:
         return False
     
-    file_scenes = utils.get_scenes_file(piece)
-    file_characters = utils.get_characters_file(piece)
     file_actors = utils.get_actors_file(piece)
     
-    with open(file_scenes, mode='w', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file)
-        writer.writerow(list(type.HEADER_SCENES.values()))
-        
-        for scene, (lines, didascalies, words, list_characters) in dico_scenes.items():
-            str_characters = ":".join(list_characters)
-            writer.writerow([scene, lines, didascalies, words, str_characters])
-    
-    with open(file_characters, mode='w', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file)
-        writer.writerow(list(type.HEADER_CHARACTERS.values()))
-        
-        for character, (total_lines, total_words) in dico_characters.items():
-            writer.writerow([character, total_lines, total_words])
+    scene_rows = [[scene, lines, didascalies, words, ":".join(list_characters)] for scene, (lines, didascalies, words, list_characters) in dico_scenes.items()]
+    character_rows = [[character, total_lines, total_words] for character, (total_lines, total_words) in dico_characters.items()]
     
+    contents = {
+        utils.get_scenes_file(piece): store.rows_to_bytes(list(type.HEADER_SCENES.values()), scene_rows),
+        utils.get_characters_file(piece): store.rows_to_bytes(list(type.HEADER_CHARACTERS.values()), character_rows)
+    }
     if not os.path.exists(file_actors):
-        with open(file_actors, "w", newline="", encoding="utf-8") as file:
-            writer = csv.writer(file)
-            writer.writerow(list(type.HEADER_ACTORS.values()))
+        contents[file_actors] = store.rows_to_bytes(list(type.HEADER_ACTORS.values()), [])
+    contents.update(other_files or {})
+    
+    store.write_files(piece, contents)
     
-    data.add_piece(piece)
+    if register:
+        data.add_piece(piece)
     
     return True
 
 
-def read_file(file_name: str) -> Tuple[Dict[str, List[CharacterName]], Dict[CharacterName, Tuple[int, int]]]:
-    """ Analyse un fichier texte contenant une pièce de théâtre
+def is_title(line: str) -> bool:
+    """ Indique si une ligne est un titre d'acte ou de scène, selon le même critère que change_scene
+
+    Args:
+        line (str): ligne lue dans le fichier
+
+    Returns:
+        bool: True si la ligne change l'acte ou la scène
+    """
+    
+    return "Acte" in line or "Scène" in line
+
+
+def can_split(file_name: str) -> bool:
+    """ Indique si un texte est assez gros pour être découpé entre plusieurs processus
+
+    Un texte compressé ne peut pas être lu à partir d'une position quelconque : il est toujours lu d'un bout à l'autre.
+
+    Args:
+        file_name (str): nom du fichier
+
+    Returns:
+        bool: True si le fichier peut être découpé
+    """
+    
+    return not utils.is_compressed(file_name) and os.path.getsize(file_name) >= PARALLEL_MIN_SIZE
+
+
+def get_chunk_offsets(file_name: str, nb_chunks: int) -> List[int]:
+    """ Découpe un fichier en morceaux de tailles proches, commençant si possible sur un titre d'acte ou de scène
+
+    Args:
+        file_name (str): nom du fichier à découper
+        nb_chunks (int): nombre de morceaux souhaités
+
+    Returns:
+        List[int]: positions (en octets) du début de chaque morceau, suivies de la taille du fichier
+    """
+    
+    size = os.path.getsize(file_name)
+    title_markers = ("Acte".encode("utf-8"), "Scène".encode("utf-8"))
+    offsets = [0]
+    
+    with open(file_name, "rb") as file:
+        for i in range(1, nb_chunks):
+            target = max(size * i // nb_chunks, offsets[-1])
+            file.seek(target)
+            if target > 0:
+                file.readline() # Aligne sur le début de la ligne suivante
+            
+            while True:
+                offset = file.tell()
+                line = file.readline()
+                if not line or any(marker in line for marker in title_markers):
+                    break
+            
+            if line and offset > offsets[-1]:
+                offsets.append(offset)
+    
+    offsets.append(size)
+    return offsets
+
+
+def iter_raw_blocks(lines: Iterable[str]) -> Iterator[Tuple[Optional[str], List[str]]]:
+    """ Regroupe les lignes d'un texte en blocs compris entre deux titres d'acte ou de scène
+
+    Args:
+        lines (Iterable[str]): lignes du texte
+
+    Yields:
+        Tuple[Optional[str], List[str]]: titre du bloc (None pour les lignes avant le premier titre) et lignes du bloc, sans espaces autour
+    """
+    
+    title = None
+    body: List[str] = []
+    
+    for line in lines:
+        line = line.strip()
+        if is_title(line):
+            yield title, body
+            title = line
+            body = []
+        else:
+            body.append(line)
+    
+    yield title, body
+
+
+def hash_block(title: Optional[str], body: List[str]) -> str:
+    """ Calcule l'empreinte du contenu d'un bloc
+
+    Args:
+        title (Optional[str]): titre du bloc
+        body (List[str]): lignes du bloc
+
+    Returns:
+        str: empreinte du bloc
+    """
+    
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(("" if title is None else "T" + title).encode("utf-8"))
+    for line in body:
+        digest.update(b"\n" + line.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ActStart(NamedTuple):
+    """ Titre d'acte """
+    act: str
+
+
+class SceneStart(NamedTuple):
+    """ Titre de scène """
+    act: str
+    scene: str
+
+
+class Replique(NamedTuple):
+    """ Réplique d'un personnage (ou plusieurs répliques cumulées, pour un bloc déjà analysé) """
+    character: CharacterName
+    words: int
+    lines: int = 1
+
+
+class Didascalie(NamedTuple):
+    """ Ligne de texte qui n'est pas une réplique (ou plusieurs lignes cumulées, pour un bloc déjà analysé) """
+    words: int
+    lines: int = 1
+
+
+class SceneEnd(NamedTuple):
+    """ Fin d'une scène, avec le nom sous lequel elle est enregistrée dans scenes.csv """
+    scene: str
+
+
+Event = Union[ActStart, SceneStart, Replique, Didascalie, SceneEnd]
+Consumer = Generator[None, Optional[Event], object]
+
+
+def iter_line_events(body: Iterable[str]) -> Iterator[Union[Replique, Didascalie]]:
+    """ Transforme les lignes d'un bloc (sans titre) en répliques et didascalies
+    
+    Args:
+        body (Iterable[str]): lignes du bloc, sans espaces autour
+        
+    Yields:
+        Union[Replique, Didascalie]: évènement de chaque ligne non vide
+    """
+    
+    for line in body:
+        character, nb_words_in_line = get_stats_line(line)
+        
+        if character: # réplique d'un personnage
+            yield Replique(character, nb_words_in_line)
+        elif nb_words_in_line: # didascalie
+            yield Didascalie(nb_words_in_line)
+
+
+def summarize_block(title: Optional[str], body: List[str]) -> Block:
+    """ Résume un bloc de lignes compris entre deux titres
+    
+    Args:
+        title (Optional[str]): titre du bloc
+        body (List[str]): lignes du bloc
+        
+    Returns:
+        Block: titre du bloc, ses répliques, didascalies et mots, et les répliques et mots de chaque personnage
+    """
+    
+    nb_lines = 0
+    nb_didascalies = 0
+    nb_words = 0
+    characters: Dict[CharacterName, Tuple[int, int]] = {}
+    
+    for event in iter_line_events(body):
+        match event:
+            case Replique(character, nb_words_in_line):
+                characters = update_character_info(characters, character, nb_words_in_line)
+                nb_lines += 1
+                nb_words += nb_words_in_line
+                
+            case Didascalie(nb_words_in_line):
+                nb_didascalies += 1
+                nb_words += nb_words_in_line
+                
+    return (title, nb_lines, nb_didascalies, nb_words, characters)
+
 
+def parse_chunk(file_name: str, start: int, end: int) -> List[Tuple[str, Block]]:
+    """ Analyse un morceau de fichier et résume chaque bloc de lignes compris entre deux titres
+    
     Args:
         file_name (str): nom du fichier à analyser
+        start (int): position (en octets) du début du morceau, au début d'une ligne
+        end (int): position (en octets) de la fin du morceau, au début d'une ligne
+        
+    Returns:
+        List[Tuple[str, Block]]: empreinte et résumé de chaque bloc (le premier bloc du fichier a pour titre None s'il ne commence pas sur un titre)
+    """
+    
+    with open(file_name, "rb") as file:
+        file.seek(start)
+        text = file.read(end - start).decode("utf-8")
+    
+    raw_blocks = list(iter_raw_blocks(io.StringIO(text, newline=None)))
+    if start > 0 and raw_blocks[0] == (None, []):
+        raw_blocks.pop(0) # Les morceaux suivants commencent sur un titre : ce bloc vide n'existe pas dans une lecture séquentielle
+    
+    return [(hash_block(title, body), summarize_block(title, body)) for title, body in raw_blocks]
+
+
+def get_block_events(block: Block) -> Tuple[Optional[str], List[Union[Replique, Didascalie]]]:
+    """ Redonne les évènements d'un bloc résumé : une réplique cumulée par personnage, puis les didascalies cumulées
     
+    Args:
+        block (Block): résumé du bloc
+        
     Returns:
-        Tuple[Dict[str, List[CharacterName]], Dict[CharacterName, Tuple[int, int]]]: dictionnaires des infos sur les scènes et les personnages
+        Tuple[Optional[str], List[Union[Replique, Didascalie]]]: titre du bloc et évènements de ses lignes
+    """
+    
+    title, _, nb_didascalies, nb_words, characters = block
+    
+    events: List[Union[Replique, Didascalie]] = [Replique(character, words, lines) for character, (lines, words) in characters.items()]
+    if nb_didascalies:
+        events.append(Didascalie(nb_words - sum(words for _, words in characters.values()), nb_didascalies))
+        
+    return title, events
+
+
+def iter_block_events(blocks: Iterable[Tuple[Optional[str], Iterable[Union[Replique, Didascalie]]]]) -> Iterator[Event]:
+    """ Transforme les blocs d'une pièce (titre et évènements des lignes qui le suivent) en une suite d'évènements
+    
+    Comme pour les csv, un titre lu avant la première réplique d'une scène ne la termine pas : il est suivi
+    de l'évènement correspondant à la ligne elle-même (en général une didascalie).
+    
+    Args:
+        blocks (Iterable[Tuple[Optional[str], Iterable[Union[Replique, Didascalie]]]]): blocs de tout le texte, dans l'ordre
+        
+    Yields:
+        Event: titres d'actes et de scènes, répliques, didascalies et fins de scènes
     """
     
     current_act: str = "0"
     current_scene: str = "0"
+    someone_spoke = False
+    
+    for title, line_events in blocks:
+        if title is not None:
+            _, current_act, current_scene, last_scene_name = change_scene(current_act, current_scene, title)
+            
+            if "Acte" in title:
+                event = ActStart(current_act)
+            else:
+                event = SceneStart(current_act, current_scene)
+                
+            if someone_spoke:
+                yield SceneEnd(last_scene_name)
+                yield event
+                someone_spoke = False
+            else:
+                yield event
+                line_events = itertools.chain(iter_line_events([title]), line_events)
+                
+        for event in line_events:
+            if isinstance(event, Replique):
+                someone_spoke = True
+            yield event
+            
+    yield SceneEnd(f"{current_act}:{current_scene}")
+
+
+def iter_events(lines: Iterable[str]) -> Iterator[Event]:
+    """ Transforme les lignes d'une pièce en une suite d'évènements, sans garder plus d'un bloc du texte en mémoire
+    
+    Args:
+        lines (Iterable[str]): lignes du texte
+        
+    Yields:
+        Event: titres d'actes et de scènes, répliques, didascalies et fins de scènes
+    """
+    
+    yield from iter_block_events((title, iter_line_events(body)) for title, body in iter_raw_blocks(lines))
+
+
+def read_events(file_name: str) -> Iterator[Event]:
+    """ Lit un fichier texte contenant une pièce de théâtre sous forme d'évènements
+    
+    Args:
+        file_name (str): nom du fichier à lire
+        
+    Yields:
+        Event: évènements de la pièce, dans l'ordre du texte
+    """
+    
+    with utils.open_text(file_name) as file:
+        yield from iter_events(file)
+
+
+def replay_blocks(blocks: Iterable[Block]) -> Iterator[Event]:
+    """ Rejoue la lecture sur des blocs résumés : mêmes évènements que read_events, avec les répliques et didascalies cumulées par bloc
+    
+    Args:
+        blocks (Iterable[Block]): blocs de tout le texte, dans l'ordre
+        
+    Yields:
+        Event: évènements de la pièce, dans l'ordre du texte
+    """
+    
+    yield from iter_block_events(map(get_block_events, blocks))
+
+
+def run_consumers(events: Iterable[Event], consumers: List[Consumer]) -> List[object]:
+    """ Envoie une seule suite d'évènements à plusieurs analyses
+    
+    Chaque analyse est un générateur qui reçoit les évènements avec send, puis None à la fin du texte,
+    et renvoie son résultat avec return.
+    
+    Args:
+        events (Iterable[Event]): évènements de la pièce
+        consumers (List[Consumer]): analyses à alimenter
+        
+    Returns:
+        List[object]: résultat de chaque analyse, dans le même ordre
+    """
+    
+    for consumer in consumers:
+        next(consumer)
+        
+    for event in events:
+        for consumer in consumers:
+            consumer.send(event)
+            
+    results = []
+    for consumer in consumers:
+        try:
+            consumer.send(None)
+        except StopIteration as stop:
+            results.append(stop.value)
+        else:
+            raise RuntimeError("Une analyse ne s'est pas terminée à la fin du texte")
+    return results
+
+
+def collect_stats() -> Consumer:
+    """ Analyse qui collecte les statistiques écrites dans scenes.csv et characters.csv
+    
+    Returns:
+        Consumer: générateur renvoyant les dictionnaires des infos sur les scènes et les personnages
+    """
     
     dico_scenes: Dict[str, Tuple[int, int, int, List[CharacterName]]] = {}
     dico_characters: Dict[CharacterName, Tuple[int, int]] = {}
@@ -168,43 +514,316 @@ def read_file(file_name: str) -> Tuple[Dict[str, List[CharacterName]], Dict[Char
     nb_words_in_scene: int = 0
     nb_didascalies_in_scene: int = 0
     
-    try:
-        with open(file_name, 'r', encoding="utf-8") as file:
-            for line in file:
-                line = line.strip()
+    while True:
+        event = yield
+        
+        match event:
+            case None:
+                return dico_scenes, dico_characters
                 
-                scene_has_changed, current_act, current_scene, last_scene_name = change_scene(current_act, current_scene, line)
+            case Replique(character, nb_words, nb_lines):
+                list_of_characters_in_scene = add_character_in_scene(list_of_characters_in_scene, character)
+                total_lines, total_words = dico_characters.get(character, (0, 0))
+                dico_characters[character] = (total_lines + nb_lines, total_words + nb_words)
+                nb_lines_in_scene += nb_lines
+                nb_words_in_scene += nb_words
                 
-                if scene_has_changed and list_of_characters_in_scene:
-                    dico_scenes[last_scene_name] = (nb_lines_in_scene, nb_didascalies_in_scene, nb_words_in_scene, list_of_characters_in_scene)
-                    
-                    list_of_characters_in_scene = []
-                    nb_lines_in_scene = 0
-                    nb_words_in_scene = 0
-                    nb_didascalies_in_scene = 0
-                    continue
+            case Didascalie(nb_words, nb_didascalies):
+                nb_didascalies_in_scene += nb_didascalies
+                nb_words_in_scene += nb_words
                 
-                character, nb_words_in_line = get_stats_line(line)
-                    
-                if character: # réplique d'un personnage
-                    list_of_characters_in_scene = add_character_in_scene(list_of_characters_in_scene, character)
-                    dico_characters = update_character_info(dico_characters, character, nb_words_in_line)
-                    nb_lines_in_scene += 1
-                    nb_words_in_scene += nb_words_in_line
-                elif nb_words_in_line: # didascalie
-                    nb_didascalies_in_scene += 1
-                    nb_words_in_scene += nb_words_in_line
-            
-            # Pour la dernière scène
-            last_scene_name = f"{current_act}:{current_scene}"
-            dico_scenes[last_scene_name] = (nb_lines_in_scene, nb_didascalies_in_scene, nb_words_in_scene, list_of_characters_in_scene)
-            
-        return dico_scenes, dico_characters
+            case SceneEnd(scene_name):
+                dico_scenes[scene_name] = (nb_lines_in_scene, nb_didascalies_in_scene, nb_words_in_scene, list_of_characters_in_scene)
+                
+                list_of_characters_in_scene = []
+                nb_lines_in_scene = 0
+                nb_words_in_scene = 0
+                nb_didascalies_in_scene = 0
+
+
+def collect_matrix() -> Consumer:
+    """ Analyse qui collecte les répliques et mots de chaque personnage dans chaque scène, écrits dans matrix.bin
+    
+    Returns:
+        Consumer: générateur renvoyant le dictionnaire des répliques et mots de chaque personnage, par scène
+    """
+    
+    dico_matrix: Dict[str, Dict[CharacterName, Tuple[int, int]]] = {}
+    characters_info_in_scene: Dict[CharacterName, Tuple[int, int]] = {}
+    
+    while True:
+        event = yield
+        
+        match event:
+            case None:
+                return dico_matrix
+                
+            case Replique(character, nb_words, nb_lines):
+                scene_lines, scene_words = characters_info_in_scene.get(character, (0, 0))
+                characters_info_in_scene[character] = (scene_lines + nb_lines, scene_words + nb_words)
                 
+            case SceneEnd(scene_name):
+                dico_matrix[scene_name] = characters_info_in_scene
+                characters_info_in_scene = {}
+
+
+def read_file(file_name: str, workers: int = None) -> Tuple[Dict[str, List[CharacterName]], Dict[CharacterName, Tuple[int, int]]]:
+    """ Analyse un fichier texte contenant une pièce de théâtre, comme rd mais sans manifeste ni écriture
+    
+    Args:
+        file_name (str): nom du fichier à analyser
+        workers (int): nombre de processus pour les gros fichiers (par défaut, le nombre de processeurs ; 1 pour une lecture séquentielle)
+        
+    Returns:
+        Tuple[Dict[str, List[CharacterName]], Dict[CharacterName, Tuple[int, int]]]: dictionnaires des infos sur les scènes et les personnages
+    """
+    
+    try:
+        blocks, _ = read_blocks(file_name, {}, workers or os.cpu_count() or 1)
     except FileNotFoundError:
         print(f"Le fichier {file_name} n'a pas été trouvé.")
+        return None, None
+        
+    [(dico_scenes, dico_characters)] = run_consumers(replay_blocks(block for _, block in blocks), [collect_stats()])
+    return dico_scenes, dico_characters
+
+
+def read_manifest(piece: str) -> List[Tuple[str, Block]]:
+    """ Lit le manifeste des blocs du texte lors de la dernière lecture d'une pièce
+
+    Args:
+        piece (str): nom de la pièce
+
+    Returns:
+        List[Tuple[str, Block]]: empreinte et résumé de chaque bloc, ou None s'il n'y a pas de manifeste utilisable
+    """
+    
+    try:
+        with open(utils.get_manifest_file(piece), "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return None
+    
+    if manifest.get("Version") != MANIFEST_VERSION:
+        return None
+    
+    return [
+        (block_hash, (title, nb_lines, nb_didascalies, nb_words, {name: (lines, words) for name, lines, words in characters}))
+        for block_hash, title, nb_lines, nb_didascalies, nb_words, characters in manifest["Blocks"]
+    ]
+
+
+def manifest_to_bytes(blocks: List[Tuple[str, Block]]) -> bytes:
+    """ Met en forme le manifeste des blocs du texte d'une pièce
+
+    Args:
+        blocks (List[Tuple[str, Block]]): empreinte et résumé de chaque bloc
+
+    Returns:
+        bytes: contenu du fichier manifest.json
+    """
+    
+    manifest = {
+        "Version": MANIFEST_VERSION,
+        "Blocks": [
+            [block_hash, title, nb_lines, nb_didascalies, nb_words, [[name, lines, words] for name, (lines, words) in characters.items()]]
+            for block_hash, (title, nb_lines, nb_didascalies, nb_words, characters) in blocks
+        ]
+    }
     
-    return None, None
+    return json.dumps(manifest, ensure_ascii=False).encode("utf-8")
+
+
+def read_blocks(file_name: str, known_blocks: Dict[str, Block], workers: int) -> Tuple[List[Tuple[str, Block]], int]:
+    """ Découpe un texte en blocs, en ne réanalysant que les blocs dont l'empreinte est inconnue
+
+    Args:
+        file_name (str): nom du fichier à analyser
+        known_blocks (Dict[str, Block]): résumés des blocs déjà analysés, par empreinte
+        workers (int): nombre de processus pour un gros fichier lu pour la première fois
+
+    Returns:
+        Tuple[List[Tuple[str, Block]], int]: empreinte et résumé de chaque bloc, et nombre de blocs analysés
+    """
+    
+    if not known_blocks and workers > 1 and can_split(file_name):
+        offsets = get_chunk_offsets(file_name, workers * CHUNKS_PER_WORKER)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = executor.map(parse_chunk, [file_name] * (len(offsets) - 1), offsets[:-1], offsets[1:])
+            blocks = [hashed_block for chunk in chunks for hashed_block in chunk]
+        return blocks, len(blocks)
+    
+    blocks = []
+    nb_parsed = 0
+    with utils.open_text(file_name) as file:
+        for title, body in iter_raw_blocks(file):
+            block_hash = hash_block(title, body)
+            block = known_blocks.get(block_hash)
+            if block is None:
+                block = summarize_block(title, body)
+                nb_parsed += 1
+            blocks.append((block_hash, block))
+    
+    return blocks, nb_parsed
+
+
+def patch_info(piece: str, old_scenes: Dict[str, Tuple], old_characters: Dict[CharacterName, Tuple[int, int]], new_scenes: Dict[str, Tuple], new_characters: Dict[CharacterName, Tuple[int, int]], other_files: Dict[str, bytes] = None) -> bool:
+    """ Reporte dans les fichiers csv les différences entre deux lectures du texte, sans toucher au reste
+
+    Les scènes dont le texte n'a pas changé gardent leur ligne actuelle (et donc les modifications faites avec ad, mg, dl...),
+    les scènes modifiées reprennent les valeurs du texte, et les totaux des personnages sont corrigés de la différence
+    entre l'ancienne et la nouvelle contribution du texte.
+
+    Args:
+        piece (str): nom de la pièce
+        old_scenes (Dict[str, Tuple]): scènes issues de la lecture précédente
+        old_characters (Dict[CharacterName, Tuple[int, int]]): personnages issus de la lecture précédente
+        new_scenes (Dict[str, Tuple]): scènes issues de la nouvelle lecture
+        new_characters (Dict[CharacterName, Tuple[int, int]]): personnages issus de la nouvelle lecture
+        other_files (Dict[str, bytes]): autres fichiers à écrire en même temps que les csv
+
+    Returns:
+        bool: retourne True si les fichiers ont bien été mis à jour
+    """
+    
+    scenes_file = utils.get_scenes_file(piece)
+    characters_file = utils.get_characters_file(piece)
+    
+    try:
+        with open(scenes_file, "r", encoding="utf-8") as file:
+            scene_rows = list(csv.reader(file))[1:]
+        with open(characters_file, "r", encoding="utf-8") as file:
+            character_rows = list(csv.reader(file))[1:]
+    except OSError:
+        return False
+    
+    def text_row(scene: str) -> List[str]:
+        lines, didascalies, words, list_characters = new_scenes[scene]
+        return [scene, str(lines), str(didascalies), str(words), ":".join(list_characters)]
+    
+    patched_scenes = []
+    placed = set()
+    for row in scene_rows:
+        scene = row[0]
+        if scene in new_scenes:
+            if scene not in old_scenes or new_scenes[scene] != old_scenes[scene]:
+                row = text_row(scene)
+            patched_scenes.append(row)
+            placed.add(scene)
+        elif scene not in old_scenes: # Scène ajoutée avec nw
+            patched_scenes.append(row)
+    
+    # Les nouvelles scènes du texte sont placées après la scène qui les précède dans le texte
+    previous_scene = None
+    for scene in new_scenes:
+        if scene not in placed:
+            names = [row[0] for row in patched_scenes]
+            position = names.index(previous_scene) + 1 if previous_scene in names else 0
+            patched_scenes.insert(position, text_row(scene))
+            placed.add(scene)
+        previous_scene = scene
+    
+    patched_characters = []
+    known_characters = set()
+    for row in character_rows:
+        character = row[0]
+        known_characters.add(character)
+        if character in old_characters or character in new_characters:
+            old_lines, old_words = old_characters.get(character, (0, 0))
+            new_lines, new_words = new_characters.get(character, (0, 0))
+            row = [character, int(row[1]) + new_lines - old_lines, int(row[2]) + new_words - old_words]
+            if character not in new_characters and row[1] == 0 and row[2] == 0:
+                continue # Personnage qui a disparu du texte
+        patched_characters.append(row)
+    
+    for character, (new_lines, new_words) in new_characters.items():
+        # Un personnage de l'ancienne lecture absent du csv a été renommé, fusionné ou supprimé à la main
+        if character not in known_characters and character not in old_characters:
+            patched_characters.append([character, new_lines, new_words])
+    
+    contents = {
+        scenes_file: store.rows_to_bytes(list(type.HEADER_SCENES.values()), patched_scenes),
+        characters_file: store.rows_to_bytes(list(type.HEADER_CHARACTERS.values()), patched_characters)
+    }
+    contents.update(other_files or {})
+    store.write_files(piece, contents)
+    
+    return True
+
+
+def read_text(piece: str, workers: int = None, register: bool = True) -> Tuple[bool, int, int]:
+    """ Lit le texte d'une pièce et met à jour ses fichiers csv, en ne réanalysant que les scènes modifiées depuis la dernière lecture
+
+    Args:
+        piece (str): nom de la pièce
+        workers (int): nombre de processus pour un gros fichier (par défaut, le nombre de processeurs)
+        register (bool): ajoute la pièce au fichier des pièces lues si cet argument est True
+
+    Returns:
+        Tuple[bool, int, int]: True si les csv ont été écrits, nombre de blocs du texte et nombre de blocs analysés
+    """
+    
+    file_name = utils.get_text_file(piece)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    
+    store.recover(piece)
+    # Les modifications enregistrées dans la base de données sont reportées dans les csv avant d'être fusionnées
+    if database.exists(piece):
+        database.export_csv(piece)
+    old_blocks = read_manifest(piece)
+    known_blocks = {block_hash: block for block_hash, block in old_blocks or []}
+    
+    try:
+        blocks, nb_parsed = read_blocks(file_name, known_blocks, workers)
+    except FileNotFoundError:
+        print(f"Le fichier {file_name} n'a pas été trouvé.")
+        return False, 0, 0
+    
+    (dico_scenes, dico_characters), dico_matrix = run_consumers(replay_blocks(block for _, block in blocks), [collect_stats(), collect_matrix()])
+    if not dico_scenes or not dico_characters:
+        return False, len(blocks), nb_parsed
+    
+    # Le manifeste doit toujours correspondre aux csv : il est écrit avec eux
+    manifest = {utils.get_manifest_file(piece): manifest_to_bytes(blocks)}
+    
+    csv_exist = os.path.exists(utils.get_scenes_file(piece)) and os.path.exists(utils.get_characters_file(piece))
+    if old_blocks is not None and csv_exist:
+        [(old_scenes, old_characters)] = run_consumers(replay_blocks(block for _, block in old_blocks), [collect_stats()])
+        written = patch_info(piece, old_scenes, old_characters, dico_scenes, dico_characters, manifest)
+    else:
+        written = write_info(piece, dico_scenes, dico_characters, False, manifest)
+    
+    if written:
+        store.write_matrix(piece, dico_matrix, list(dico_characters))
+        if database.exists(piece):
+            database.import_csv(piece)
+        if register:
+            data.add_piece(piece, get_metadata(piece, blocks))
+    
+    return written, len(blocks), nb_parsed
+
+
+def get_metadata(piece: str, blocks: List[Tuple[str, Block]]) -> Dict:
+    """ Rassemble les informations gardées dans le fichier des pièces lues, après la lecture d'une pièce
+
+    Args:
+        piece (str): nom de la pièce
+        blocks (List[Tuple[str, Block]]): empreinte et résumé de chaque bloc du texte
+
+    Returns:
+        Dict: empreinte du texte (calculée à partir de celles des blocs), nombres de scènes et de personnages,
+        date de la lecture et dates de modification des fichiers de données
+    """
+    
+    text_hash = hashlib.sha1("".join(block_hash for block_hash, _ in blocks).encode("utf-8")).hexdigest()
+    return {
+        "TextHash": text_hash,
+        "Scenes": utils.count_lines(utils.get_scenes_file(piece)) - 1,
+        "Characters": utils.count_lines(utils.get_characters_file(piece)) - 1,
+        "ParsedAt": time.time(),
+        "Mtimes": data.get_mtimes(piece)
+    }
 
 
 def read(piece: str) -> None:
@@ -214,11 +833,77 @@ def read(piece: str) -> None:
         piece (str): nom de la pièce
     """
     
-    file_name = utils.get_text_file(piece)
-    dico_scenes, dico_characters = read_file(file_name)
+    written, nb_blocks, nb_parsed = read_text(piece)
+    
+    if written:
+        print(f"Les statistiques ont bien été collectées et ont été enregistrées dans le dossier '{piece}' ({nb_parsed}/{nb_blocks} bloc·s analysé·s)")
+
+
+def get_all_pieces() -> List[str]:
+    """ Donne le nom de toutes les pièces présentes dans le dossier des textes
+
+    Returns:
+        List[str]: noms des pièces, triés par ordre alphabétique
+    """
+    
+    pieces = set()
+    for extension in utils.TEXT_EXTENSIONS:
+        for text_file in glob.glob(f"texts/*{extension}"):
+            pieces.add(os.path.basename(text_file)[:-len(extension)])
+    return sorted(pieces)
+
+
+def read_one(piece: str) -> Tuple[str, bool, int, float]:
+    """ Lit une pièce sans l'enregistrer dans le fichier des pièces lues, pour la lecture en parallèle
+
+    Args:
+        piece (str): nom de la pièce
+
+    Returns:
+        Tuple[str, bool, int, float]: nom de la pièce, True si les csv ont été écrits, nombre de lignes lues et durée en secondes
+    """
+    
+    start = time.perf_counter()
+    
+    written, _, _ = read_text(piece, workers=1, register=False) # Les pièces sont déjà lues en parallèle
+    
+    nb_lines = 0
+    if written:
+        nb_lines = utils.count_lines(utils.get_text_file(piece))
+    
+    return piece, written, nb_lines, time.perf_counter() - start
+
+
+def read_many(pieces: List[str], workers: int = None) -> List[str]:
+    """ Lit plusieurs pièces en parallèle, puis les enregistre en une seule fois dans le fichier des pièces lues
+
+    Args:
+        pieces (List[str]): noms des pièces
+        workers (int): nombre de processus (par défaut, le nombre de processeurs)
+
+    Returns:
+        List[str]: pièces dont les statistiques ont bien été écrites
+    """
+    
+    start = time.perf_counter()
+    results = []
+    
+    # Chaque processus écrit son propre dossier : seul le fichier des pièces lues est partagé, et il est mis à jour à la fin
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(read_one, piece) for piece in dict.fromkeys(pieces)]
+        for future in as_completed(futures):
+            piece, written, nb_lines, elapsed = future.result()
+            results.append((piece, written, nb_lines, elapsed))
+            if written:
+                print(f"  {piece} : {nb_lines} lignes en {elapsed:.3f} s")
+            else:
+                print(f"  {piece} : échec de la lecture")
+    
+    total_time = time.perf_counter() - start
+    read_pieces = [piece for piece, written, _, _ in sorted(results) if written]
+    data.add_pieces({piece: get_metadata(piece, read_manifest(piece) or []) for piece in read_pieces})
     
-    if dico_scenes and dico_characters:
-        written = write_info(piece, dico_scenes, dico_characters)
+    total_lines = sum(nb_lines for _, _, nb_lines, _ in results)
+    print(f"\n{len(read_pieces)}/{len(results)} pièce·s lue·s : {total_lines} lignes en {total_time:.3f} s ({total_lines / total_time:.0f} lignes/s)")
     
-        if written:
-            print(f"Les statistiques ont bien été collectées et ont été enregistrées dans le dossier '{piece}'")
+    return read_pieces
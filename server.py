@@ -0,0 +1,352 @@
+from typing import Dict, List
+import asyncio
+import contextlib
+import io
+import json
+import os
+import signal
+import sys
+
+import casting
+import data
+import history
+import index
+import load
+import model
+import modify
+import stage
+import type
+import utils
+
+# Ce module ne doit pas importer analyse (ni matplotlib) : le serveur démarre vite et ne fait pas d'affichage
+
+_loading: Dict[str, asyncio.Future] = {} # Pièces en cours de chargement, pour ne les charger qu'une fois
+
+
+def get_scene_row(scene: type.Scene, kind: str) -> Dict:
+    return {
+        "Scene": scene["Scene"],
+        "Lines": int(scene["Lines"]),
+        "Didascalies": int(scene["Didascalies"]),
+        "Words": int(scene["Words"]),
+        kind: sorted(name for name in scene[kind] if name)
+    }
+
+
+def answer_sc(loaded: type.Piece, args: List[str]) -> Dict:
+    """ Donne les scènes et les personnages (ou comédien·nes) présents, comme sc
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        args (List[str]): arguments de la commande ([ac])
+
+    Returns:
+        Dict: réponse à envoyer
+    """
+
+    kind, _ = utils.handle_ac("ac" in args)
+    return {"result": [get_scene_row(scene, kind) for scene in loaded["Scenes"]]}
+
+
+def answer_ch(loaded: type.Piece, args: List[str]) -> Dict:
+    """ Donne les personnages (ou comédien·nes) par nombre de mots décroissant, comme ch
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        args (List[str]): arguments de la commande ([ac])
+
+    Returns:
+        Dict: réponse à envoyer
+    """
+
+    ac = "ac" in args
+    rows = []
+    for row in sorted(loaded["Actors"] if ac else loaded["Characters"], key=lambda row: row["Words"], reverse=True):
+        rows.append({"Name": row["Name"], "Lines": row["Lines"], "Words": row["Words"]})
+        if ac:
+            rows[-1]["Characters"] = row["Characters"]
+    return {"result": rows}
+
+
+def answer_dt(loaded: type.Piece, args: List[str]) -> Dict:
+    """ Donne les informations détaillées d'un personnage (ou d'un·e comédien·ne), comme dt
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        args (List[str]): arguments de la commande ([ac] <nom>)
+
+    Returns:
+        Dict: réponse à envoyer
+    """
+
+    ac = args[:1] == ["ac"]
+    name = " ".join(args[1:] if ac else args)
+    kind, to_tell = utils.handle_ac(ac)
+
+    position = model.find(loaded[kind], name)
+    if position < 0:
+        return {"error": f"{to_tell.capitalize()} '{name}' non trouvé."}
+    row = loaded[kind][position]
+
+    scenes = [loaded["Scenes"][position] for position in index.iter_positions(loaded["Index"][kind].get(name, 0))]
+    with_names = [sorted({other for other in scene[kind] if other and other != name}) for scene in scenes]
+
+    result = {
+        "Name": row["Name"],
+        "Lines": row["Lines"],
+        "Words": row["Words"],
+        "Scenes": [{"Scene": scene["Scene"], "With": others} for scene, others in zip(scenes, with_names)],
+        "Others": sorted(set().union(*with_names))
+    }
+    if ac:
+        result["Characters"] = row["Characters"]
+    return {"result": result}
+
+
+def answer_tg(loaded: type.Piece, args: List[str]) -> Dict:
+    """ Donne les scènes où des personnages (ou des comédien·nes) sont ensemble, comme tg
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        args (List[str]): arguments de la commande ([ac] <nom1> <nom2> <...>)
+
+    Returns:
+        Dict: réponse à envoyer
+    """
+
+    ac = args[:1] == ["ac"]
+    names = set(args[1:] if ac else args)
+    kind, _ = utils.handle_ac(ac)
+    scenes = loaded["Scenes"]
+
+    together = index.get_mask(loaded["Index"][kind], names, len(scenes))
+    return {"result": [
+        {"Scene": scenes[position]["Scene"], "Others": sorted({name for name in scenes[position][kind] if name} - names)}
+        for position in index.iter_positions(together)
+    ]}
+
+
+def answer_nb(loaded: type.Piece, args: List[str]) -> Dict:
+    """ Donne le nombre de scènes pour chaque nombre de personnages, ou les scènes avec un nombre de personnages, comme nb
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        args (List[str]): arguments de la commande ([<nombre>])
+
+    Returns:
+        Dict: réponse à envoyer
+    """
+
+    scenes = loaded["Scenes"]
+    if args:
+        nb = int(args[0])
+        return {"result": [get_scene_row(scene, "Characters") for scene in scenes if len(scene["Characters"]) == nb]}
+
+    histogram: Dict[int, int] = {}
+    for scene in scenes:
+        histogram[len(scene["Characters"])] = histogram.get(len(scene["Characters"]), 0) + 1
+    return {"result": {str(nb): nb_scenes for nb, nb_scenes in sorted(histogram.items())}}
+
+
+QUERIES = {"sc": answer_sc, "ch": answer_ch, "dt": answer_dt, "tg": answer_tg, "nb": answer_nb}
+
+
+def mutate(loaded: type.Piece, command: List[str]) -> Dict:
+    """ Modifie une pièce chargée, avec les mêmes commandes et arguments que l'invite (sans éditeur)
+
+    Args:
+        loaded (type.Piece): pièce chargée
+        command (List[str]): commande découpée en mots
+
+    Returns:
+        Dict: réponse à envoyer, avec les messages affichés par la modification
+    """
+
+    output = io.StringIO()
+    details: Dict = {}
+    with contextlib.redirect_stdout(output):
+        match command:
+            case ["nw", new_scene, nb_lines, nb_didascalies, nb_words, *next_scene]:
+                modify.add_scene(loaded, new_scene, nb_lines, nb_didascalies, nb_words, next_scene[0] if next_scene else "last")
+            case ["rn", "ac", old_name, new_name]:
+                modify.rename_character(loaded, old_name, new_name, True)
+            case ["rn", old_name, new_name]:
+                modify.rename_character(loaded, old_name, new_name, False)
+            case ["ad", new_character, *list_scenes] if list_scenes:
+                modify.add_character(loaded, new_character, list_scenes)
+            case ["mg", source_character, *destination_characters] if destination_characters:
+                modify.merge_characters(loaded, source_character, destination_characters)
+            case ["sp", character_name, nb_lines_to_add, nb_words_to_add]:
+                modify.add_lines_and_words(loaded, character_name, int(nb_lines_to_add), int(nb_words_to_add))
+            case ["bk", file_name]:
+                try:
+                    operations = load.get_mapping(file_name)
+                except FileNotFoundError:
+                    return {"error": f"Le fichier {file_name} n'a pas été trouvé."}
+                conflicts = modify.apply_mapping(loaded, operations)
+                if conflicts:
+                    return {"error": "Aucune modification n'a été faite, le fichier contient des conflits", "conflicts": conflicts}
+            case ["dc", *args]:
+                replace = args[:1] == ["rp"]
+                if replace:
+                    args = args[1:]
+                time_limit = float(args[0]) if args else casting.SOLVER_TIME_LIMIT
+                groups, lower_bound, optimal = casting.solve_casting(loaded, time_limit)
+                details["casting"] = {"Actors": groups, "LowerBound": lower_bound, "Optimal": optimal}
+                if loaded["Actors"] and not replace:
+                    return {"error": "Des comédien·nes sont déjà enregistré·es : la distribution n'a pas été appliquée (dc rp pour les remplacer)", **details}
+                if loaded["Actors"]:
+                    modify.delete_character(loaded, [actor["Name"] for actor in loaded["Actors"]], True)
+                for i, group in enumerate(groups):
+                    stage.link(loaded, f"Comédien·ne {i + 1}", group)
+            case ["dl", "ac", *actor_names] if actor_names:
+                modify.delete_character(loaded, actor_names, True)
+            case ["dl", *character_names] if character_names:
+                modify.delete_character(loaded, character_names, False)
+            case ["lk", *args] if len(args) > 1:
+                force = args[0] == "fc"
+                if force:
+                    args = args[1:]
+                conflicts = casting.get_link_conflicts(loaded, args[0], args[1:])
+                if conflicts and not force:
+                    return {"error": "Le lien n'a pas été créé (lk fc pour le créer quand même)", "conflicts": conflicts}
+                stage.link(loaded, args[0], args[1:])
+            case ["ul", actor_name, character_name]:
+                stage.unlink(loaded, actor_name, character_name)
+            case ["u"]:
+                if history.undo(loaded) is None:
+                    return {"error": "Aucune modification à annuler"}
+            case ["redo"]:
+                if history.redo(loaded) is None:
+                    return {"error": "Aucune modification à rétablir"}
+            case ["sv"]:
+                model.flush(loaded)
+            case _:
+                return {"error": "Commande mal formée"}
+
+    if command[0] in model.MODIFYING_COMMANDS:
+        history.record(loaded, " ".join(command))
+    return {"result": "ok", "messages": output.getvalue().splitlines(), **details}
+
+
+MUTATIONS = model.MODIFYING_COMMANDS | {"u", "redo", "sv"}
+
+
+def open_piece(piece: str) -> type.Piece:
+    loaded = model.open_piece(piece)
+    history.attach(loaded)
+    return loaded
+
+
+async def get_piece(piece: str) -> type.Piece:
+    """ Donne une pièce gardée en mémoire, ou la charge dans un autre fil pour continuer à répondre aux autres clients
+
+    Args:
+        piece (str): nom de la pièce
+
+    Returns:
+        type.Piece: pièce chargée
+    """
+
+    with model.LOCK:
+        loaded = model.get_cached(piece)
+    if loaded is not None:
+        return loaded
+
+    # Les clients qui demandent la même pièce pendant son chargement attendent le même chargement
+    if piece not in _loading:
+        _loading[piece] = asyncio.get_running_loop().run_in_executor(None, open_piece, piece)
+    try:
+        loaded = await _loading[piece]
+    finally:
+        _loading.pop(piece, None)
+
+    with model.LOCK:
+        model.cache_piece(loaded)
+    return loaded
+
+
+async def answer(request: Dict) -> Dict:
+    """ Répond à une requête d'un client
+
+    Les requêtes sont traitées une par une dans la boucle d'évènements, avec le verrou des pièces chargées :
+    une modification ne croise ni une autre requête, ni une écriture différée.
+
+    Args:
+        request (Dict): pièce ("piece") et commande ("command", chaîne ou liste de mots)
+
+    Returns:
+        Dict: résultat ("result") ou message d'erreur ("error")
+    """
+
+    piece = request["piece"]
+    command = request["command"]
+    if isinstance(command, str):
+        command = command.split()
+    if not command:
+        return {"error": "Commande vide"}
+    if command[0] not in QUERIES and command[0] not in MUTATIONS:
+        return {"error": "Commande inconnue"}
+    if not data.piece_exists(piece):
+        return {"error": f"Aucune donnée ne correspond à la pièce '{piece}'"}
+
+    loaded = await get_piece(piece)
+    with model.LOCK:
+        if command[0] in QUERIES:
+            return QUERIES[command[0]](loaded, command[1:])
+        return mutate(loaded, command)
+
+
+async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """ Répond aux requêtes d'un client (une ligne json par requête et par réponse) jusqu'à ce qu'il se déconnecte
+
+    Args:
+        reader (asyncio.StreamReader): requêtes du client
+        writer (asyncio.StreamWriter): réponses au client
+    """
+
+    try:
+        while line := await reader.readline():
+            try:
+                response = await answer(json.loads(line))
+            except (ValueError, IndexError, KeyError, TypeError):
+                response = {"error": "Commande mal formée"}
+            except OSError as error:
+                response = {"error": f"Impossible de charger la pièce : {error}"}
+            writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(socket_file: str) -> None:
+    """ Attend les clients sur une socket Unix
+
+    Args:
+        socket_file (str): chemin de la socket
+    """
+
+    if os.path.exists(socket_file):
+        os.remove(socket_file) # Socket laissée par un serveur arrêté brutalement
+    server = await asyncio.start_unix_server(handle_client, path=socket_file)
+    print(f"En attente de requêtes sur {socket_file}")
+
+    # Ctrl+C ou kill arrêtent le serveur proprement : les modifications en attente sont écrites en sortant
+    stop = asyncio.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        asyncio.get_running_loop().add_signal_handler(signal_number, stop.set)
+    async with server:
+        await stop.wait()
+
+
+if __name__ == "__main__":
+    # python server.py [<socket>]
+    socket_file = sys.argv[1] if len(sys.argv) > 1 else utils.get_socket_file()
+    try:
+        asyncio.run(serve(socket_file))
+    finally:
+        model.flush_all()
+        if os.path.exists(socket_file):
+            os.remove(socket_file)
@@ -1,68 +1,58 @@
 from typing import List
-import csv
 
-import utils
+import model
+import type
 
-def link(piece: str, actor_name: str, character_names: List[str]) -> None:
+def link(loaded: type.Piece, actor_name: str, character_names: List[str]) -> None:
     """ Relie un·e comédien·ne à des personnages
 
     Args:
-        piece (str): nom de la pièce
+        loaded (type.Piece): pièce chargée
         actor_name (str): nom du comédien
         character_names (List[str]): liste des noms des personnages
     """
-    
-    actors_file = utils.get_actors_file(piece)
-    
-    try:
-        with open(actors_file, "r", encoding="utf-8") as file:
-            reader = csv.reader(file)
-            rows = list(reader)
-    except:
-        rows = []
-    
-    found = False
-    with open(actors_file, "w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        
-        for row in rows:
-            if row[0] == actor_name:
-                found = True
-                list_characters = row[1].split(":")
-                for character in character_names:
-                    if character not in list_characters:
-                        list_characters.append(character)
-                row[1] = ":".join(list_characters)
-            writer.writerow(row)
-        
-        if not found:
-            str_characters = ":".join(character_names)
-            writer.writerow([actor_name, str_characters])
 
+    actors = loaded["Actors"]
+    position = model.find(actors, actor_name)
 
-def unlink(piece: str, actor_name: str, character_name: str) -> None:
+    if position >= 0:
+        list_characters = list(actors[position]["Characters"])
+        for character in character_names:
+            if character not in list_characters:
+                list_characters.append(character)
+        model.update_row(loaded, "Actors", position, Characters=list_characters)
+    else:
+        model.insert_row(loaded, "Actors", len(actors), {
+            "Name": actor_name,
+            "Lines": 0,
+            "Words": 0,
+            "Characters": list(character_names)
+        })
+
+    model.links_changed(loaded, character_names)
+    model.refresh_actor_totals(loaded, [actor_name])
+    model.mark_dirty(loaded, "ac")
+
+
+def unlink(loaded: type.Piece, actor_name: str, character_name: str) -> None:
     """ Retirer un lien entre un·e comédien·ne et un personnage
 
     Args:
-        piece (str): nom de la pièce
+        loaded (type.Piece): pièce chargée
         actor_name (str): nom du comédien
         character_name (str): nom du personnage
     """
-    
-    actors_file = utils.get_actors_file(piece)
-    
-    with open(actors_file, "r", encoding="utf-8") as file:
-        reader = csv.reader(file)
-        rows = list(reader)
-    
-    with open(actors_file, "w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        
-        for row in rows:
-            if row[0] == actor_name:
-                list_characters = row[1].split(":")
-                if character_name in list_characters:
-                    list_characters.remove(character_name)
-                row[1] = ":".join(list_characters)
-            if row[1]:
-                writer.writerow(row)
\ No newline at end of file
+
+    for position, actor in enumerate(loaded["Actors"]):
+        if actor["Name"] == actor_name:
+            if character_name in actor["Characters"]:
+                characters_played = list(actor["Characters"])
+                characters_played.remove(character_name)
+                model.update_row(loaded, "Actors", position, Characters=characters_played)
+
+    # Un·e comédien·ne qui ne joue plus aucun personnage n'est pas conservé·e
+    model.delete_rows(loaded, "Actors", lambda actor: not ":".join(actor["Characters"]))
+
+    model.links_changed(loaded, [character_name])
+    model.refresh_actor_totals(loaded, [actor_name])
+    model.mark_dirty(loaded, "ac")
@@ -1,13 +1,21 @@
 from typing import List, Tuple
+import sys
 
 import read
+import load
 import analyse
+import casting
+import corpus
 import data
+import database
 import modify
+import planning
 import editor
 import stage
 import type
-import load
+import model
+import history
+import utils
 
 
 def usage() -> None:
@@ -16,16 +24,21 @@ def usage() -> None:
     print("\n  h - Afficher cette aide")
     
     print("\n  rd <piece> - Lire un fichier texte pour collecter des données et les stocker dans des fichiers csv")
+    print("  rd <piece1> <piece2> <...> | rd * - Lire plusieurs fichiers textes (ou tous) en parallèle")
     
-    print("\n  ls - Afficher la liste des pièces disponibles, dont on peut analyser les données")
+    print("\n  ls - Afficher la liste des pièces disponibles, dont on peut analyser les données, avec leurs nombres de scènes et de personnages")
+    print("  co [<piece1> <piece2> <...>] - Comparer les pièces lues (ou certaines) : mots par scène, personnages, personnages par scène, part des didascalies")
     print("  ld <dossier> - Charger les données présentes dans un dossier")
     print("  rm <dossier> - Supprimer les données présentes dans un dossier")
+    print("  mm [<Mo>] - Afficher les pièces gardées en mémoire (changement de pièce immédiat avec ld), ou changer le budget mémoire")
+    print("  @<dossier> <commande> - Exécuter une commande sur une autre pièce sans changer de pièce chargée (ex : @uds ch)")
     
     print("\n  sc [gr] [ac] - Afficher les scènes et les personnages présents (gr pour afficher un graphique)")
     print("  nb [<nombre>] - Afficher les scènes avec un certain nombre de personnages")
     print("  ch [gr] [ac] - Afficher les personnages avec leur nombre de répliques et de mots (gr pour afficher un graphique)")
     print("  dt [ac] <nom> - Afficher les informations détaillées d'un personnage spécifique")
     print("  tg [ac] <perso1> <perso2> <...> - Afficher les scènes en commun pour des personnages")
+    print("  cp [ac] [<nombre>] - Afficher le nombre de scènes partagées par chaque paire de personnages, ou les paires qui en partagent le plus")
     print("  pt sc|ch|ac - Afficher le contenu du fichier csv pour les scènes (sc), les personnages (ch), ou les comédien·es (ac)")
         
     print("\n  nw <nouvelle-scene> <repliques> <didascalies> <mots> <scene-suivante> - Ajouter une scène avec ses données, avant une autre spécifiée (ajoute à la fin si aucune scène donnée)")
@@ -36,279 +49,487 @@ def usage() -> None:
     print("  sp <perso> <repliques> <mot> - Ajouter un certain nombre de répliques et de mots à un personnage")
     print("  dl [ac] <perso> - Supprimer un personnage")
     
+    print("  bk <fichier> - Appliquer en une fois des renommages, fusions et suppressions (csv Operation,Name,Targets : rn|mg|dl, nom, cibles séparées par ':')")
+    
     print("\n  Le paramètre 'ac' sur les commandes précédentes permet d'afficher ou de modifier des informations concernant les comédien·es plutôt que les personnages")
     
-    print("\n  lk <comedien> <perso1> <perso2> <...> - Lier un comédien à un ou plusieurs personnages")
+    print("\n  lk [fc] <comedien> <perso1> <perso2> <...> - Lier un comédien à un ou plusieurs personnages (refusé si deux de ses personnages sont sur scène ensemble, sauf avec fc)")
     print("  ul <comedien> <perso> - Supprimer le lien entre un comédien et un personnage")
+    print("  cf - Afficher les scènes où un·e comédien·ne doit jouer plusieurs personnages à la fois")
+    print("  qc - Afficher les changements de personnage d'un·e comédien·ne entre deux scènes consécutives")
+    print("  pl <fichier> - Répartir les scènes entre des séances de répétition (csv SessionName,Actors,MaxWords : comédien·nes disponibles séparé·es par ':')")
+    print("  ps <comedien1> <comedien2> <...> - Afficher les scènes qui peuvent être répétées avec ces comédien·nes, de la plus longue à la plus courte")
+    print("  dc [rp] [<secondes>] - Calculer le nombre minimum de comédien·nes et une distribution sans conflit, puis l'enregistrer (rp pour remplacer les comédien·nes existant·es)")
+    
+    print("\n  u - Annuler la dernière modification")
+    print("  redo - Rétablir la dernière modification annulée")
+    
+    print("\n  db - Enregistrer la pièce dans une base de données SQLite (<piece>/piece.db) plutôt que dans les fichiers csv")
+    print("  db csv - Revenir aux fichiers csv (réécrits depuis la base, qui est supprimée)")
+    
+    print("\n  sv - Enregistrer tout de suite les modifications (sinon écrites après quelques secondes d'inactivité, au changement de pièce et en quittant)")
     
     print("\n  Entrer une commande sans argument alors qu'elle nécessite un personnage et/ou une scène ouvrira un éditeur pour choisir les arguments")
     
     print("\n  q - Quitter")
 
 
-def update(piece: str) -> Tuple[List[type.Character], List[type.Scene], List[type.Actor]]:
-    """ Met à jour les informations collectées dans les fichiers CSV
+def update(piece: str) -> type.Piece:
+    """ Charge en mémoire les informations collectées dans les fichiers CSV, ou reprend la pièce si elle est déjà en mémoire
 
     Args:
         piece (str): nom de la pièce
 
     Returns:
-        Tuple[List[type.Character], List[type.Scene], List[type.Actor], List[type.Stage]]: informations sur la pièce
+        type.Piece: pièce chargée, modifiée en mémoire par les commandes puis réécrite en différé
     """
     
-    characters = load.get_characters(piece)
-    scenes = load.get_scenes(piece)
-    actors = load.get_actors(piece, characters)
-    
-    return characters, scenes, actors
+    loaded = model.get_cached(piece)
+    if loaded is None:
+        loaded = model.open_piece(piece)
+        history.attach(loaded)
+    model.cache_piece(loaded)
+    return loaded
+
+
+def execute(command: List[str], loaded: type.Piece) -> Tuple[type.Piece, bool]:
+    """ Exécute une commande sur la pièce chargée
+
+    Args:
+        command (List[str]): commande découpée en mots
+        loaded (type.Piece): pièce chargée, ou None si aucune pièce n'a été chargée
+
+    Returns:
+        Tuple[type.Piece, bool]: pièce chargée après la commande, et False s'il faut quitter
+    """
     
+    graphic = False
+    ac = False
     
-def main(piece, characters, scenes, actors) -> None:
-    """ Fonction principale qui gère les commandes
-    """
+    if loaded:
+        piece = loaded["Name"]
+        characters, scenes, actors = loaded["Characters"], loaded["Scenes"], loaded["Actors"]
+    else:
+        piece, characters, scenes, actors = None, None, None, None
     
-    #try:
-    while True:
-            graphic = False
-            ac = False
+    match command:
+        
+        case ["h"]:
+            usage()
+                                
+        case ["q"]:
+            model.flush_all()
+            print("Au revoir !\n")
+            return loaded, False
+        
+        case ["rd", *piece_names] if piece_names:
+            if piece_names == ["*"]:
+                piece_names = read.get_all_pieces()
+            for cached in model.get_cached_pieces():
+                if cached["Name"] in piece_names:
+                    model.flush(cached)
             
-            command = input("\n > ").split()
+            if len(piece_names) == 1:
+                read.read(piece_names[0])
+            else:
+                read.read_many(piece_names)
             
-            match command:
-                
-                case ["h"]:
-                    usage()
-                                        
-                case ["q"]:
-                    print("Au revoir !\n")
-                    break
+            if loaded and loaded["Name"] in piece_names:
+                loaded = update(loaded["Name"])
+            
+        case ["ls"]:
+            data.print_pieces()
+            
+        case ["co", *piece_names]:
+            model.flush_all()
+            
+            stats, reloaded, failed = corpus.get_corpus_stats(piece_names or sorted(data.get_registry()))
+            if stats:
+                analyse.print_corpus(stats, corpus.merge_stats(list(stats.values())))
+                print(f"\n{len(stats)} pièce·s, dont {len(reloaded)} rechargée·s (les autres viennent du cache {corpus.CACHE_FILE})")
+            if failed:
+                print(f"Pièce·s sans données lisibles : {', '.join(failed)}")
+            
+        case ["ld", piece]:
+            piece = command[1]
+            if data.piece_exists(piece):
+                if loaded:
+                    model.flush(loaded)
+                loaded = update(piece)
+                print(f"Les données de '{piece}' ont été chargées avec succès")
+            else:
+                print(f"Aucune donnée ne correspond à la pièce '{piece}'")
                 
-                case ["rd", piece_name]:
-                    read.read(piece_name)
+        case ["rm", piece_to_delete]:
+            if loaded and loaded["Name"] == piece_to_delete:
+                model.discard(loaded)
+                loaded = None
+            model.forget(piece_to_delete)
+            data.delete_piece(piece_to_delete)
+        
+        case ["mm", *args]:
+            if args:
+                model.set_memory_budget(int(args[0]) * 1024 * 1024)
+            print(f"Budget mémoire : {model.MEMORY_BUDGET // (1024 * 1024)} Mo")
+            for cached in reversed(model.get_cached_pieces()):
+                pending = " (modifications en attente)" if cached["Dirty"] else ""
+                print(f"  - {cached['Name']} : {cached['Size'] / (1024 * 1024):.1f} Mo estimés{pending}")
+        
+        case [target, *target_command] if target.startswith("@") and target_command:
+            if data.piece_exists(target[1:]):
+                execute(target_command, update(target[1:]))
+                if loaded:
+                    model.cache_piece(loaded) # La pièce active reste la plus récemment utilisée
+            else:
+                print(f"Aucune donnée ne correspond à la pièce '{target[1:]}'")
+            
+        case _:
+            if not characters or not scenes:
+                print("Vous devez d'abord charger les données d'une pièce")
+            else:
+                match command:
                     
-                case ["ls"]:
-                    data.print_pieces()
+                    case ["sc", *args]:
+                        if "gr" in args:
+                            graphic = True
+                        if "ac" in args:
+                            ac = True
+                        analyse.print_scenes(scenes, graphic, ac)
                     
-                case ["ld", piece]:
-                    piece = command[1]
-                    if data.piece_exists(piece):
-                        characters, scenes, actors = update(piece)                    
-                        print(f"Les données de '{piece}' ont été chargées avec succès")
-                    else:
-                        print(f"Aucune donnée ne correspond à la pièce '{piece}'")
-                        
-                case ["rm", piece_to_delete]:
-                    data.delete_piece(piece_to_delete)
+                    case ["nb", *args]:
+                        if args:
+                            analyse.print_scenes_with_nb(scenes, int(args[0]))
+                        else:
+                            analyse.print_nb_of_characters_in_scenes(scenes, len(characters))
                     
-                case _:
-                    if not characters or not scenes:
-                        print("Vous devez d'abord charger les données d'une pièce")
-                    else:
-                        match command:
-                            
-                            case ["sc", *args]:
-                                if "gr" in args:
-                                    graphic = True
-                                if "ac" in args:
-                                    ac = True
-                                analyse.print_scenes(scenes, graphic, ac)
-                            
-                            case ["nb", *args]:
-                                if args:
-                                    analyse.print_scenes_with_nb(scenes, int(args[0]))
+                    case ["ch", *args]:
+                        to_show = characters
+                        if "gr" in args:
+                            graphic = True
+                        if "ac" in args:
+                            ac = True
+                            to_show = actors
+                        analyse.print_characters(to_show, ac, graphic)
+                    
+                    case ["dt", *args]:
+                        if args:
+                            if args[0] == "ac":
+                                to_show = actors
+                                ac = True
+                                if len(args) == 1:
+                                    name = editor.dt(actors, "comédien·ne")
                                 else:
-                                    analyse.print_nb_of_characters_in_scenes(scenes, len(characters))
-                            
-                            case ["ch", *args]:
+                                    name = " ".join(args[1:])
+                            else:
                                 to_show = characters
-                                if "gr" in args:
-                                    graphic = True
-                                if "ac" in args:
-                                    ac = True
-                                    to_show = actors
-                                analyse.print_characters(to_show, ac, graphic)
+                                name = " ".join(args)
+                        else:
+                            to_show = characters
+                            name = editor.dt(characters, "personnage")
                             
-                            case ["dt", *args]:
-                                if args:
-                                    if args[0] == "ac":
-                                        to_show = actors
-                                        ac = True
-                                        if len(args) == 1:
-                                            name = editor.dt(actors, "comédien·ne")
-                                        else:
-                                            name = " ".join(args[1:])
-                                    else:
-                                        to_show = characters
-                                        name = " ".join(args)
-                                else:
-                                    to_show = characters
-                                    name = editor.dt(characters, "personnage")
-                                    
-                                analyse.print_character_detail(to_show, scenes, name, ac)
-                                
-                            case ["tg", *args]:
-                                if len(args) > 1:
-                                    if args[0] == "ac":
-                                        ac = True
-                                        list_characters = args[1:]
-                                    else:
-                                        list_characters = args
-                                else:
-                                    if args:
-                                        if args[0] == "ac":
-                                            ac = True
-                                            list_characters = editor.tg(actors, "comédien·ne")
-                                        else:
-                                            print("Commande mal formée")
-                                            continue
-                                    else:
-                                        list_characters = editor.tg(characters, "personnage")
-                                        
-                                analyse.print_characters_together(scenes, list_characters, ac)
-                                
-                            case ["pt", file_type]:
-                                if data.piece_exists(piece):
-                                    data.print_csv(piece, file_type)
-                                else:
-                                    print(f"Aucune donnée n'est associée à la pièce '{piece}'")
-                                    
-                            case ["nw", *args]:
-                                if args:
-                                    new_scene = args[0]
-                                    nb_lines = args[1]
-                                    nb_didascalies = args[2]
-                                    nb_words = args[3]
-                                    if len(args) > 4:
-                                        next_scene = args[4]
-                                    else:
-                                        next_scene = "last"
+                        analyse.print_character_detail(to_show, scenes, name, ac, loaded["Index"][utils.handle_ac(ac)[0]])
+                        
+                    case ["tg", *args]:
+                        if len(args) > 1:
+                            if args[0] == "ac":
+                                ac = True
+                                list_characters = args[1:]
+                            else:
+                                list_characters = args
+                        else:
+                            if args:
+                                if args[0] == "ac":
+                                    ac = True
+                                    list_characters = editor.tg(actors, "comédien·ne")
                                 else:
-                                    new_scene, nb_lines, nb_didascalies, nb_words, next_scene = editor.nw(scenes)
+                                    print("Commande mal formée")
+                                    return loaded, True
+                            else:
+                                list_characters = editor.tg(characters, "personnage")
                                 
-                                modify.add_scene(piece, new_scene, nb_lines, nb_didascalies, nb_words, next_scene)
-                                characters, scenes, actors = update(piece)
-                                
-                                print("La scène a bien été ajoutée")
+                        analyse.print_characters_together(scenes, list_characters, ac, loaded["Index"][utils.handle_ac(ac)[0]])
+                        
+                    case ["cp", *args]:
+                        if args and args[0] == "ac":
+                            ac = True
+                            args = args[1:]
+                        to_show, _ = utils.handle_ac(ac)
+                        names = utils.extract_list_names(actors if ac else characters, "Name")
+                        top = int(args[0]) if args else None
+                        
+                        analyse.print_copresence(model.get_copresence(loaded, to_show), names, ac, top)
+                        
+                    case ["pt", file_type]:
+                        if data.piece_exists(piece):
+                            model.flush(loaded)
+                            if loaded["Backend"] == "sqlite":
+                                database.export_csv(piece)
+                            data.print_csv(piece, file_type)
+                        else:
+                            print(f"Aucune donnée n'est associée à la pièce '{piece}'")
                             
-                            case ["rn", *args]:
-                                if len(args) > 1:
-                                    if args[0] == "ac":
-                                        ac = True
-                                        old_name = args[1]
-                                        new_name = args[2]
-                                    else:
-                                        old_name = args[0]
-                                        new_name = args[1]
+                    case ["nw", *args]:
+                        if args:
+                            new_scene = args[0]
+                            nb_lines = args[1]
+                            nb_didascalies = args[2]
+                            nb_words = args[3]
+                            if len(args) > 4:
+                                next_scene = args[4]
+                            else:
+                                next_scene = "last"
+                        else:
+                            new_scene, nb_lines, nb_didascalies, nb_words, next_scene = editor.nw(scenes)
+                        
+                        modify.add_scene(loaded, new_scene, nb_lines, nb_didascalies, nb_words, next_scene)
+                        
+                        print("La scène a bien été ajoutée")
+                    
+                    case ["rn", *args]:
+                        if len(args) > 1:
+                            if args[0] == "ac":
+                                ac = True
+                                old_name = args[1]
+                                new_name = args[2]
+                            else:
+                                old_name = args[0]
+                                new_name = args[1]
+                        else:
+                            if args:
+                                if args[0] == "ac":
+                                    ac = True
+                                    old_name, new_name = editor.rn(actors, "comédien·ne")
                                 else:
-                                    if args:
-                                        if args[0] == "ac":
-                                            ac = True
-                                            old_name, new_name = editor.rn(actors, "comédien·ne")
-                                        else:
-                                            print("Commande mal formée")
-                                            continue
-                                    else:
-                                        old_name, new_name = editor.rn(characters, "personnage")
-                                    
-                                modify.rename_character(piece, old_name, new_name, ac)
-                                characters, scenes, actors = update(piece)
-                                
-                                print("Le changement de nom a été opéré avec succès")
+                                    print("Commande mal formée")
+                                    return loaded, True
+                            else:
+                                old_name, new_name = editor.rn(characters, "personnage")
                             
-                            case ["ad", *args]:
-                                if args:
-                                    new_character = args[0]
-                                    list_scenes = args[1:]
-                                else:
-                                    new_character, list_scenes = editor.ad(scenes, characters)
+                        modify.rename_character(loaded, old_name, new_name, ac)
+                        
+                        print("Le changement de nom a été opéré avec succès")
                     
-                                modify.add_character(piece, new_character, list_scenes)
-                                characters, scenes, actors = update(piece)
-                                
-                                print("Le personnage a bien été ajouté")
-                            
-                            case ["mg", *args]:
-                                if args:
-                                    source_character = args[0]
-                                    destination_characters = args[1:]
-                                else:
-                                    source_character, destination_characters = editor.mg(characters)
+                    case ["ad", *args]:
+                        if args:
+                            new_character = args[0]
+                            list_scenes = args[1:]
+                        else:
+                            new_character, list_scenes = editor.ad(scenes, characters)
+            
+                        modify.add_character(loaded, new_character, list_scenes)
                         
-                                modify.merge_characters(piece, source_character, destination_characters)
-                                
-                                characters, scenes, actors = update(piece)
-                                
-                                print("Les personnages ont bien été fusionnés")
-                            
-                            case ["sp", *args]:
-                                if args:
-                                    character_name = args[0]
-                                    nb_lines_to_add = int(args[1])
-                                    nb_words_to_add = int(args[2])
-                                else:
-                                    character_name, nb_lines_to_add, nb_words_to_add = editor.sp(characters)
-                                
-                                modify.add_lines_and_words(piece, character_name, nb_lines_to_add, nb_words_to_add)
-                                
-                                characters, scenes, actors = update(piece)
-                                
-                                print("Les modifications ont été réalisées avec succès")
-                            
-                            case ["dl", *args]:
-                                if len(args) > 1:
-                                    if args[0] == "ac":
-                                        ac = True
-                                        character_names = list(args[1:])
-                                    else:
-                                        character_names = list(args)
-                                else:
-                                    if args:
-                                        if args[0] == "ac":
-                                            ac = True
-                                            character_names = editor.dl(actors, "comédien·ne")
-                                        else:
-                                            print("Commande mal formée")
-                                            continue
-                                    else:
-                                        character_names = editor.dl(characters, "personnage")
-                                
-                                modify.delete_character(piece, character_names, ac)
-                                
-                                characters, scenes, actors = update(piece)
-                                
-                                print("Le·s personnage·s a/ont bien été supprimé·s")
-                                        
-                            case ["lk", *args]:
-                                if args:
-                                    actor_name = args[0]
-                                    character_names = args[1:]
-                                else:
-                                    actor_name, character_names = editor.lk(actors, characters)
-                                
-                                stage.link(piece, actor_name, character_names)
-                                
-                                characters, scenes, actors = update(piece)
-                                
-                                print("Le·a comédien·ne a bien été lié·e au·x personnage·s")
-                            
-                            case ["ul", *args]:
-                                if args:
-                                    actor_name = args[0]
-                                    character_name = args[1]
+                        print("Le personnage a bien été ajouté")
+                    
+                    case ["mg", *args]:
+                        if args:
+                            source_character = args[0]
+                            destination_characters = args[1:]
+                        else:
+                            source_character, destination_characters = editor.mg(characters)
+                
+                        modify.merge_characters(loaded, source_character, destination_characters)
+                        
+                        
+                        print("Les personnages ont bien été fusionnés")
+                    
+                    case ["sp", *args]:
+                        if args:
+                            character_name = args[0]
+                            nb_lines_to_add = int(args[1])
+                            nb_words_to_add = int(args[2])
+                        else:
+                            character_name, nb_lines_to_add, nb_words_to_add = editor.sp(characters)
+                        
+                        modify.add_lines_and_words(loaded, character_name, nb_lines_to_add, nb_words_to_add)
+                        
+                        
+                        print("Les modifications ont été réalisées avec succès")
+                    
+                    case ["dl", *args]:
+                        if len(args) > 1:
+                            if args[0] == "ac":
+                                ac = True
+                                character_names = list(args[1:])
+                            else:
+                                character_names = list(args)
+                        else:
+                            if args:
+                                if args[0] == "ac":
+                                    ac = True
+                                    character_names = editor.dl(actors, "comédien·ne")
                                 else:
-                                    actor_name, character_name = editor.ul(actors, characters)
-                                
-                                stage.unlink(piece, actor_name, character_name)
+                                    print("Commande mal formée")
+                                    return loaded, True
+                            else:
+                                character_names = editor.dl(characters, "personnage")
+                        
+                        modify.delete_character(loaded, character_names, ac)
+                        
+                        
+                        print("Le·s personnage·s a/ont bien été supprimé·s")
                                 
-                                characters, scenes, actors = update(piece)
+                    case ["bk", file_name]:
+                        try:
+                            operations = load.get_mapping(file_name)
+                        except FileNotFoundError:
+                            print(f"Le fichier {file_name} n'a pas été trouvé.")
+                            return loaded, True
+                        
+                        conflicts = modify.apply_mapping(loaded, operations)
+                        if conflicts:
+                            print("Aucune modification n'a été faite, le fichier contient des conflits :")
+                            for conflict in conflicts:
+                                print(f"  - {conflict}")
+                        else:
+                            model.flush(loaded)
+                            print(f"Les {len(operations)} modification·s ont été appliquées et enregistrées")
                                 
-                                print("Le lien entre le·a comédien·ne et le personnage a bien été retiré")
+                    case ["lk", *args]:
+                        force = False
+                        if args and args[0] == "fc":
+                            force = True
+                            args = args[1:]
+                        if args:
+                            actor_name = args[0]
+                            character_names = args[1:]
+                        else:
+                            actor_name, character_names = editor.lk(actors, characters)
+                        
+                        conflicts = casting.get_link_conflicts(loaded, actor_name, character_names)
+                        if conflicts and not force:
+                            analyse.print_link_conflicts(actor_name, conflicts)
+                            print("Le lien n'a pas été créé (lk fc pour le créer quand même)")
+                            return loaded, True
+                        
+                        stage.link(loaded, actor_name, character_names)
+                        
+                        
+                        print("Le·a comédien·ne a bien été lié·e au·x personnage·s")
+                    
+                    case ["cf"]:
+                        analyse.print_casting_conflicts(casting.get_casting_conflicts(loaded))
+                    
+                    case ["qc"]:
+                        analyse.print_quick_changes(casting.get_quick_changes(loaded))
+                    
+                    case ["pl", file_name]:
+                        try:
+                            sessions = load.get_sessions(file_name)
+                        except FileNotFoundError:
+                            print(f"Le fichier {file_name} n'a pas été trouvé.")
+                            return loaded, True
+                        except ValueError as error:
+                            print(error)
+                            return loaded, True
+                        
+                        plans, remaining = planning.plan_sessions(loaded, sessions)
+                        analyse.print_sessions(scenes, plans, remaining)
+                    
+                    case ["ps", *args]:
+                        if args:
+                            available_actors = args
+                        else:
+                            available_actors = editor.tg(actors, "comédien·ne")
+                        
+                        analyse.print_rehearsable_scenes(planning.get_rehearsable_scenes(loaded, available_actors), available_actors)
+                    
+                    case ["dc", *args]:
+                        replace = False
+                        if args and args[0] == "rp":
+                            replace = True
+                            args = args[1:]
+                        time_limit = float(args[0]) if args else casting.SOLVER_TIME_LIMIT
+                        
+                        groups, lower_bound, optimal = casting.solve_casting(loaded, time_limit)
+                        analyse.print_casting_solution(groups, lower_bound, optimal)
+                        
+                        if actors and not replace:
+                            print("Des comédien·nes sont déjà enregistré·es : la distribution n'a pas été appliquée (dc rp pour les remplacer)")
+                            return loaded, True
+                        
+                        if actors:
+                            modify.delete_character(loaded, utils.extract_list_names(actors, "Name"), True)
+                        for i, group in enumerate(groups):
+                            stage.link(loaded, f"Comédien·ne {i + 1}", group)
+                        
+                        print("La distribution a bien été enregistrée")
                     
-                            case _:
-                                print("Commande inconnue")
+                    case ["ul", *args]:
+                        if args:
+                            actor_name = args[0]
+                            character_name = args[1]
+                        else:
+                            actor_name, character_name = editor.ul(actors, characters)
+                        
+                        stage.unlink(loaded, actor_name, character_name)
+                        
+                        
+                        print("Le lien entre le·a comédien·ne et le personnage a bien été retiré")
+            
+                    case ["u"]:
+                        label = history.undo(loaded)
+                        if label:
+                            print(f"La modification '{label}' a été annulée")
+                        else:
+                            print("Aucune modification à annuler")
+                    
+                    case ["redo"]:
+                        label = history.redo(loaded)
+                        if label:
+                            print(f"La modification '{label}' a été rétablie")
+                        else:
+                            print("Aucune modification à rétablir")
+                    
+                    case ["db"]:
+                        model.flush(loaded)
+                        if loaded["Backend"] != "sqlite":
+                            database.import_csv(piece)
+                            data.update_piece(piece, Mtimes=data.get_mtimes(piece))
+                            loaded = update(piece)
+                        print(f"Les données de '{piece}' sont enregistrées dans {utils.get_database_file(piece)}")
+                    
+                    case ["db", "csv"]:
+                        model.flush(loaded)
+                        if loaded["Backend"] == "sqlite":
+                            database.drop(piece)
+                            data.update_piece(piece, Mtimes=data.get_mtimes(piece))
+                            loaded = update(piece)
+                        print(f"Les données de '{piece}' sont enregistrées dans les fichiers csv")
+                    
+                    case ["sv"]:
+                        model.flush(loaded)
+                        print("Les modifications ont été enregistrées")
+                    
+                    case _:
+                        print("Commande inconnue")
+                
+                if command and command[0] in model.MODIFYING_COMMANDS:
+                    history.record(loaded, " ".join(command))
+
+    return loaded, True
+    
+    
+def main(loaded: type.Piece) -> None:
+    """ Fonction principale qui gère les commandes
+    """
+    
+    #try:
+    running = True
+    while running:
+            command = input("\n > ").split()
+            
+            # Les modifications ne doivent pas croiser une écriture différée en cours
+            with model.LOCK:
+                loaded, running = execute(command, loaded)
     #except:
     #    print("Commande mal formée")
-    #    main(piece, characters, scenes, actors)
+    #    main(loaded)
 
 if __name__ == "__main__":
-    main(None, None, None, None)
\ No newline at end of file
+    if len(sys.argv) > 1:
+        # Mode non interactif : python stats-piece.py <commande> <arguments>
+        with model.LOCK:
+            execute(sys.argv[1:], None)
+            model.flush_all()
+    else:
+        main(None)
\ No newline at end of file
@@ -0,0 +1,317 @@
+from typing import Dict, List, Tuple
+import array
+import csv
+import hashlib
+import io
+import json
+import os
+import struct
+import sys
+
+import type
+import utils
+
+
+JOURNAL_VERSION = 1
+TEMPORARY_SUFFIX = ".tmp"
+TABLES = ("Scenes", "Characters", "Actors") # Tables de la pièce chargée prises en compte par get_fingerprint
+FINGERPRINT_MODULO = 1 << 128
+
+
+def sync_directory(directory: str) -> None:
+    """ Force l'écriture sur le disque des renommages faits dans un dossier
+
+    Args:
+        directory (str): nom du dossier
+    """
+
+    try:
+        descriptor = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        return # Impossible d'ouvrir un dossier sur certains systèmes (Windows)
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+def write_temporary(file_name: str, content: bytes, durable: bool = True) -> str:
+    """ Écrit un contenu dans un fichier temporaire à côté du fichier visé
+
+    Args:
+        file_name (str): nom du fichier visé
+        content (bytes): contenu à écrire
+        durable (bool): force l'écriture sur le disque si cet argument est True
+
+    Returns:
+        str: nom du fichier temporaire
+    """
+
+    temporary_file = file_name + TEMPORARY_SUFFIX
+    with open(temporary_file, "wb") as file:
+        file.write(content)
+        if durable:
+            file.flush()
+            os.fsync(file.fileno())
+    return temporary_file
+
+
+def write_file(file_name: str, content: bytes, durable: bool = True) -> None:
+    """ Remplace un fichier d'un seul coup : le fichier contient soit l'ancien, soit le nouveau contenu, même après un arrêt brutal
+
+    Args:
+        file_name (str): nom du fichier
+        content (bytes): nouveau contenu
+        durable (bool): force l'écriture sur le disque si cet argument est True (inutile pour un simple cache)
+    """
+
+    os.replace(write_temporary(file_name, content, durable), file_name)
+    if durable:
+        sync_directory(os.path.dirname(file_name))
+
+
+def write_files(piece: str, contents: Dict[str, bytes]) -> None:
+    """ Remplace plusieurs fichiers d'une pièce ensemble, grâce à un journal
+
+    Les nouveaux contenus sont d'abord écrits dans des fichiers temporaires, puis le journal qui les liste est écrit :
+    c'est le moment où la modification est validée. Les fichiers temporaires sont ensuite renommés et le journal supprimé.
+    Après un arrêt brutal, recover termine les renommages si le journal existe, ou supprime les fichiers temporaires sinon.
+
+    Args:
+        piece (str): nom de la pièce
+        contents (Dict[str, bytes]): nouveau contenu de chaque fichier
+    """
+
+    if len(contents) == 1:
+        [(file_name, content)] = contents.items()
+        write_file(file_name, content)
+        return
+
+    renames = [[write_temporary(file_name, content), file_name] for file_name, content in contents.items()]
+
+    journal = json.dumps({"Version": JOURNAL_VERSION, "Renames": renames}).encode("utf-8")
+    write_file(utils.get_journal_file(piece), journal)
+
+    for temporary_file, file_name in renames:
+        os.replace(temporary_file, file_name)
+    sync_directory(piece)
+
+    os.remove(utils.get_journal_file(piece))
+
+
+def recover(piece: str) -> bool:
+    """ Termine ou annule une écriture interrompue par un arrêt brutal
+
+    Args:
+        piece (str): nom de la pièce
+
+    Returns:
+        bool: True si une écriture validée a été terminée
+    """
+
+    journal_file = utils.get_journal_file(piece)
+    try:
+        with open(journal_file, "r", encoding="utf-8") as file:
+            journal = json.load(file)
+    except FileNotFoundError:
+        journal = None
+    except (OSError, ValueError):
+        journal = {} # Journal incomplet : l'écriture n'a pas été validée
+
+    replayed = False
+    if journal and journal.get("Version") == JOURNAL_VERSION:
+        for temporary_file, file_name in journal["Renames"]:
+            if os.path.exists(temporary_file):
+                os.replace(temporary_file, file_name)
+        sync_directory(piece)
+        replayed = True
+
+    if journal is not None:
+        os.remove(journal_file)
+
+    # Fichiers temporaires d'une écriture qui n'a pas été validée
+    written_files = [
+        utils.get_scenes_file(piece), utils.get_characters_file(piece), utils.get_actors_file(piece), journal_file,
+        utils.get_manifest_file(piece), utils.get_matrix_file(piece), utils.get_snapshot_file(piece)
+    ]
+    for file_name in written_files:
+        if os.path.exists(file_name + TEMPORARY_SUFFIX):
+            os.remove(file_name + TEMPORARY_SUFFIX)
+
+    return replayed
+
+
+def rows_to_bytes(header: List[str], rows: List[List]) -> bytes:
+    """ Met en forme un fichier csv complet
+
+    Args:
+        header (List[str]): entête du fichier
+        rows (List[List]): lignes à écrire après l'entête
+
+    Returns:
+        bytes: contenu du fichier
+    """
+
+    buffer = io.StringIO(newline="")
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def scenes_to_rows(scenes: List[type.Scene]) -> List[List]:
+    return [[scene["Scene"], scene["Lines"], scene["Didascalies"], scene["Words"], ":".join(scene["Characters"])] for scene in scenes]
+
+
+def characters_to_rows(characters: List[type.Character]) -> List[List]:
+    return [[character["Name"], character["Lines"], character["Words"]] for character in characters]
+
+
+def actors_to_rows(actors: List[type.Actor]) -> List[List]:
+    return [[actor["Name"], ":".join(actor["Characters"])] for actor in actors]
+
+
+def scenes_to_bytes(scenes: List[type.Scene]) -> bytes:
+    return rows_to_bytes(list(type.HEADER_SCENES.values()), scenes_to_rows(scenes))
+
+
+def characters_to_bytes(characters: List[type.Character]) -> bytes:
+    return rows_to_bytes(list(type.HEADER_CHARACTERS.values()), characters_to_rows(characters))
+
+
+def actors_to_bytes(actors: List[type.Actor]) -> bytes:
+    return rows_to_bytes(list(type.HEADER_ACTORS.values()), actors_to_rows(actors))
+
+
+def get_row(table: str, row: Dict) -> str:
+    """ Met en forme une ligne de la pièce chargée, sans les informations qui s'en déduisent
+
+    Args:
+        table (str): "Scenes", "Characters" ou "Actors"
+        row (Dict): scène, personnage ou comédien·ne
+
+    Returns:
+        str: ligne sous forme de chaîne json
+    """
+
+    if table == "Scenes":
+        values = [row["Scene"], row["Lines"], row["Didascalies"], row["Words"], row["Characters"]]
+    elif table == "Characters":
+        values = [row["Name"], row["Lines"], row["Words"]]
+    else:
+        values = [row["Name"], row["Characters"]]
+    return json.dumps(values, ensure_ascii=False)
+
+
+def parse_row(table: str, row: str) -> Dict:
+    """ Relit une ligne mise en forme par get_row
+
+    Args:
+        table (str): "Scenes", "Characters" ou "Actors"
+        row (str): ligne sous forme de chaîne json
+
+    Returns:
+        Dict: valeurs de la ligne (sans les informations qui s'en déduisent)
+    """
+
+    values = json.loads(row)
+    if table == "Scenes":
+        return dict(zip(("Scene", "Lines", "Didascalies", "Words", "Characters"), values))
+    if table == "Characters":
+        return dict(zip(("Name", "Lines", "Words"), values))
+    return dict(zip(("Name", "Characters"), values))
+
+
+def hash_rows(table: str, rows: List[str]) -> int:
+    """ Additionne les empreintes de chaque paire de lignes consécutives
+
+    Args:
+        table (str): nom de la table
+        rows (List[str]): lignes consécutives ("" pour le début ou la fin de la table)
+
+    Returns:
+        int: somme des empreintes, modulo FINGERPRINT_MODULO
+    """
+
+    total = 0
+    for first, second in zip(rows, rows[1:]):
+        digest = hashlib.blake2b(f"{table}\0{first}\0{second}".encode("utf-8"), digest_size=16).digest()
+        total += int.from_bytes(digest, "little")
+    return total % FINGERPRINT_MODULO
+
+
+def get_fingerprint(loaded: type.Piece) -> str:
+    """ Calcule l'empreinte du contenu de la pièce chargée
+
+    L'empreinte est la somme des empreintes des paires de lignes consécutives de chaque table : elle dépend de l'ordre des lignes,
+    et update_fingerprint la met à jour en ne regardant que les lignes modifiées et leurs voisines.
+
+    Args:
+        loaded (type.Piece): pièce chargée
+
+    Returns:
+        str: empreinte
+    """
+
+    fingerprint = 0
+    for table in TABLES:
+        fingerprint += hash_rows(table, ["", *(get_row(table, row) for row in loaded[table]), ""])
+    return format(fingerprint % FINGERPRINT_MODULO, "032x")
+
+
+def update_fingerprint(fingerprint: str, change: type.Change) -> str:
+    """ Met à jour l'empreinte de la pièce après le remplacement de quelques lignes
+
+    Args:
+        fingerprint (str): empreinte avant la modification
+        change (type.Change): modification, avec les lignes voisines des lignes remplacées
+
+    Returns:
+        str: empreinte après la modification
+    """
+
+    table, _, old_rows, new_rows, before, after = change
+    total = int(fingerprint, 16) - hash_rows(table, [before, *old_rows, after]) + hash_rows(table, [before, *new_rows, after])
+    return format(total % FINGERPRINT_MODULO, "032x")
+
+
+def write_matrix(piece: str, dico_matrix: Dict[str, Dict[str, Tuple[int, int]]], characters: List[str]) -> None:
+    """ Écrit la matrice scènes x personnages des répliques et des mots dans un fichier binaire compact
+
+    Le fichier contient un entête (signature, version, dimensions), les noms des scènes puis des personnages,
+    puis deux tableaux d'entiers sur 4 octets (petit-boutiste) rangés scène par scène : répliques, puis mots.
+
+    Args:
+        piece (str): nom de la pièce
+        dico_matrix (Dict[str, Dict[str, Tuple[int, int]]]): répliques et mots de chaque personnage dans chaque scène
+        characters (List[str]): personnages, dans l'ordre des colonnes
+    """
+
+    scenes = list(dico_matrix)
+    column_of = {character: column for column, character in enumerate(characters)}
+
+    lines = array.array(type.MATRIX_TYPECODE, bytes(4 * len(scenes) * len(characters)))
+    words = array.array(type.MATRIX_TYPECODE, bytes(4 * len(scenes) * len(characters)))
+    for row, scene in enumerate(scenes):
+        for character, (nb_lines, nb_words) in dico_matrix[scene].items():
+            cell = row * len(characters) + column_of[character]
+            lines[cell] = nb_lines
+            words[cell] = nb_words
+
+    if sys.byteorder != "little":
+        lines.byteswap()
+        words.byteswap()
+
+    content = io.BytesIO()
+    content.write(type.MATRIX_MAGIC)
+    content.write(struct.pack("<III", type.MATRIX_VERSION, len(scenes), len(characters)))
+    for name in scenes + characters:
+        encoded = name.encode("utf-8")
+        content.write(struct.pack("<I", len(encoded)))
+        content.write(encoded)
+    content.write(lines.tobytes())
+    content.write(words.tobytes())
+
+    write_file(utils.get_matrix_file(piece), content.getvalue(), durable=False)
@@ -1,9 +1,14 @@
-from typing import Dict
+from typing import Any, Dict, List, Tuple
 
 Character = Dict[str, int]
 Scene = Dict[str, str]
 Actor = Dict[str, int]
 Stage = Dict[str, str]
+Piece = Dict[str, Any]
+Matrix = Dict[str, Any]
+Session = Dict[str, Any]
+Delta = List[Tuple[str, int, List[str], List[str]]] # Remplacements successifs : table, position, anciennes lignes, nouvelles lignes
+Change = Tuple[str, int, List[str], List[str], str, str] # Remplacement noté par model, avec les lignes voisines ("" au début ou à la fin de la table)
 
 HEADER_SCENES = {
     "SceneName": "SceneName",
@@ -21,4 +26,20 @@ HEADER_CHARACTERS = {
 HEADER_ACTORS = {
     "ActorName": "ActorName",
     "CharactersPlayed": "CharactersPlayed"
-}
\ No newline at end of file
+}
+
+HEADER_SESSIONS = {
+    "SessionName": "SessionName",
+    "Actors": "Actors",
+    "MaxWords": "MaxWords"
+}
+
+HEADER_MAPPING = {
+    "Operation": "Operation",
+    "Name": "Name",
+    "Targets": "Targets"
+}
+
+MATRIX_MAGIC = b"SPMX"
+MATRIX_VERSION = 1
+MATRIX_TYPECODE = "I" # Entiers non signés sur 4 octets
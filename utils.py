@@ -1,6 +1,10 @@
-from typing import Dict, List, Tuple
+from typing import IO, Dict, List, Tuple
+import gzip
+import lzma
 import os
 
+TEXT_EXTENSIONS = (".txt", ".txt.gz", ".txt.xz") # Textes bruts ou compressés, par ordre de préférence
+
 def get_characters_file(piece: str) -> str:
     return f"{piece}/characters.csv"
 
@@ -10,9 +14,62 @@ def get_scenes_file(piece: str) -> str:
 def get_actors_file(piece: str) -> str:
     return f"{piece}/actors.csv"
 
+def get_snapshot_file(piece: str) -> str:
+    return f"{piece}/snapshot.bin"
+
+def get_manifest_file(piece: str) -> str:
+    return f"{piece}/manifest.json"
+
+def get_journal_file(piece: str) -> str:
+    return f"{piece}/journal.json"
+
+def get_history_file(piece: str) -> str:
+    return f"{piece}/history.jsonl"
+
+def get_matrix_file(piece: str) -> str:
+    return f"{piece}/matrix.bin"
+
+def get_database_file(piece: str) -> str:
+    return f"{piece}/piece.db"
+
+def get_socket_file() -> str:
+    return "stats-piece.sock"
+
 def get_text_file(piece: str) -> str:
+    for extension in TEXT_EXTENSIONS:
+        file_name = f"texts/{piece}{extension}"
+        if os.path.exists(file_name):
+            return file_name
     return f"texts/{piece}.txt"
 
+def is_compressed(file_name: str) -> bool:
+    return file_name.endswith((".gz", ".xz"))
+
+def open_text(file_name: str, mode: str = "rt") -> IO:
+    """ Ouvre un texte brut ou compressé (.gz, .xz) ; un texte compressé est décompressé au fil de la lecture
+
+    Args:
+        file_name (str): nom du fichier
+        mode (str): "rt" pour lire des lignes de texte, "rb" pour lire des octets
+
+    Returns:
+        IO: fichier ouvert
+    """
+    if file_name.endswith(".gz"):
+        opener = gzip.open
+    elif file_name.endswith(".xz"):
+        opener = lzma.open
+    else:
+        opener = open
+    
+    if "b" in mode:
+        return opener(file_name, mode)
+    return opener(file_name, mode, encoding="utf-8")
+
+def count_lines(file_name: str) -> int:
+    with open_text(file_name, "rb") as file:
+        return sum(chunk.count(b"\n") for chunk in iter(lambda: file.read(1 << 20), b""))
+
 def extract_list_names(list_infos: List[Dict], key: str) -> List[str]:
     return [info[key] for info in list_infos]
 